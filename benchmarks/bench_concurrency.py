@@ -0,0 +1,93 @@
+"""
+So sánh throughput của tool search_bills giữa đường DB sync (trước) và async (sau)
+ở 1, 16, 64 client đồng thời.
+
+- sync : tool `def` dùng SessionLocal() (cách cũ) -> chặn event loop của FastMCP
+- async: tool thật `bills_search_bills` trong main_mcp (AsyncSessionLocal)
+
+Cả hai chạy cùng câu SQL qua FastMCP in-memory Client nên chỉ khác đường DB.
+
+    DATABASE_URL=... python -m benchmarks.seed
+    DATABASE_URL=... python -m benchmarks.bench_concurrency --clients 1 16 64 --calls 20
+"""
+import argparse
+import asyncio
+import time
+
+from fastmcp import Client, FastMCP
+from sqlalchemy import text
+
+from db.connection import SessionLocal
+from main import main_mcp, setup
+
+sync_mcp = FastMCP("bench-sync")
+
+
+@sync_mcp.tool(name="bills_search_bills")
+def bills_search_bills_sync(customer_ids: list[str]) -> dict:
+    """Bản sao tool search_bills trước khi chuyển sang async (psycopg2, sync Session)."""
+    where_sql = "pl.is_deleted = false AND pl.customer_id IN :customer_ids"
+    params = {"customer_ids": tuple(customer_ids)}
+    with SessionLocal() as db:
+        total = db.execute(text(f"SELECT COUNT(*) FROM payment_plans pl WHERE {where_sql}"), params).scalar_one()
+        rows = db.execute(text(f"""
+            SELECT pl.id as bill_number, pl.created_at, pl.tax, pl.amount,
+                   p.project_number, p.name as project_name, c.id as customer_id,
+                   p.id as project_id, c.name as customer_name,
+                   pl.execution_date as expected_date_of_payment
+            FROM payment_plans pl
+            LEFT JOIN projects p on p.id = pl.project_id
+            LEFT JOIN customers c on c.id = pl.customer_id
+            WHERE {where_sql}
+            ORDER BY created_at desc
+            LIMIT 5
+        """), params).mappings().all()
+    return {"total": int(total), "returned": len(rows)}
+
+
+async def _client_loop(server, calls: int, customer_ids: list[str], latencies: list[float]):
+    async with Client(server) as client:
+        for i in range(calls):
+            started = time.perf_counter()
+            await client.call_tool("bills_search_bills", {"customer_ids": [customer_ids[i % len(customer_ids)]]})
+            latencies.append(time.perf_counter() - started)
+
+
+async def run(server, clients: int, calls: int, customer_ids: list[str]) -> dict:
+    latencies: list[float] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(_client_loop(server, calls, customer_ids, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "clients": clients,
+        "calls": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--calls", type=int, default=20, help="Calls per client")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    await setup()
+    with SessionLocal() as db:
+        customer_ids = list(db.execute(text("SELECT id FROM customers ORDER BY id LIMIT 100")).scalars())
+
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    print(f"{'mode':<6} {'clients':>7} {'calls':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in modes:
+        server = sync_mcp if mode == "sync" else main_mcp
+        for n in args.clients:
+            r = await run(server, n, args.calls, customer_ids)
+            print(f"{mode:<6} {r['clients']:>7} {r['calls']:>6} {r['throughput']:>9.1f} "
+                  f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Đếm số câu SQL và thời gian của tool create_bill theo số dòng chi tiết.
+
+Số câu lệnh phải cố định (không tăng theo số dòng chi tiết): script thoát với
+mã lỗi nếu khác nhau. Số câu chính xác được kiểm tra trong
+tests/test_create_bill_statements.py.
+
+    DATABASE_URL=... python -m benchmarks.seed
+    DATABASE_URL=... python -m benchmarks.bench_create_bill --details 1 10 100 500
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from fastmcp import Client
+from sqlalchemy import event
+
+from db.connection import async_engine
+from main import main_mcp, setup
+from mcp_servers import ref_cache
+
+statements: list[str] = []
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    statements.append(" ".join(statement.split()[:3]))
+
+
+def _bill(n_details: int) -> dict:
+    return {
+        "customer_id": "CS00000001",
+        "payer_code": "CS00000001",
+        "project_id": "PJ00000001",
+        "expected_date_of_payment": "2025-11-30",
+        "details": [
+            {"attribute": f"Item {i}", "product": f"Product {i}", "quantity": 1, "tax_amount": 10, "amount": 100}
+            for i in range(n_details)
+        ],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--details", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    await setup()
+    counts = {}
+    print(f"{'details':>7} {'cache':>5} {'statements':>10} {'ms':>8}")
+    async with Client(main_mcp) as client:
+        for n in args.details:
+            for cache in ("cold", "warm"):
+                if cache == "cold":
+                    ref_cache.customers_cache.clear()
+                    ref_cache.projects_cache.clear()
+                statements.clear()
+                started = time.perf_counter()
+                await client.call_tool("bills_create_bill", {"information_create_invoice": _bill(n)})
+                ms = (time.perf_counter() - started) * 1000
+                counts.setdefault(cache, set()).add(len(statements))
+                print(f"{n:>7} {cache:>5} {len(statements):>10} {ms:>8.1f}")
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                await client.call_tool("bills_create_bill", {"information_create_invoice": _bill(n)})
+            print(f"{n:>7} {'avg':>5} {'':>10} {(time.perf_counter() - started) * 1000 / args.repeat:>8.1f}")
+
+    for cache, seen in counts.items():
+        if len(seen) != 1:
+            print(f"❌ statement count depends on detail lines ({cache} cache): {sorted(seen)}")
+            sys.exit(1)
+    print(f"✅ statements per create_bill: cold={counts['cold'].pop()} warm={counts['warm'].pop()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Thông lượng và bộ nhớ của export NDJSON/CSV (mcp_servers/export.py).
+
+Mỗi chế độ chạy trong 1 process con riêng để đo peak RSS độc lập:
+
+- stream : stream_export (server-side cursor, EXPORT_CHUNK_ROWS dòng mỗi lần)
+- fetchall: cùng câu SQL nhưng đọc hết kết quả vào bộ nhớ rồi mới ghi (cách làm
+            nếu dùng tool search với page_size rất lớn)
+
+Dữ liệu ghi ra /dev/null. Với 1M+ dòng:
+
+    DATABASE_URL=... python -m benchmarks.seed --bills 1000000
+    DATABASE_URL=... python -m benchmarks.bench_export --entity bills --format ndjson csv
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+async def _run(mode: str, entity: str, fmt: str, limit) -> dict:
+    from sqlalchemy.sql import text
+
+    from db.connection import async_engine
+    from mcp_servers import export
+    from mcp_servers.serialize import serializer_for
+
+    rows = 0
+    started = time.perf_counter()
+    with open("/dev/null", "wb") as out:
+        if mode == "stream":
+            async for chunk in export.stream_export(entity, fmt, limit=limit):
+                out.write(chunk)
+            rows = export.stats()[entity]["rows"]
+        else:
+            spec = export.EXPORTS[entity]
+            where_sql, params = spec.where()
+            sql = f"{spec.select_sql} {spec.from_sql} WHERE {where_sql} {spec.order_sql}"
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            async with async_engine.connect() as conn:
+                result = await conn.execute(text(sql), params)
+                ser = serializer_for(result.cursor.description)
+                all_rows = result.all()
+            rows = len(all_rows)
+            if fmt == "ndjson":
+                out.write(b"".join(ser.ndjson(all_rows)))
+            else:
+                out.write(export._csv_chunk([ser.keys]).encode())
+                out.write(export._csv_chunk(ser.tuples(all_rows)).encode())
+    elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entity", default="bills", choices=["bills", "projects", "customers"])
+    parser.add_argument("--format", nargs="+", default=["ndjson", "csv"], choices=["ndjson", "csv"])
+    parser.add_argument("--mode", nargs="+", default=["stream", "fetchall"], choices=["stream", "fetchall"])
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FORMAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, fmt = args.child
+        print(json.dumps(asyncio.run(_run(mode, args.entity, fmt, args.limit))))
+        return
+
+    print(f"{'mode':<9} {'format':<7} {'rows':>9} {'seconds':>8} {'rows/s':>10} {'peak MB':>8}")
+    for fmt in args.format:
+        for mode in args.mode:
+            cmd = [sys.executable, "-m", "benchmarks.bench_export", "--entity", args.entity, "--child", mode, fmt]
+            if args.limit is not None:
+                cmd += ["--limit", str(args.limit)]
+            r = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+            print(f"{mode:<9} {fmt:<7} {r['rows']:>9} {r['seconds']:>8.2f} {r['rows_per_sec']:>10,} {r['peak_rss_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+So sánh các chế độ HTTP của main.py (xem main.http_options):
+
+- session  : streamable HTTP có session, trả SSE (mặc định trước đây; cần sticky
+             routing khi chạy nhiều replica)
+- stateless: MCP_STATELESS_HTTP=on, trả JSON (application/json) cho mỗi POST
+- stateless_sse: stateless nhưng vẫn trả SSE (MCP_JSON_RESPONSE=off), để tách chi
+             phí của bản thân JSON / SSE
+
+Mỗi chế độ chạy `python main.py` trong process con riêng:
+
+1. gọi mọi tool trong benchmarks/workload.py 1 lần (kiểm tra chạy được ở mọi chế độ)
+2. mở --idle-clients client (initialize rồi để đó): RSS và số fd của server tăng
+   thêm bao nhiêu mỗi client
+3. --clients client gọi liên tục trong --duration giây (closed loop, tool đọc): req/s,
+   p50 / p99, thời gian CPU của server cho mỗi lần gọi (client chạy cùng máy nên
+   req/s phụ thuộc cả CPU của client)
+
+Ghi dữ liệu (create_bill, update_customer) -> chạy trên DB benchmark.
+
+    DATABASE_URL=... python -m benchmarks.bench_http_mode
+    DATABASE_URL=... python -m benchmarks.bench_http_mode --modes stateless --idle-clients 500
+"""
+import argparse
+import asyncio
+import gc
+import os
+import time
+from contextlib import AsyncExitStack
+from typing import List
+
+from fastmcp import Client
+
+from benchmarks.bench_startup import Server
+from benchmarks.workload import CASES
+
+MODES = {
+    "session": {"MCP_STATELESS_HTTP": "off", "MCP_JSON_RESPONSE": "off"},
+    "stateless": {"MCP_STATELESS_HTTP": "on", "MCP_JSON_RESPONSE": "on"},
+    "stateless_sse": {"MCP_STATELESS_HTTP": "on", "MCP_JSON_RESPONSE": "off"},
+}
+READ_TOOLS = ["customers_search_customers", "projects_project_search", "bills_search_bills",
+              "projects_cost_quotation_for_project", "projects_project_list_by_customer_ids"]
+
+
+def _rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _cpu_s(pid: int) -> float:
+    """utime + stime của process (giây)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _fds(pid: int) -> int:
+    return len(os.listdir(f"/proc/{pid}/fd"))
+
+
+def _pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+async def _all_tools(url: str, args) -> List[str]:
+    failed = []
+    async with Client(url, timeout=60) as client:
+        for i, (tool, make) in enumerate(CASES.items()):
+            result = await client.call_tool(tool, make(args, i), raise_on_error=False)
+            if result.is_error:
+                failed.append(tool)
+        await client.read_resource("stats://tools")
+    return failed
+
+
+async def _idle(server: Server, url: str, n: int, settle: float) -> dict:
+    gc.collect()
+    await asyncio.sleep(settle)
+    rss0, fds0 = _rss_kb(server.proc.pid), _fds(server.proc.pid)
+    async with AsyncExitStack() as stack:
+        for _ in range(n):
+            await stack.enter_async_context(Client(url, timeout=30))
+        await asyncio.sleep(settle)
+        rss1, fds1 = _rss_kb(server.proc.pid), _fds(server.proc.pid)
+    return {"rss_kb": rss0, "kb_per_client": (rss1 - rss0) / n, "fds_per_client": (fds1 - fds0) / n}
+
+
+async def _throughput(server: Server, url: str, args) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def loop(client: Client, offset: int):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < deadline:
+            tool = READ_TOOLS[i % len(READ_TOOLS)]
+            started = time.perf_counter()
+            result = await client.call_tool(tool, CASES[tool](args, i), raise_on_error=False)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += result.is_error
+            i += 1
+
+    async with AsyncExitStack() as stack:
+        clients = [await stack.enter_async_context(Client(url, timeout=60)) for _ in range(args.clients)]
+        started, cpu = time.perf_counter(), _cpu_s(server.proc.pid)
+        await asyncio.gather(*(loop(c, k * 97) for k, c in enumerate(clients)))
+        elapsed, cpu = time.perf_counter() - started, _cpu_s(server.proc.pid) - cpu
+    return {"calls": len(latencies), "errors": errors, "rps": len(latencies) / elapsed,
+            "server_cpu_ms": cpu * 1000 / len(latencies) if latencies else float("nan"),
+            "p50_ms": _pct(latencies, 0.5), "p99_ms": _pct(latencies, 0.99)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["session", "stateless"])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients of the throughput stage")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of the throughput stage")
+    parser.add_argument("--idle-clients", type=int, default=200)
+    parser.add_argument("--settle", type=float, default=2, help="Seconds to wait before reading RSS")
+    parser.add_argument("--customers", type=int, default=1000, help="Seeded customers (for generated ids)")
+    parser.add_argument("--projects", type=int, default=10000, help="Seeded projects (for generated ids)")
+    args = parser.parse_args()
+
+    print(f"{'mode':<13} {'failed tools':>12} {'rss MB':>7} {'KB/idle':>8} {'fd/idle':>7} "
+          f"{'req/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'cpu ms/call':>11} {'errors':>6}")
+    for mode in args.modes:
+        server = Server(MODES[mode])
+        try:
+            await server.wait_ready()
+            failed = await _all_tools(server.url, args)
+            idle = await _idle(server, server.url, args.idle_clients, args.settle)
+            load = await _throughput(server, server.url, args)
+        finally:
+            server.stop()
+        print(f"{mode:<13} {len(failed):>12} {idle['rss_kb'] / 1024:>7.1f} {idle['kb_per_client']:>8.1f} "
+              f"{idle['fds_per_client']:>7.2f} {load['rps']:>7.1f} {load['p50_ms']:>7.1f} {load['p99_ms']:>7.1f} "
+              f"{load['server_cpu_ms']:>11.2f} {load['errors']:>6}")
+        if failed:
+            print(f"{'':<13} failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
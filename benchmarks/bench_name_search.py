@@ -0,0 +1,81 @@
+"""
+So sánh tìm khách hàng theo tên: ILIKE '%x%' (cách cũ, seq scan, phân biệt dấu)
+với name_filter() (unaccent + pg_trgm, GIN index) trên bảng customers lớn.
+
+    DATABASE_URL=... python -m benchmarks.seed --customers 1000000 --projects 1000 --bills 1000
+    DATABASE_URL=... python -m db.migrate
+    DATABASE_URL=... python -m benchmarks.bench_name_search --repeat 5
+
+In ra thời gian trung vị, số dòng khớp và node quét của plan cho từng câu tìm.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import text
+
+from db.connection import engine
+from mcp_servers.name_search import name_filter, name_rank
+
+QUERIES = ["Đạt", "dat", "nguyen van dat", "Trần Thị", "huong", "nguyn"]
+
+BASE = "FROM customers c WHERE c.is_deleted = false AND c.is_contractor = false"
+
+VARIANTS = {
+    "ilike": (
+        f"SELECT c.id, c.name {BASE} AND c.name ILIKE '%' || :name || '%' "
+        f"ORDER BY c.created_at DESC, c.id DESC LIMIT 6"
+    ),
+    "trgm": (
+        f"SELECT c.id, c.name {BASE} AND {name_filter('c.name')} "
+        f"ORDER BY {name_rank('c.name')} DESC, c.id DESC LIMIT 6"
+    ),
+}
+
+
+def _scan_nodes(plan: dict) -> list:
+    nodes = [plan["Node Type"]] if "Scan" in plan["Node Type"] else []
+    for child in plan.get("Plans", []):
+        nodes += _scan_nodes(child)
+    return nodes
+
+
+def run(conn, sql: str, name: str, repeat: int) -> dict:
+    stmt = text(sql)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(stmt, {"name": name}).all()
+        timings.append(time.perf_counter() - started)
+
+    count_sql = f"SELECT COUNT(*) FROM ({sql.rsplit('ORDER BY', 1)[0]}) q"
+    matched = conn.execute(text(count_sql), {"name": name}).scalar_one()
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), {"name": name}).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return {
+        "ms": statistics.median(timings) * 1000,
+        "matched": matched,
+        "scan": "+".join(dict.fromkeys(_scan_nodes(plan[0]["Plan"]))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        n = conn.execute(text("SELECT COUNT(*) FROM customers")).scalar_one()
+        print(f"customers: {n} rows, median of {args.repeat} runs\n")
+        print(f"{'query':<16} {'variant':<6} {'ms':>9} {'matched':>8}  scan")
+        for q in args.queries:
+            for variant, sql in VARIANTS.items():
+                r = run(conn, sql, q, args.repeat)
+                print(f"{q:<16} {variant:<6} {r['ms']:>9.1f} {r['matched']:>8}  {r['scan']}")
+
+
+if __name__ == "__main__":
+    main()
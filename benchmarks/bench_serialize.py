@@ -0,0 +1,130 @@
+"""
+Microbenchmark chuyển dòng kết quả sang JSON: cách cũ (_rows_to_dicts + isinstance
+cho từng ô) so với mcp_servers/serialize.py (bộ chuyển đổi theo kiểu cột).
+
+- synthetic: dòng tuple giống kết quả search_bills (str, timestamp, numeric, date, bool)
+- --db     : đọc thật N dòng payment_plans qua async engine (gồm cả thời gian fetch)
+
+    python -m benchmarks.bench_serialize --rows 10000 100000
+    DATABASE_URL=... python -m benchmarks.bench_serialize --rows 10000 100000 --db
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+from mcp_servers.serialize import serializer_for
+
+# (tên cột, OID Postgres) giống cursor.description của search_bills
+COLUMNS = [
+    ("bill_number", 1043), ("created_at", 1114), ("tax", 1700), ("amount", 1700),
+    ("customer_id", 1043), ("project_id", 1043), ("expected_date_of_payment", 1082), ("is_deleted", 16),
+]
+
+
+# ---- cách cũ (bản sao trước khi gộp) -------------------------------------------
+def _to_jsonable(v):
+    if isinstance(v, (datetime, date, dtime)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, UUID):
+        return str(v)
+    if isinstance(v, Enum):
+        return v.value
+    return v
+
+
+def _rows_to_dicts(rows):
+    out = []
+    for r in rows:
+        m = r if isinstance(r, dict) else dict(r)
+        out.append({k: _to_jsonable(v) for k, v in m.items()})
+    return out
+# ---------------------------------------------------------------------------------
+
+
+def _synthetic(n: int) -> list:
+    base = datetime(2024, 1, 1)
+    return [
+        (f"PP{i:08d}", base + timedelta(minutes=i), Decimal("100000.00") + i, Decimal("1000000.50") + i,
+         f"CS{i % 1000:08d}", f"PJ{i % 10000:08d}", date(2024, 1, 1) + timedelta(days=i % 365), False)
+        for i in range(n)
+    ]
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def bench_synthetic(n: int, repeat: int):
+    rows = _synthetic(n)
+    keys = [c[0] for c in COLUMNS]
+    ser = serializer_for(COLUMNS)
+    cases = {
+        # fetch_page cũ: mappings() -> dict(r) -> _rows_to_dicts tạo thêm 1 dict nữa
+        "old dicts": lambda: _rows_to_dicts([dict(zip(keys, r)) for r in rows]),
+        "new dicts": lambda: ser.dicts(rows),
+        "old json": lambda: json.dumps(_rows_to_dicts([dict(zip(keys, r)) for r in rows])).encode(),
+        "new json": lambda: ser.json(rows),
+    }
+    for name, fn in cases.items():
+        ms = _time(fn, repeat)
+        print(f"{'synthetic':<10} {n:>7} {name:<10} {ms:>9.1f} {n / ms * 1000:>12,.0f}")
+
+
+async def bench_db(n: int, repeat: int):
+    from sqlalchemy.sql import text
+    from db import statements
+    from db.connection import async_engine
+
+    sql = ("SELECT pl.id AS bill_number, pl.created_at, pl.tax, pl.amount, pl.customer_id, pl.project_id, "
+           "pl.execution_date AS expected_date_of_payment, pl.is_deleted FROM payment_plans pl LIMIT :n")
+
+    async with async_engine.connect() as conn:
+        async def old():
+            result = await conn.execute(text(sql), {"n": n})
+            return _rows_to_dicts([dict(r) for r in result.mappings().all()])
+
+        async def new():
+            result = await statements.execute(conn, sql, {"n": n})
+            return serializer_for(result.cursor.description).dicts(result.all())
+
+        for name, fn in (("old dicts", old), ("new dicts", new)):
+            await fn()
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await fn()
+                best = min(best, time.perf_counter() - started)
+            ms = best * 1000
+            print(f"{'db':<10} {n:>7} {name:<10} {ms:>9.1f} {n / ms * 1000:>12,.0f}")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs")
+    parser.add_argument("--db", action="store_true", help="Also fetch real rows from payment_plans")
+    args = parser.parse_args()
+
+    print(f"{'source':<10} {'rows':>7} {'case':<10} {'ms':>9} {'rows/s':>12}")
+    for n in args.rows:
+        bench_synthetic(n, args.repeat)
+    if args.db:
+        for n in args.rows:
+            asyncio.run(bench_db(n, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
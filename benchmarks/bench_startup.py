@@ -0,0 +1,114 @@
+"""
+Thời gian khởi động server: từ lúc exec `python main.py` tới lần list_tools đầu
+tiên thành công qua HTTP (/mcp), rồi thời gian của lần gọi tool đầu tiên.
+
+- lazy : LAZY_TOOLS=on + mcp_servers/tool_manifest.json (tool đăng ký từ manifest,
+         module tool / SQLAlchemy / engine nạp ở lần gọi tool đầu)
+- eager: LAZY_TOOLS=off (import mọi module tool + import_server như trước)
+
+Mỗi lần chạy là 1 process mới trên 1 port trống; client hỏi lại mỗi --poll giây
+tới khi list_tools trả về đủ tool.
+
+    python -m mcp_servers.tool_manifest
+    DATABASE_URL=... python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fastmcp import Client
+
+from benchmarks.workload import CASES
+from mcp_servers import tool_manifest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _list_tools(url: str):
+    async with Client(url, timeout=5) as client:
+        return await client.list_tools()
+
+
+class Server:
+    """`python main.py` trong process con trên 1 port trống."""
+
+    def __init__(self, env: dict):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}/mcp"
+        self.started = time.perf_counter()
+        self.proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env={**os.environ, **env, "PORT": str(self.port)},
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def wait_ready(self, timeout: float = 60, poll: float = 0.02) -> list:
+        """Chờ tới lần list_tools đầu tiên thành công; trả về danh sách tool."""
+        while True:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited with {self.proc.returncode}")
+            if time.perf_counter() - self.started > timeout:
+                raise RuntimeError(f"no list_tools after {timeout}s")
+            # connect TCP trước (rẻ) để client không tranh CPU với server đang khởi động
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return await _list_tools(self.url)
+            except Exception:
+                await asyncio.sleep(poll)
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        self.proc.wait()
+
+
+async def _run_once(mode: str, args) -> dict:
+    server = Server({"LAZY_TOOLS": "on" if mode == "lazy" else "off"})
+    try:
+        tools = await server.wait_ready(args.timeout, args.poll)
+        ready = time.perf_counter() - server.started
+        async with Client(server.url, timeout=30) as client:
+            call_started = time.perf_counter()
+            await client.call_tool(args.tool, args.arguments)
+            first_call = time.perf_counter() - call_started
+        return {"list_tools_s": ready, "first_call_s": first_call, "tools": len(tools)}
+    finally:
+        server.stop()
+
+
+def _summary(values):
+    return f"min {min(values):.3f}  median {statistics.median(values):.3f}  max {max(values):.3f}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["eager", "lazy"], default=["eager", "lazy"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--poll", type=float, default=0.02, help="Seconds between list_tools attempts")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--tool", default="customers_search_customers", choices=sorted(CASES),
+                        help="Tool called once after startup (arguments from benchmarks/workload.py)")
+    parser.add_argument("--customers", type=int, default=1000, help="Seeded customers (for generated ids)")
+    parser.add_argument("--projects", type=int, default=10000, help="Seeded projects (for generated ids)")
+    args = parser.parse_args()
+    args.arguments = CASES[args.tool](args, 0)
+
+    if "lazy" in args.modes and tool_manifest.load() is None:
+        parser.error("lazy mode needs an up-to-date manifest: python -m mcp_servers.tool_manifest")
+
+    for mode in args.modes:
+        runs = [await _run_once(mode, args) for _ in range(args.runs)]
+        print(f"{mode:<6} {runs[0]['tools']} tools  exec -> list_tools (s): {_summary([r['list_tools_s'] for r in runs])}")
+        print(f"{'':<6} first {args.tool} call (s): {_summary([r['first_call_s'] for r in runs])}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Chi phí mỗi truy vấn tìm kiếm khi dựng SQL động:
+
+- text     : cách cũ, text() + bindparam IN mở rộng mới mỗi lần (SQLAlchemy parse/compile,
+             chuỗi SQL đổi theo số id nên psycopg không prepare được)
+- cached   : fetch_page với câu lệnh compile sẵn theo shape, `= ANY(:ids)`, không prepare
+- prepared : như cached + psycopg PREPARE phía server sau DB_PREPARE_THRESHOLD lần
+
+Truy vấn dùng khoá chính nên thời gian chủ yếu là phần client + parse/plan của Postgres.
+
+    DATABASE_URL=... python -m benchmarks.seed
+    DATABASE_URL=... python -m benchmarks.bench_statement_cache --calls 2000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.sql import bindparam, text
+
+from db.connection import async_engine
+from mcp_servers.pagination import fetch_page, keyset
+
+SELECT_SQL = "SELECT c.id, c.name, c.email, c.phone_number, c.created_at, c.is_deleted"
+
+
+def _ids(i: int) -> list:
+    return [f"CS{1 + (i + k) % 500:08d}" for k in range(1 + i % 5)]
+
+
+async def _text(conn, i: int):
+    sql = (f"{SELECT_SQL}, c.created_at AS _sort_key, c.id AS _sort_id FROM customers c "
+           f"WHERE c.is_deleted = false AND c.id IN :ids ORDER BY c.created_at desc, c.id desc LIMIT :_limit")
+    stmt = text(sql).bindparams(bindparam("ids", expanding=True))
+    return (await conn.execute(stmt, {"ids": _ids(i), "_limit": 6})).mappings().all()
+
+
+async def _cached(conn, i: int):
+    return await fetch_page(
+        conn, SELECT_SQL, "FROM customers c", "c.is_deleted = false AND c.id = ANY(:ids)", {"ids": _ids(i)},
+        limit=5, count_mode="none", keyset=keyset("c.created_at", "c.id", "created_at", "desc", None),
+    )
+
+
+async def run(mode: str, calls: int) -> float:
+    fn = _text if mode == "text" else _cached
+    async with async_engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        default_threshold = raw.driver_connection.prepare_threshold
+        if mode != "prepared":
+            raw.driver_connection.prepare_threshold = None
+        try:
+            for i in range(50):
+                await fn(conn, i)
+            started = time.perf_counter()
+            for i in range(calls):
+                await fn(conn, i)
+            return (time.perf_counter() - started) / calls * 1_000_000
+        finally:
+            raw.driver_connection.prepare_threshold = default_threshold
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'us/call':>9}")
+    for mode in ("text", "cached", "prepared"):
+        print(f"{mode:<9} {await run(mode, args.calls):>9.0f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
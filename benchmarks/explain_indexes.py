@@ -0,0 +1,180 @@
+"""
+Bằng chứng EXPLAIN trước/sau cho các index trong db/migrations (0003-0005).
+
+Mỗi case là 1 dạng câu SQL các tool gửi (lọc is_deleted = false + customer_id /
+project_id / project_number / khoảng created_at, ORDER BY created_at, id). Chạy
+EXPLAIN (ANALYZE, BUFFERS) 2 lần trên dữ liệu đang có:
+
+- before: trong 1 transaction DROP các index của case rồi EXPLAIN, sau đó ROLLBACK
+          (index không bị mất; DROP giữ khoá ACCESS EXCLUSIVE tới lúc rollback nên
+          chỉ chạy trên DB benchmark)
+- after : với index
+
+Lấy thời gian thực thi nhỏ nhất trong --repeat lần (cache đã nóng).
+
+    python -m benchmarks.seed && python -m db.migrate
+    python -m benchmarks.explain_indexes
+    python -m benchmarks.explain_indexes --cases bills_by_customer --plans
+"""
+import argparse
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from db.connection import engine
+
+BILL_COLUMNS = "pl.id, pl.created_at, pl.tax, pl.amount, pl.customer_id, pl.project_id, pl.execution_date"
+PROJECT_COLUMNS = "p.id, p.name, p.project_number, p.created_at, p.completed_date, p.end_date"
+
+
+@dataclass
+class Case:
+    name: str
+    indexes: Tuple[str, ...]
+    sql: str
+
+
+CASES = [
+    # search_bills customer_ids=[..], trang đầu
+    Case("bills_by_customer", ("ix_payment_plans_customer_created",),
+         f"SELECT {BILL_COLUMNS} FROM payment_plans pl WHERE pl.is_deleted = false "
+         "AND pl.customer_id = ANY(%(customers)s) ORDER BY pl.created_at DESC, pl.id DESC LIMIT 6"),
+    # search_bills trang sau (keyset)
+    Case("bills_by_customer_keyset", ("ix_payment_plans_customer_created",),
+         f"SELECT {BILL_COLUMNS} FROM payment_plans pl WHERE pl.is_deleted = false "
+         "AND pl.customer_id = ANY(%(customer)s) AND (pl.created_at, pl.id) < (%(cursor_at)s, %(cursor_id)s) "
+         "ORDER BY pl.created_at DESC, pl.id DESC LIMIT 6"),
+    # count_mode=exact
+    Case("bills_count_by_customer", ("ix_payment_plans_customer_created",),
+         "SELECT count(*) FROM payment_plans pl WHERE pl.is_deleted = false AND pl.customer_id = ANY(%(customers)s)"),
+    # search_bills project_ids=[..] + created_at_from
+    Case("bills_by_project_since", ("ix_payment_plans_project_created",),
+         f"SELECT {BILL_COLUMNS} FROM payment_plans pl WHERE pl.is_deleted = false "
+         "AND pl.project_id = ANY(%(projects)s) AND pl.created_at >= %(since)s "
+         "ORDER BY pl.created_at DESC, pl.id DESC LIMIT 6"),
+    # aggregate_bills / export chỉ lọc theo khoảng ngày
+    Case("bills_month_range", ("ix_payment_plans_created_brin",),
+         "SELECT count(*), sum(pl.amount) FROM payment_plans pl WHERE pl.is_deleted = false "
+         "AND pl.created_at >= %(month_from)s AND pl.created_at < %(month_to)s"),
+    # chi tiết theo danh sách hoá đơn
+    Case("details_by_plans", ("ix_payment_plan_details_plan",),
+         "SELECT d.* FROM payment_plan_details d WHERE d.payment_plan_id = ANY(%(plans)s)"),
+    # câu kiểm tra của trigger khoá ngoại (ON DELETE/UPDATE RESTRICT) cho 1 hoá đơn
+    Case("details_fk_check", ("ix_payment_plan_details_plan",),
+         "SELECT 1 FROM ONLY payment_plan_details x WHERE x.payment_plan_id = %(plan)s FOR KEY SHARE OF x"),
+    # project_search project_number=..
+    Case("projects_by_number", ("ix_projects_project_number",),
+         f"SELECT {PROJECT_COLUMNS} FROM projects p WHERE p.is_deleted = false AND p.project_number = %(project_number)s "
+         "ORDER BY p.created_at DESC, p.id DESC LIMIT 6"),
+    # cost_quotation_for_project project_codes=[..]
+    Case("quotation_by_codes", ("ix_projects_project_number",),
+         "SELECT p.id, p.amount, b.billed_amount FROM projects p LEFT JOIN project_billing b ON b.project_id = p.id "
+         "WHERE p.is_deleted = false AND p.project_number = ANY(%(project_numbers)s) LIMIT 6"),
+    # project_list_by_customer_ids
+    Case("projects_by_customer", ("ix_projects_customer_created",),
+         f"SELECT {PROJECT_COLUMNS} FROM projects p WHERE p.is_deleted = false AND p.customer_id = ANY(%(project_customer)s) "
+         "ORDER BY p.created_at DESC LIMIT 6"),
+]
+
+
+def _params(conn) -> dict:
+    """Giá trị thật lấy từ dữ liệu đang có (khách / dự án có nhiều hoá đơn nhất...)."""
+    customers = list(conn.execute(text(
+        "SELECT customer_id FROM payment_plans WHERE is_deleted = false GROUP BY 1 ORDER BY count(*) DESC LIMIT 2"
+    )).scalars())
+    cursor_at, cursor_id = conn.execute(text(
+        "SELECT created_at, id FROM payment_plans WHERE is_deleted = false AND customer_id = :c "
+        "ORDER BY created_at DESC, id DESC OFFSET 5 LIMIT 1"), {"c": customers[0]}).one()
+    project = conn.execute(text(
+        "SELECT project_id FROM payment_plans WHERE is_deleted = false GROUP BY 1 ORDER BY count(*) DESC LIMIT 1"
+    )).scalar_one()
+    since, month_from = conn.execute(text(
+        "SELECT percentile_disc(0.25) WITHIN GROUP (ORDER BY created_at), "
+        "date_trunc('month', percentile_disc(0.5) WITHIN GROUP (ORDER BY created_at)) FROM payment_plans"
+    )).one()
+    plans = list(conn.execute(text("SELECT id FROM payment_plans ORDER BY id DESC LIMIT 10")).scalars())
+    numbers = list(conn.execute(text(
+        "SELECT project_number FROM projects WHERE project_number IS NOT NULL ORDER BY id DESC LIMIT 3")).scalars())
+    project_customer = conn.execute(text(
+        "SELECT customer_id FROM projects WHERE is_deleted = false GROUP BY 1 ORDER BY count(*) DESC LIMIT 1"
+    )).scalar_one()
+    return {
+        "customers": customers, "customer": customers[:1], "cursor_at": cursor_at, "cursor_id": cursor_id,
+        "projects": [project], "since": since,
+        "month_from": month_from, "month_to": conn.execute(
+            text("SELECT CAST(:m AS timestamp) + interval '1 month'"), {"m": month_from}).scalar_one(),
+        "plans": plans, "plan": plans[0],
+        "project_number": numbers[0], "project_numbers": numbers,
+        "project_customer": [project_customer],
+    }
+
+
+def _scans(node: dict) -> List[str]:
+    """Các node đọc bảng / index trong plan, vd. 'Index Scan Backward ix_...'."""
+    out = []
+    if "Relation Name" in node or "Index Name" in node:
+        direction = " Backward" if node.get("Scan Direction") == "Backward" else ""
+        out.append(f"{node['Node Type']}{direction} {node.get('Index Name') or node['Relation Name']}")
+    for child in node.get("Plans", ()):
+        out.extend(_scans(child))
+    return out
+
+
+def _run(conn, case: Case, params: dict, repeat: int, drop: bool) -> Tuple[dict, Optional[str]]:
+    trans = conn.begin()
+    try:
+        if drop:
+            for ix in case.indexes:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {ix}")
+        best = None
+        for _ in range(repeat):
+            plan = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {case.sql}", params).scalar_one()[0]
+            if best is None or plan["Execution Time"] < best["Execution Time"]:
+                best = plan
+        text_plan = "\n".join(r[0] for r in conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {case.sql}", params))
+    finally:
+        trans.rollback()
+    top = best["Plan"]
+    return {
+        "ms": best["Execution Time"],
+        "buffers": top.get("Shared Hit Blocks", 0) + top.get("Shared Read Blocks", 0),
+        "scans": ", ".join(dict.fromkeys(_scans(top))),
+    }, text_plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=[c.name for c in CASES], help="Only these cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--plans", action="store_true", help="Print the full before/after plans")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        existing = set(conn.execute(text("SELECT indexname FROM pg_indexes WHERE schemaname = 'public'")).scalars())
+        correlation = conn.execute(text(
+            "SELECT correlation FROM pg_stats WHERE tablename = 'payment_plans' AND attname = 'created_at'"
+        )).scalar()
+        params = _params(conn)
+        conn.rollback()
+
+        print(f"payment_plans.created_at correlation: {correlation} (BRIN chỉ có ích khi gần 1)\n")
+        print(f"{'case':<26} {'before ms':>10} {'buf':>6} {'after ms':>9} {'buf':>6} {'x':>7}  after scans / before scans")
+        for case in CASES:
+            if args.cases and case.name not in args.cases:
+                continue
+            missing = [ix for ix in case.indexes if ix not in existing]
+            if missing:
+                print(f"{case.name:<26} missing index {', '.join(missing)} (python -m db.migrate)")
+                continue
+            before, before_plan = _run(conn, case, params, args.repeat, drop=True)
+            after, after_plan = _run(conn, case, params, args.repeat, drop=False)
+            speedup = before["ms"] / after["ms"] if after["ms"] else float("inf")
+            print(f"{case.name:<26} {before['ms']:>10.3f} {before['buffers']:>6} {after['ms']:>9.3f} "
+                  f"{after['buffers']:>6} {speedup:>6.1f}x  {after['scans']} / {before['scans']}")
+            if args.plans:
+                print(f"\n-- {case.name}: before\n{before_plan}\n\n-- {case.name}: after\n{after_plan}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Sinh dữ liệu giả lập có phân bố gần thực tế cho customers -> projects ->
+payment_plans -> payment_plan_details, nạp bằng COPY từ nhiều process song song.
+
+- Tham chiếu nhất quán: dự án thuộc 1 khách hàng có thật, hóa đơn lấy
+  customer_id / payer_code từ khách hàng của dự án, chi tiết cộng đúng bằng
+  amount / tax của hóa đơn.
+- Lệch (skew): số dự án theo khách hàng và số hóa đơn theo dự án theo luật lũy
+  thừa, vài khách hàng rất lớn chiếm phần lớn dữ liệu (--skew).
+- created_at theo mùa: nhiều vào cuối năm / trước Tết, giảm mạnh tháng 2, tăng dần
+  theo năm.
+- Tên tiếng Việt có dấu (họ theo tần suất thật), tên công ty, tên dự án theo tỉnh.
+- Tái lập được: cùng --seed, số lượng và --chunk cho ra đúng dữ liệu đó, không phụ
+  thuộc số worker. Mỗi khối --chunk dòng dùng RNG riêng suy ra từ seed + số khối;
+  thuộc tính dự án mà hóa đơn cần (khách hàng, ngày tạo) tính bằng hàm băm nên
+  worker không cần chia sẻ trạng thái.
+
+Tên bảng / cột lấy từ model trong db/models. KHÔNG chạy trên DB thật: bảng bị
+TRUNCATE trước khi nạp.
+
+    DATABASE_URL=... python -m benchmarks.generate --bills 10000000 --workers 8
+    DATABASE_URL=... python -m benchmarks.generate --customers 20000 --projects 300000 --bills 3000000 --seed 7
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Sequence, Tuple
+
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from benchmarks.seed import FAMILY, GIVEN, MIDDLE, PLACES, create_schema
+from db import rollup
+from db.connection import DATABASE_URL, engine
+from db.models.bills import PaymentPlan, format_payment_plan_id
+from db.models.bills_details import PaymentPlanDetail
+from db.models.customers import customers as Customer
+from db.models.projects import Projects
+
+# tần suất họ (%) ở Việt Nam, theo thứ tự FAMILY
+FAMILY_WEIGHTS = [38, 11, 9.5, 7, 5.1, 5.1, 4.5, 3.9, 3.9, 2.1, 2, 1.4, 1.3, 1.3, 1, 0.5]
+COMPANY_TYPES = ["Công ty TNHH", "Công ty CP", "Công ty CP Xây dựng", "Công ty TNHH Thương mại", "Tổng công ty"]
+COMPANY_WORDS = ["Hoà Bình", "Đông Á", "Phú Cường", "Thành Công", "Hưng Thịnh", "An Phát", "Việt Long", "Sông Đà", "Trường Sơn", "Minh Khang"]
+PROJECT_KINDS = ["Nhà xưởng", "Chung cư", "Trường học", "Bệnh viện", "Cầu", "Đường", "Khu đô thị", "Văn phòng", "Nhà máy", "Trung tâm thương mại"]
+PRODUCTS = ["Xi măng", "Thép", "Cát", "Đá", "Gạch", "Sơn", "Nhân công", "Thiết bị", "Vận chuyển", "Giám sát"]
+TEAMS = [f"Đội thi công {i}" for i in range(1, 13)]
+
+# mùa vụ: trọng số theo tháng (1..12) và theo năm
+MONTH_WEIGHTS = [9, 3, 7, 8, 8, 9, 8, 8, 9, 10, 11, 14]
+YEARS = [2020, 2021, 2022, 2023, 2024, 2025]
+YEAR_WEIGHTS = [6, 9, 12, 15, 18, 20]
+FIRST_DAY = date(YEARS[0], 1, 1)
+LAST_DAY = date(YEARS[-1], 12, 31)
+
+MAX_DETAILS = 6          # id chi tiết = số thứ tự hóa đơn * MAX_DETAILS + k
+DETAIL_COUNT_WEIGHTS = [15, 15, 10, 5, 3, 2]  # 1..6 dòng chi tiết
+
+# các cột nạp (tên cột lấy từ model, kiểm tra lúc import)
+CUSTOMER_COLUMNS = ("id", "name", "email", "phone_number", "status", "created_at", "is_deleted", "is_contractor", "tax_code")
+PROJECT_COLUMNS = ("id", "name", "status", "customer_id", "company_name", "project_number", "created_at", "is_deleted",
+                   "plan_start_date", "plan_complete_date", "completed_date", "end_date",
+                   "tax", "amount", "entry_cost", "profit", "profit_rate", "paid_amount")
+PLAN_COLUMNS = ("id", "project_id", "customer_id", "payer_code", "amount", "tax", "tax_percent", "taxable", "status",
+                "created_at", "is_deleted", "execution_team", "execution_date", "plan_date", "pay_for_year", "pay_for_month")
+DETAIL_COLUMNS = ("id", "payment_plan_id", "attribute", "product", "quantity", "unit_price", "amount", "tax_amount", "created_at")
+
+
+def _check_columns(model, columns: Sequence[str]) -> str:
+    table = model.__table__
+    missing = [c for c in columns if c not in table.c]
+    if missing:
+        raise RuntimeError(f"{table.name} has no column(s) {missing}")
+    return f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+
+
+COPY_SQL = {
+    "customers": _check_columns(Customer, CUSTOMER_COLUMNS),
+    "projects": _check_columns(Projects, PROJECT_COLUMNS),
+    "payment_plans": _check_columns(PaymentPlan, PLAN_COLUMNS),
+    "payment_plan_details": _check_columns(PaymentPlanDetail, DETAIL_COLUMNS),
+}
+
+
+# ---- RNG -------------------------------------------------------------------------
+_MASK = (1 << 64) - 1
+
+
+def _hash_unit(seed: int, stream: int, i: int) -> float:
+    """Số thực [0, 1) xác định bởi (seed, stream, i) (splitmix64), không cần trạng thái chung."""
+    z = (seed * 0x9E3779B97F4A7C15 + stream * 0xBF58476D1CE4E5B9 + i * 0x94D049BB133111EB) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return ((z ^ (z >> 31)) >> 11) / float(1 << 53)
+
+
+def _chunk_rng(seed: int, table: str, chunk: int) -> random.Random:
+    return random.Random(f"{seed}:{table}:{chunk}")
+
+
+def _skewed(u: float, n: int, skew: float) -> int:
+    """Chỉ số 1..n lệch về các số nhỏ: P(chỉ số <= n*x) = x**(1/skew)."""
+    return 1 + min(n - 1, int(n * u ** skew))
+
+
+def _seasonal_day(u_year: float, u_month: float, u_day: float) -> date:
+    year = _pick(YEARS, _YEAR_CUM, u_year)
+    month = _pick(range(1, 13), _MONTH_CUM, u_month)
+    return date(year, month, 1 + int(u_day * 28))
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return [c / total for c in out]
+
+
+def _pick(values, cum: List[float], u: float):
+    return values[min(bisect_right(cum, u), len(values) - 1)]
+
+
+_YEAR_CUM = _cumulative(YEAR_WEIGHTS)
+_MONTH_CUM = _cumulative(MONTH_WEIGHTS)
+
+
+# ---- Định dạng COPY (text) -------------------------------------------------------
+def _v(x) -> str:
+    if x is None:
+        return "\\N"
+    if x is True:
+        return "t"
+    if x is False:
+        return "f"
+    return str(x)
+
+
+def _line(values) -> str:
+    return "\t".join(map(_v, values)) + "\n"
+
+
+# ---- Thuộc tính dự án tính lại được từ số thứ tự ----------------------------------
+class Plan:
+    def __init__(self, seed: int, customers: int, projects: int, bills: int, skew: float):
+        self.seed, self.customers, self.projects, self.bills, self.skew = seed, customers, projects, bills, skew
+
+    def project_customer(self, p: int) -> int:
+        return _skewed(_hash_unit(self.seed, 1, p), self.customers, self.skew)
+
+    def project_created(self, p: int) -> date:
+        return _seasonal_day(_hash_unit(self.seed, 2, p), _hash_unit(self.seed, 3, p), _hash_unit(self.seed, 4, p))
+
+
+def _customers(plan: Plan, start: int, end: int, rng: random.Random) -> Iterator[str]:
+    for c in range(start, end):
+        if rng.random() < 0.15:
+            name = f"{rng.choice(COMPANY_TYPES)} {rng.choice(COMPANY_WORDS)} {rng.choice(PLACES)}"
+            tax_code = f"0{rng.randrange(100000000, 999999999)}"
+        else:
+            family = rng.choices(FAMILY, cum_weights=_FAMILY_CUM)[0]
+            name = f"{family} {rng.choice(MIDDLE)} {rng.choice(GIVEN)}"
+            tax_code = None
+        created = _seasonal_day(rng.random(), rng.random(), rng.random())
+        yield _line((
+            f"CS{c:08d}", name, f"customer{c}@example.com", f"09{c % 100000000:08d}", 1,
+            datetime(created.year, created.month, created.day, rng.randrange(7, 19), rng.randrange(60)),
+            rng.random() < 0.02, rng.random() < 0.03, tax_code,
+        ))
+
+
+def _projects(plan: Plan, start: int, end: int, rng: random.Random) -> Iterator[str]:
+    for p in range(start, end):
+        created = plan.project_created(p)
+        amount = min(int(rng.lognormvariate(20.5, 1.1)) // 1000 * 1000, 10 ** 13)
+        entry_cost = int(amount * rng.uniform(0.6, 0.95))
+        start_day = created + timedelta(days=rng.randrange(7, 90))
+        complete_day = start_day + timedelta(days=rng.randrange(60, 720))
+        done = complete_day < LAST_DAY and rng.random() < 0.7
+        yield _line((
+            f"PJ{p:08d}", f"{rng.choice(PROJECT_KINDS)} {rng.choice(PLACES)} {p}", 2 if done else 1,
+            f"CS{plan.project_customer(p):08d}", None, f"{created:%y}-1-PRJ-{p:06d}",
+            datetime(created.year, created.month, created.day, rng.randrange(7, 19), rng.randrange(60)),
+            rng.random() < 0.02, start_day, complete_day,
+            complete_day + timedelta(days=rng.randrange(-30, 90)) if done else None,
+            complete_day + timedelta(days=rng.randrange(90, 365)),
+            10, amount, entry_cost, amount - entry_cost, round((amount - entry_cost) / amount, 4) if amount else 0,
+            int(amount * rng.random()) if done else 0,
+        ))
+
+
+def _bills(plan: Plan, start: int, end: int, rng: random.Random) -> Tuple[List[str], List[str]]:
+    # đường nóng (hàng chục triệu dòng): ghi thẳng dòng COPY bằng f-string, ngày dạng ordinal
+    plans, details = [], []
+    rand = rng.random
+    n_projects, skew = plan.projects, plan.skew / 2
+    project_cache: dict = {}
+    detail_counts = [k for k, w in enumerate(DETAIL_COUNT_WEIGHTS, 1) for _ in range(w)]
+    statuses = ("DRAFT", "ISSUED", "ISSUED", "PAID", "PAID", "PAID")
+    line_cap = 99_000_000 // MAX_DETAILS
+    for b in range(start, end):
+        p = _skewed(rand(), n_projects, skew)
+        project = project_cache.get(p)
+        if project is None:
+            project = project_cache[p] = (
+                f"PJ{p:08d}", f"CS{plan.project_customer(p):08d}", plan.project_created(p).toordinal(),
+            )
+        project_id, customer_id, project_day = project
+        day = max(project_day, _seasonal_day(rand(), rand(), rand()).toordinal())
+        created = f"{date.fromordinal(day)} {7 + int(rand() * 12):02d}:{int(rand() * 60):02d}:{int(rand() * 60):02d}"
+        execution = date.fromordinal(day + 15 + int(rand() * 105))
+        tax_percent = 8 if rand() < 0.3 else 10
+
+        amounts = [min(int(rng.lognormvariate(15, 1)) // 1000 * 1000, line_cap)
+                   for _ in range(detail_counts[int(rand() * len(detail_counts))])]
+        taxes = [a * tax_percent // 100 for a in amounts]
+        plan_id = format_payment_plan_id(b)
+        plans.append(
+            f"{plan_id}\t{project_id}\t{customer_id}\t{customer_id}\t{sum(amounts)}\t{sum(taxes)}\t{tax_percent}\tt\t"
+            f"{statuses[int(rand() * 6)]}\t{created}\t{'t' if rand() < 0.02 else 'f'}\t{TEAMS[int(rand() * len(TEAMS))]}\t"
+            f"{execution}\t{date.fromordinal(day)}\t{execution.year}\t{execution.month}\n"
+        )
+        detail_id = b * MAX_DETAILS
+        for k, a in enumerate(amounts):
+            qty = 1 + int(rand() * 49)
+            details.append(
+                f"{detail_id + k}\t{plan_id}\tHạng mục {k + 1}\t{PRODUCTS[int(rand() * len(PRODUCTS))]}\t{qty}\t"
+                f"{a / qty:.2f}\t{a}\t{taxes[k]}\t{created}\n"
+            )
+    return plans, details
+
+
+_FAMILY_CUM = [sum(FAMILY_WEIGHTS[:i + 1]) for i in range(len(FAMILY_WEIGHTS))]
+
+
+# ---- Worker ----------------------------------------------------------------------
+def _conninfo() -> str:
+    return make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _copy(conn, table: str, lines: List[str]) -> None:
+    with conn.cursor() as cur, cur.copy(COPY_SQL[table]) as copy:
+        copy.write("".join(lines).encode())
+
+
+def _load_chunk(job) -> Tuple[str, int]:
+    """Sinh và COPY 1 khối; mỗi khối 1 transaction trên connection riêng của worker."""
+    table, chunk, start, end, plan = job
+    rng = _chunk_rng(plan.seed, table, chunk)
+    with psycopg.connect(_conninfo()) as conn:
+        if table == "customers":
+            _copy(conn, table, list(_customers(plan, start, end, rng)))
+        elif table == "projects":
+            _copy(conn, table, list(_projects(plan, start, end, rng)))
+        else:
+            plans, details = _bills(plan, start, end, rng)
+            _copy(conn, "payment_plans", plans)
+            _copy(conn, "payment_plan_details", details)
+    return table, end - start
+
+
+def _jobs(table: str, n: int, chunk_size: int, plan: Plan):
+    for chunk, start in enumerate(range(1, n + 1, chunk_size)):
+        yield table, chunk, start, min(n + 1, start + chunk_size), plan
+
+
+def generate(customers: int, projects: int, bills: int, *, seed: int = 42, skew: float = 4.0,
+             workers: int = os.cpu_count() or 1, chunk_size: int = 50_000) -> dict:
+    create_schema()
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE payment_plan_details, payment_plans, projects, customers RESTART IDENTITY"))
+
+    plan = Plan(seed, customers, projects, bills, skew)
+    timings = {}
+    ctx = multiprocessing.get_context("spawn")  # không kế thừa connection/engine của process cha
+    with ctx.Pool(workers) as pool:
+        # bảng cha xong trước bảng con (FK payment_plan_details -> payment_plans trong cùng khối)
+        for table, n in (("customers", customers), ("projects", projects), ("payment_plans", bills)):
+            started = time.perf_counter()
+            done = 0
+            for _, rows in pool.imap_unordered(_load_chunk, _jobs(table, n, chunk_size, plan)):
+                done += rows
+            timings[table] = time.perf_counter() - started
+            print(f"  {table:<14} {done:>11,} rows {timings[table]:>7.1f}s {done / max(timings[table], 1e-9):>10,.0f} rows/s")
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT setval('payment_plans_id_seq', GREATEST(:n, 1))"), {"n": bills})
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('payment_plan_details', 'id'), "
+            "GREATEST((SELECT max(id) FROM payment_plan_details), 1))"
+        ))
+    started = time.perf_counter()
+    rollup.rebuild()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    timings["rollup+analyze"] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bills", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, help="Default: bills / 500 (min 1000)")
+    parser.add_argument("--projects", type=int, help="Default: bills / 20 (min 1000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=4.0, help="Power-law exponent; 1 = uniform")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=50_000, help="Rows per COPY / RNG block")
+    args = parser.parse_args()
+
+    customers = args.customers or max(1_000, args.bills // 500)
+    projects = args.projects or max(1_000, args.bills // 20)
+    print(f"Generating {customers:,} customers, {projects:,} projects, {args.bills:,} bills "
+          f"(seed={args.seed}, workers={args.workers})")
+    started = time.perf_counter()
+    generate(customers, projects, args.bills, seed=args.seed, skew=args.skew,
+             workers=args.workers, chunk_size=args.chunk)
+    print(f"✅ done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Sinh tải đồng thời lên 1 server MCP đang chạy (python main.py) qua /mcp, bằng
+N phiên fastmcp.Client.
+
+- closed: mỗi phiên gọi liên tục (gọi xong mới gọi tiếp, --think giây nghỉ),
+  throughput tự điều chỉnh theo tốc độ server
+- open  : lịch gọi cố định --rate req/s (đều hoặc Poisson), chia vòng tròn cho các
+  phiên, không chờ lần gọi trước; latency tính từ thời điểm lẽ ra phải gửi nên
+  thời gian xếp hàng khi server quá tải vẫn được tính (tránh coordinated omission)
+
+Các tool chọn ngẫu nhiên theo trọng số --mix (tham số lấy từ benchmarks.workload).
+Mỗi --interval giây in một dòng: số lần gọi, lỗi, throughput, p50/p95/p99/max
+và số request đang chờ, để thấy đuôi latency thay đổi theo thời gian.
+
+Tìm điểm bão hoà: chạy open-loop với nhiều mức --rates, mỗi mức --duration giây;
+mức đầu tiên mà throughput đạt < 95% mục tiêu hoặc lỗi > 1% được báo là bão hoà.
+
+    python main.py &
+    python -m benchmarks.loadgen --sessions 16 --mode closed --duration 60
+    python -m benchmarks.loadgen --sessions 32 --mode open --rates 20 40 80 160 --duration 30 --out load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastmcp import Client
+
+from benchmarks.workload import CASES
+
+DEFAULT_MIX = "search_bills=30,search_customers=20,project_search=15,cost_quotation_for_project=15,create_bill=10,update_customer=10"
+
+
+@dataclass
+class Sizes:
+    customers: int
+    projects: int
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'search_bills=30,create_bill=10' -> {tên tool trong main_mcp: trọng số}."""
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        matches = [t for t in CASES if t.endswith(name.strip())]
+        if len(matches) != 1:
+            raise SystemExit(f"unknown or ambiguous tool in --mix: {name!r} (choose from {', '.join(CASES)})")
+        mix[matches[0]] = float(weight or 1)
+    return mix
+
+
+def _percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return round(sorted_values[k], 2)
+
+
+@dataclass
+class Window:
+    """Thống kê của 1 khoảng thời gian (hoặc cả lần chạy)."""
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, ms: float, error: Optional[str]):
+        self.latencies.append(ms)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, seconds: float) -> dict:
+        lat = sorted(self.latencies)
+        n, err = len(lat), sum(self.errors.values())
+        return {
+            "calls": n,
+            "errors": err,
+            "error_rate": round(err / n, 4) if n else 0.0,
+            "throughput_rps": round(n / seconds, 1) if seconds else None,
+            "p50_ms": _percentile(lat, 50),
+            "p95_ms": _percentile(lat, 95),
+            "p99_ms": _percentile(lat, 99),
+            "max_ms": round(lat[-1], 2) if lat else None,
+            "error_types": dict(self.errors),
+        }
+
+
+class Recorder:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.total = Window()
+        self.per_tool: Dict[str, Window] = {}
+        self.window = Window()
+        self.windows: List[dict] = []
+        self.inflight = 0
+        self.started = time.perf_counter()
+        self.window_started = self.started
+
+    def record(self, tool: str, ms: float, error: Optional[str]):
+        self.total.record(ms, error)
+        self.window.record(ms, error)
+        self.per_tool.setdefault(tool, Window()).record(ms, error)
+
+    def flush(self, label: str = ""):
+        now = time.perf_counter()
+        w = self.window.summary(now - self.window_started)
+        w.update(t=round(now - self.started, 1), inflight=self.inflight, stage=label)
+        self.windows.append(w)
+        print(f"{w['t']:>7.1f} {label:>8} {w['calls']:>7} {w['errors']:>6} {w['throughput_rps'] or 0:>8.1f} "
+              f"{w['p50_ms'] or 0:>8.1f} {w['p95_ms'] or 0:>8.1f} {w['p99_ms'] or 0:>8.1f} {w['max_ms'] or 0:>9.1f} "
+              f"{self.inflight:>8}")
+        self.window = Window()
+        self.window_started = now
+
+    async def report_loop(self, label_fn):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush(label_fn())
+
+
+class Load:
+    def __init__(self, sessions: List[Client], mix: Dict[str, float], sizes: Sizes, recorder: Recorder, seed: int):
+        self.sessions = sessions
+        self.tools = list(mix)
+        self.weights = list(mix.values())
+        self.sizes = sizes
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.seq = 0
+
+    async def call(self, session: Client, scheduled: Optional[float] = None):
+        tool = self.rng.choices(self.tools, self.weights)[0]
+        self.seq += 1
+        args = CASES[tool](self.sizes, self.seq)
+        started = scheduled if scheduled is not None else time.perf_counter()
+        self.recorder.inflight += 1
+        error = None
+        try:
+            await session.call_tool(tool, args)
+        except Exception as e:  # lỗi tool, timeout, mất kết nối... đều tính là lỗi
+            error = type(e).__name__
+        finally:
+            self.recorder.inflight -= 1
+        self.recorder.record(tool, (time.perf_counter() - started) * 1000, error)
+
+    async def closed(self, duration: float, think: float):
+        deadline = time.perf_counter() + duration
+
+        async def loop(session: Client):
+            while time.perf_counter() < deadline:
+                await self.call(session)
+                if think:
+                    await asyncio.sleep(think)
+
+        await asyncio.gather(*(loop(s) for s in self.sessions))
+
+    async def open(self, duration: float, rate: float, poisson: bool, max_inflight: int) -> int:
+        """Gửi theo lịch `rate` req/s; trả số lần bỏ không gửi vì vượt max_inflight."""
+        tasks, dropped = set(), 0
+        start = time.perf_counter()
+        next_at, i = start, 0
+        while next_at < start + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.recorder.inflight >= max_inflight:
+                dropped += 1
+                self.recorder.record("dropped", 0.0, "Dropped")
+            else:
+                task = asyncio.create_task(self.call(self.sessions[i % len(self.sessions)], scheduled=next_at))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            i += 1
+            next_at += self.rng.expovariate(rate) if poisson else 1.0 / rate
+        if tasks:
+            await asyncio.gather(*tasks)
+        return dropped
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/mcp")
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent fastmcp Client sessions")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--rates", type=float, nargs="+", default=[50.0], help="Open-loop target req/s (one stage per rate)")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Open-loop: drop calls beyond this many pending")
+    parser.add_argument("--think", type=float, default=0.0, help="Closed-loop pause between calls (s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per stage")
+    parser.add_argument("--interval", type=float, default=5.0, help="Report window (s)")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--customers", type=int, default=1_000, help="Customer ids CS00000001.. to draw from")
+    parser.add_argument("--projects", type=int, default=10_000, help="Project ids PJ00000001.. to draw from")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-call timeout (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write windows and summaries as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    recorder = Recorder(args.interval)
+    stage = {"label": args.mode}
+    stages = []
+
+    async with AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(Client(args.url, timeout=args.timeout))
+                    for _ in range(args.sessions)]
+        load = Load(sessions, mix, Sizes(args.customers, args.projects), recorder, args.seed)
+        print(f"{args.sessions} sessions -> {args.url}, mix: {mix}")
+        print(f"{'t (s)':>7} {'stage':>8} {'calls':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'max ms':>9} {'inflight':>8}")
+        reporter = asyncio.create_task(recorder.report_loop(lambda: stage["label"]))
+        try:
+            if args.mode == "closed":
+                started = time.perf_counter()
+                await load.closed(args.duration, args.think)
+                stages.append({"mode": "closed", **recorder.total.summary(time.perf_counter() - started)})
+            else:
+                for rate in args.rates:
+                    stage["label"] = f"{rate:g}/s"
+                    before = Window(list(recorder.total.latencies), dict(recorder.total.errors))
+                    started = time.perf_counter()
+                    dropped = await load.open(args.duration, rate, args.poisson, args.max_inflight)
+                    elapsed = time.perf_counter() - started
+                    w = Window(recorder.total.latencies[len(before.latencies):],
+                               {k: v - before.errors.get(k, 0) for k, v in recorder.total.errors.items()
+                                if v - before.errors.get(k, 0)})
+                    stages.append({"mode": "open", "target_rps": rate, "dropped": dropped, **w.summary(elapsed)})
+        finally:
+            reporter.cancel()
+        recorder.flush(stage["label"])
+
+    print(f"\n{'stage':>10} {'target':>8} {'req/s':>8} {'err %':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>9}")
+    saturated = None
+    for s in stages:
+        target = s.get("target_rps")
+        print(f"{s['mode']:>10} {target or '-':>8} {s['throughput_rps'] or 0:>8.1f} {s['error_rate'] * 100:>6.2f} "
+              f"{s['p50_ms'] or 0:>8.1f} {s['p95_ms'] or 0:>8.1f} {s['p99_ms'] or 0:>8.1f} {s['max_ms'] or 0:>9.1f}")
+        if saturated is None and target and (s["throughput_rps"] < 0.95 * target or s["error_rate"] > 0.01):
+            saturated = target
+    if args.mode == "open":
+        print(f"\nsaturation: {f'at ~{saturated:g} req/s' if saturated else 'not reached'}")
+
+    print(f"\n{'tool':<40} {'calls':>7} {'err %':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    elapsed = time.perf_counter() - recorder.started
+    per_tool = {tool: w.summary(elapsed) for tool, w in sorted(recorder.per_tool.items())}
+    for tool, s in per_tool.items():
+        print(f"{tool:<40} {s['calls']:>7} {s['error_rate'] * 100:>6.2f} {s['p50_ms'] or 0:>8.1f} {s['p99_ms'] or 0:>8.1f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"args": vars(args), "stages": stages, "per_tool": per_tool, "windows": recorder.windows},
+                      f, indent=2, ensure_ascii=False)
+        print(f"\n✅ results written to {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""
+Tham số gọi tool dùng chung cho benchmarks.suite (in-process / HTTP) và
+benchmarks.loadgen (client thuần qua /mcp, không import server hay DB).
+
+Mỗi case nhận số lượng khách hàng / dự án đang có và số thứ tự lần gọi, trả dict
+tham số; id sinh theo định dạng của benchmarks.seed / benchmarks.generate
+(CS%08d, PJ%08d) nên luôn trỏ tới bản ghi có thật.
+"""
+from typing import Callable, Dict, Protocol
+
+
+class Sizes(Protocol):
+    customers: int
+    projects: int
+
+
+def _cs(n: int) -> str:
+    return f"CS{n:08d}"
+
+
+def _pj(n: int) -> str:
+    return f"PJ{n:08d}"
+
+
+def _bill(s: Sizes, i: int) -> dict:
+    c = 1 + i % s.customers
+    return {
+        "customer_id": _cs(c), "payer_code": _cs(c), "project_id": _pj(1 + i % s.projects),
+        "expected_date_of_payment": "2025-01-01", "execution_team": "Team bench",
+        "details": [{"attribute": "Item", "product": "Product", "quantity": 1, "tax_amount": 1000, "amount": 10000}] * 3,
+    }
+
+
+# tool (tên trong main_mcp) -> tham số cho lần gọi thứ i
+CASES: Dict[str, Callable[[Sizes, int], dict]] = {
+    "customers_search_customers": lambda s, i: {"name": ["Dat", "nguyen van", "Huong", "Trn Dc"][i % 4]},
+    "customers_update_customer": lambda s, i: {"id": _cs(1 + i % s.customers), "email": f"customer{1 + i % s.customers}@example.com"},
+    "projects_project_search": lambda s, i: {"name": ["Ha Noi", "Da Nang", "hai phong 12"][i % 3]},
+    "projects_cost_quotation_for_project": lambda s, i: {"ids": [_pj(1 + (i * 7 + k) % s.projects) for k in range(3)]},
+    "projects_project_list_by_customer_ids": lambda s, i: {"ids": [_cs(1 + i % s.customers)]},
+    "bills_search_bills": lambda s, i: {"customer_ids": [_cs(1 + i % s.customers), _cs(1 + (i + 1) % s.customers)]},
+    "bills_aggregate_bills": lambda s, i: {"group_by": ["customer_id", "month", "project_id"][i % 3], "created_at_from": "2024-01-01"},
+    "bills_create_bill": lambda s, i: {"information_create_invoice": _bill(s, i)},
+    "bills_create_bills_batch": lambda s, i: {"bills": [_bill(s, i * 100 + k) for k in range(100)]},
+}
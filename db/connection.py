@@ -1,21 +1,152 @@
 # db/connection.py
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+"""
+Engine / session của app, tạo lần đầu được dùng (không phải lúc import).
+
+`from db.connection import engine` vẫn dùng như cũ: thuộc tính module engine,
+async_engine, SessionLocal, AsyncSessionLocal, replica_engine, DATABASE_URL,
+ASYNC_DATABASE_URL, DATABASE_REPLICA_URL được tạo qua __getattr__ khi được hỏi tới
+lần đầu, Base cũng vậy. Nhờ đó server khởi động (list_tools) không phải import
+SQLAlchemy / psycopg hay mở pool, và import được khi chưa có DATABASE_URL (vd. lúc
+build manifest tool).
+
+replica_engine: engine async tới bản sao chỉ đọc DATABASE_REPLICA_URL (None nếu
+không đặt); chọn engine cho từng lần đọc ở mcp_servers/replica.py. Ghi luôn đi qua
+engine / async_engine (primary).
+
+on_engines_created(callback): chạy callback(sync_engines()) ngay khi engine được
+tạo (hoặc ngay lập tức nếu đã tạo) - dùng để gắn event (mcp_servers.metrics).
+"""
 import os
+import threading
+from typing import Any, Callable, Dict, List
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+_ENGINE_NAMES = ("engine", "async_engine", "SessionLocal", "AsyncSessionLocal", "replica_engine",
+                 "DATABASE_URL", "ASYNC_DATABASE_URL", "DATABASE_REPLICA_URL")
+_lock = threading.Lock()
+_created = False
+_callbacks: List[Callable] = []
+
+
+def _async_url(url: str) -> str:
+    """Đổi driver của DATABASE_URL sang psycopg (v3) để dùng được với asyncio."""
+    from sqlalchemy.engine import make_url
+
+    return make_url(url).set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+
+
+def _prepare_threshold():
+    """DB_PREPARE_THRESHOLD: psycopg PREPARE phía server câu lệnh chạy >= N lần trên 1 connection; 'off' để tắt."""
+    value = os.getenv("DB_PREPARE_THRESHOLD", "5").strip().lower()
+    return None if value in ("off", "none", "") else int(value)
+
+
+def _create_engines() -> None:
+    global _created
+    with _lock:
+        if _created:
+            return
+        from sqlalchemy import create_engine
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        from sqlalchemy.orm import sessionmaker
+
+        from db.pool import engine_options, instrument  # đọc DB_POOL_* sau load_dotenv
+        from db import slow_query  # đọc SLOW_QUERY_* sau load_dotenv
+
+        database_url = os.getenv("DATABASE_URL")
+        if not database_url:
+            raise RuntimeError("DATABASE_URL is not set")
+        # ASYNC_DATABASE_URL cho phép chỉ định riêng; mặc định suy ra từ DATABASE_URL
+        async_database_url = os.getenv("ASYNC_DATABASE_URL") or _async_url(database_url)
+
+        # pool cấu hình qua biến môi trường DB_POOL_* (xem db/pool.py)
+        engine = create_engine(database_url, **engine_options())
+        instrument(engine)
+
+        def create_async(url):
+            # Engine async dùng cho các MCP tool (không chặn event loop của FastMCP)
+            async_engine = create_async_engine(
+                url,
+                connect_args={"prepare_threshold": _prepare_threshold()},
+                **engine_options(async_=True),
+            )
+            instrument(async_engine.sync_engine)
+            # log câu SQL vượt SLOW_QUERY_MS + EXPLAIN chạy nền (xem db/slow_query.py)
+            slow_query.install(async_engine)
+            return async_engine
+
+        async_engine = create_async(async_database_url)
+        replica_url = os.getenv("DATABASE_REPLICA_URL") or None
+        replica_engine = create_async(_async_url(replica_url)) if replica_url else None
+
+        globals().update(
+            DATABASE_URL=database_url,
+            ASYNC_DATABASE_URL=async_database_url,
+            DATABASE_REPLICA_URL=replica_url,
+            engine=engine,
+            SessionLocal=sessionmaker(bind=engine, autocommit=False, autoflush=False),
+            async_engine=async_engine,
+            AsyncSessionLocal=async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False),
+            replica_engine=replica_engine,
+        )
+        _created = True
+        for callback in _callbacks:
+            callback(sync_engines())
+
+
+def __getattr__(name: str):
+    if name in _ENGINE_NAMES:
+        _create_engines()
+        return globals()[name]
+    if name == "Base":
+        from sqlalchemy.orm import declarative_base
+
+        with _lock:
+            return globals().setdefault("Base", declarative_base())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def sync_engines() -> Dict[str, Any]:
+    """Tên -> engine sync (async dùng .sync_engine) của các engine đã tạo; rỗng nếu chưa
+    tạo (số liệu pool không tự mở engine)."""
+    if not _created:
+        return {}
+    g = globals()
+    engines = {"async": g["async_engine"].sync_engine, "sync": g["engine"]}
+    if g["replica_engine"] is not None:
+        engines["replica"] = g["replica_engine"].sync_engine
+    return engines
+
+
+def on_engines_created(callback: Callable) -> None:
+    with _lock:
+        _callbacks.append(callback)
+        created = _created
+    if created:
+        callback(sync_engines())
+
+
+def _reset_pools_after_fork():
+    """Process con (worker của serve.py) không dùng chung connection với process cha:
+    bỏ pool kế thừa mà không đóng socket của cha, connection mới mở khi cần."""
+    global _lock
+    _lock = threading.Lock()
+    for engine in sync_engines().values():
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-Base = declarative_base()
 
 def test_connection():
     """Kiểm tra kết nối DB"""
+    from sqlalchemy import text
+
     try:
-        with engine.connect() as conn:
+        with __getattr__("engine").connect() as conn:
             conn.execute(text("SELECT 1"))
         print("✅ Database connected successfully!")
     except Exception as e:
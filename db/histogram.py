@@ -0,0 +1,35 @@
+"""Histogram latency (ms) dùng chung cho số liệu pool / tool; không phụ thuộc SQLAlchemy."""
+from bisect import bisect_left
+
+# cận trên (ms) của các bucket histogram; bucket cuối là +Inf
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def snapshot(self) -> dict:
+        # dạng cộng dồn như Prometheus: số mẫu <= le
+        buckets, running = {}, 0
+        for le, n in zip([*map(str, BUCKETS_MS), "+Inf"], self.counts):
+            running += n
+            buckets[le] = running
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "buckets_ms": buckets,
+        }
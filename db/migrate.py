@@ -0,0 +1,105 @@
+"""
+Áp dụng các migration SQL trong db/migrations theo thứ tự tên file.
+
+    python -m db.migrate          # áp dụng migration chưa chạy
+    python -m db.migrate --list   # xem trạng thái
+
+Phiên bản đã chạy được lưu trong bảng schema_migrations. File bắt đầu bằng
+dòng `-- migrate:no-transaction` được chạy từng câu lệnh ở chế độ autocommit
+(bắt buộc cho CREATE INDEX CONCURRENTLY); các file khác chạy trong 1 transaction.
+"""
+import argparse
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import text
+
+from db.connection import engine
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+NO_TRANSACTION = "-- migrate:no-transaction"
+
+
+def _split_statements(sql: str) -> List[str]:
+    """Tách file SQL thành từng câu lệnh, bỏ qua ';' nằm trong khối $$ ... $$."""
+    statements, buf, in_dollar = [], [], False
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not buf and (not stripped or stripped.startswith("--")):
+            continue
+        buf.append(line)
+        if line.count("$$") % 2 == 1:
+            in_dollar = not in_dollar
+        if not in_dollar and stripped.endswith(";"):
+            statements.append("\n".join(buf))
+            buf = []
+    if buf and "".join(buf).strip():
+        statements.append("\n".join(buf))
+    return statements
+
+
+def _ensure_table():
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(255) PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+
+
+def applied_versions() -> set:
+    _ensure_table()
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def pending() -> List[Path]:
+    done = applied_versions()
+    return [p for p in sorted(MIGRATIONS_DIR.glob("*.sql")) if p.stem not in done]
+
+
+def apply(path: Path):
+    sql = path.read_text(encoding="utf-8")
+    statements = _split_statements(sql)
+    record = text("INSERT INTO schema_migrations (version) VALUES (:v)")
+
+    if sql.lstrip().startswith(NO_TRANSACTION):
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            for stmt in statements:
+                conn.exec_driver_sql(stmt)
+            conn.execute(record, {"v": path.stem})
+    else:
+        with engine.begin() as conn:
+            for stmt in statements:
+                conn.exec_driver_sql(stmt)
+            conn.execute(record, {"v": path.stem})
+
+
+def migrate() -> List[str]:
+    applied = []
+    for path in pending():
+        print(f"→ applying {path.name}")
+        apply(path)
+        applied.append(path.stem)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply SQL migrations in db/migrations")
+    parser.add_argument("--list", action="store_true", help="Show applied / pending migrations")
+    args = parser.parse_args()
+
+    if args.list:
+        done = applied_versions()
+        for p in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            print(f"{'[x]' if p.stem in done else '[ ]'} {p.name}")
+        return
+
+    applied = migrate()
+    print(f"✅ {len(applied)} migration(s) applied" if applied else "✅ Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
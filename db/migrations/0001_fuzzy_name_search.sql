@@ -0,0 +1,20 @@
+-- migrate:no-transaction
+-- Tìm tên khách hàng / dự án không dấu, có sai chính tả (pg_trgm + unaccent).
+-- Index tạo CONCURRENTLY để không khoá ghi trên bảng đang chạy.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() là STABLE (phụ thuộc search_path) nên không dùng được trong index;
+-- bọc lại bằng hàm IMMUTABLE với dictionary chỉ định rõ schema.
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_name_search
+    ON customers USING gin (lower(f_unaccent(name)) gin_trgm_ops)
+    WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_name_search
+    ON projects USING gin (lower(f_unaccent(name)) gin_trgm_ops)
+    WHERE is_deleted = false;
@@ -0,0 +1,20 @@
+-- Bảng tổng hợp hóa đơn theo dự án (billed vs quoted không cần gộp payment_plans).
+-- bills_create / create_bills_batch cộng dồn trong cùng transaction với INSERT;
+-- dựng lại toàn bộ: python -m db.rollup --rebuild
+
+CREATE TABLE IF NOT EXISTS project_billing (
+    project_id      VARCHAR(15) PRIMARY KEY,
+    billed_amount   NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    billed_tax      NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    bill_count      INTEGER NOT NULL DEFAULT 0,
+    last_bill_date  TIMESTAMP,
+    updated_at      TIMESTAMP
+);
+
+-- backfill từ dữ liệu hiện có
+INSERT INTO project_billing (project_id, billed_amount, billed_tax, bill_count, last_bill_date, updated_at)
+SELECT project_id, coalesce(sum(amount), 0), coalesce(sum(tax), 0), count(*), max(created_at), now()
+FROM payment_plans
+WHERE is_deleted = false AND project_id IS NOT NULL
+GROUP BY project_id
+ON CONFLICT (project_id) DO NOTHING;
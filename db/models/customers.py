@@ -15,6 +15,7 @@ class customers(Base):
     updated_at = Column(DateTime)
     updated_by = Column(String)
     is_deleted = Column(Boolean)
+    is_contractor = Column(Boolean)
     tax_code = Column(String)
     cooperation_membership_fee = Column(Float)
     various_membership_fee = Column(Numeric)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, Numeric
+from db.connection import Base
+
+
+class ProjectBilling(Base):
+    """Tổng hóa đơn (payment_plans chưa xoá) theo dự án; cập nhật trong cùng transaction tạo hóa đơn (db/rollup.py)."""
+    __tablename__ = "project_billing"
+
+    project_id = Column(String(15), primary_key=True)
+    billed_amount = Column(Numeric(18, 2), nullable=False, default=0)
+    billed_tax = Column(Numeric(18, 2), nullable=False, default=0)
+    bill_count = Column(Integer, nullable=False, default=0)
+    last_bill_date = Column(DateTime)
+    updated_at = Column(DateTime)
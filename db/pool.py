@@ -0,0 +1,151 @@
+"""
+Cấu hình connection pool từ biến môi trường + số liệu pool (checkout, chờ, timeout).
+
+    DB_POOL_SIZE=5               # số connection giữ sẵn
+    DB_MAX_OVERFLOW=10           # số connection mở thêm khi pool hết
+    DB_POOL_TIMEOUT=30           # giây chờ connection trước khi báo lỗi
+    DB_POOL_RECYCLE=-1           # giây; >0 thì đóng connection cũ hơn giá trị này
+    DB_POOL_PRE_PING=idle        # always | idle | never
+    DB_POOL_PRE_PING_IDLE=30     # (idle) chỉ ping connection đã nằm trong pool quá N giây
+
+pre-ping "always" tốn 1 round trip cho mỗi lần checkout; "idle" chỉ ping
+connection lâu không dùng (là những connection dễ bị server/firewall cắt).
+"""
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from db.histogram import Histogram
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+PRE_PING = os.getenv("DB_POOL_PRE_PING", "idle").lower()
+PRE_PING_IDLE = float(os.getenv("DB_POOL_PRE_PING_IDLE", "30"))
+
+if PRE_PING not in PRE_PING_STRATEGIES:
+    raise ValueError(f"DB_POOL_PRE_PING must be one of {', '.join(PRE_PING_STRATEGIES)}, got {PRE_PING!r}")
+
+class PoolMetrics:
+    __slots__ = ("wait", "checkout", "timeouts", "connects", "pings", "ping_failures")
+
+    def __init__(self):
+        self.wait = Histogram()      # chờ lấy connection từ pool (kể cả mở mới khi overflow)
+        self.checkout = Histogram()  # toàn bộ checkout: chờ + pre-ping + event
+        self.timeouts = 0
+        self.connects = 0
+        self.pings = 0
+        self.ping_failures = 0
+
+
+class _MeteredPool:
+    """Mixin đo thời gian cho QueuePool; số liệu giữ qua recreate() (engine.dispose())."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.metrics.checkout.observe((time.perf_counter() - started) * 1000)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.wait.observe((time.perf_counter() - started) * 1000)
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+
+class MeteredAsyncAdaptedQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(async_: bool = False) -> dict:
+    """Tham số pool cho create_engine / create_async_engine."""
+    return {
+        "poolclass": MeteredAsyncAdaptedQueuePool if async_ else MeteredQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": PRE_PING == "always",
+    }
+
+
+def instrument(engine) -> None:
+    """Gắn event đếm connect và pre-ping kiểu 'idle' vào engine (sync; async dùng .sync_engine)."""
+    metrics: PoolMetrics = engine.pool.metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    if PRE_PING != "idle":
+        return
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < PRE_PING_IDLE:
+            return
+        metrics.pings += 1
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception as e:
+            metrics.ping_failures += 1
+            # pool bỏ connection này và thử lấy connection khác
+            raise exc.DisconnectionError(f"pre-ping failed: {e}") from e
+
+
+def pool_stats(engine) -> Optional[dict]:
+    pool = engine.pool
+    metrics: Optional[PoolMetrics] = getattr(pool, "metrics", None)
+    if metrics is None:
+        return None
+    return {
+        "config": {
+            "pool_size": pool.size(),
+            "max_overflow": MAX_OVERFLOW,
+            "timeout_seconds": pool.timeout(),
+            "recycle_seconds": POOL_RECYCLE,
+            "pre_ping": PRE_PING,
+            "pre_ping_idle_seconds": PRE_PING_IDLE if PRE_PING == "idle" else None,
+        },
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "connects": metrics.connects,
+        "timeouts": metrics.timeouts,
+        "pings": metrics.pings,
+        "ping_failures": metrics.ping_failures,
+        "wait": metrics.wait.snapshot(),
+        "checkout": metrics.checkout.snapshot(),
+    }
@@ -0,0 +1,145 @@
+"""
+Bảng tổng hợp project_billing: tổng tiền / thuế / số hóa đơn / ngày hóa đơn gần
+nhất theo dự án, để trả billed-vs-quoted mà không gộp lại payment_plans.
+
+- apply_bills(): gọi trong transaction tạo hóa đơn (bills_create,
+  create_bills_batch), cộng dồn bằng 1 câu INSERT ... ON CONFLICT DO UPDATE cho
+  mọi dự án của batch.
+- rebuild(): dựng lại từ payment_plans (backfill, hoặc sau khi payment_plans bị
+  sửa ngoài các tool, ví dụ xoá mềm bằng SQL tay).
+
+    python -m db.rollup --rebuild                  # dựng lại toàn bộ
+    python -m db.rollup --rebuild --project PJ00000001 PJ00000002
+    python -m db.rollup --check                    # liệt kê dự án bị lệch
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+
+from db import statements
+from db import connection
+
+# cộng dồn; EXCLUDED là giá trị của batch đang ghi
+_APPLY_SQL = """
+    INSERT INTO project_billing AS b (project_id, billed_amount, billed_tax, bill_count, last_bill_date, updated_at)
+    SELECT * FROM unnest(
+        CAST(:project_ids AS varchar[]), CAST(:amounts AS numeric[]), CAST(:taxes AS numeric[]),
+        CAST(:counts AS int[]), CAST(:last_dates AS timestamp[]), CAST(:updated_ats AS timestamp[])
+    )
+    ON CONFLICT (project_id) DO UPDATE SET
+        billed_amount = b.billed_amount + EXCLUDED.billed_amount,
+        billed_tax = b.billed_tax + EXCLUDED.billed_tax,
+        bill_count = b.bill_count + EXCLUDED.bill_count,
+        last_bill_date = GREATEST(b.last_bill_date, EXCLUDED.last_bill_date),
+        updated_at = EXCLUDED.updated_at
+"""
+
+_AGGREGATE_SQL = """
+    SELECT project_id, coalesce(sum(amount), 0) AS billed_amount, coalesce(sum(tax), 0) AS billed_tax,
+           count(*) AS bill_count, max(created_at) AS last_bill_date
+    FROM payment_plans
+    WHERE is_deleted = false AND project_id IS NOT NULL {project_filter}
+    GROUP BY project_id
+"""
+
+
+async def apply_bills(db, plan_rows: Iterable[dict]) -> None:
+    """
+    Cộng các hóa đơn vừa INSERT (dict cột payment_plans: project_id, amount, tax,
+    created_at) vào project_billing, trên session/connection `db` của transaction đó.
+    1 câu lệnh cho cả batch; dự án sắp theo id để các transaction song song khoá
+    dòng cùng thứ tự (tránh deadlock).
+    """
+    totals: dict = defaultdict(lambda: [0, 0, 0, None])
+    for row in plan_rows:
+        if row.get("project_id") is None or row.get("is_deleted"):
+            continue
+        t = totals[row["project_id"]]
+        t[0] += row.get("amount") or 0
+        t[1] += row.get("tax") or 0
+        t[2] += 1
+        created_at = row.get("created_at")
+        if created_at is not None and (t[3] is None or created_at > t[3]):
+            t[3] = created_at
+    if not totals:
+        return
+
+    project_ids = sorted(totals)
+    now = datetime.now()
+    await statements.execute(db, _APPLY_SQL, {
+        "project_ids": project_ids,
+        "amounts": [totals[p][0] for p in project_ids],
+        "taxes": [totals[p][1] for p in project_ids],
+        "counts": [totals[p][2] for p in project_ids],
+        "last_dates": [totals[p][3] for p in project_ids],
+        "updated_ats": [now] * len(project_ids),
+    })
+
+
+def rebuild(project_ids: Optional[List[str]] = None) -> int:
+    """
+    Dựng lại project_billing từ payment_plans (toàn bộ hoặc chỉ `project_ids`).
+    payment_plans bị khoá SHARE trong lúc dựng để không có hóa đơn mới chen vào
+    giữa lúc xoá và tính lại. Trả số dòng được ghi.
+    """
+    project_filter = "AND project_id = ANY(:ids)" if project_ids else ""
+    params = {"ids": project_ids} if project_ids else {}
+    with connection.engine.begin() as conn:
+        conn.execute(text("LOCK TABLE payment_plans IN SHARE MODE"))
+        if project_ids:
+            conn.execute(text("DELETE FROM project_billing WHERE project_id = ANY(:ids)"), params)
+        else:
+            conn.execute(text("DELETE FROM project_billing"))
+        result = conn.execute(text(f"""
+            INSERT INTO project_billing (project_id, billed_amount, billed_tax, bill_count, last_bill_date, updated_at)
+            SELECT a.*, now() FROM ({_AGGREGATE_SQL.format(project_filter=project_filter)}) a
+        """), params)
+        return result.rowcount
+
+
+def check(limit: int = 20) -> List[dict]:
+    """Dự án có project_billing khác với tổng thực tế từ payment_plans."""
+    with connection.engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT coalesce(a.project_id, b.project_id) AS project_id,
+                   b.billed_amount AS rollup_amount, a.billed_amount AS actual_amount,
+                   b.bill_count AS rollup_count, a.bill_count AS actual_count
+            FROM ({_AGGREGATE_SQL.format(project_filter="")}) a
+            FULL JOIN project_billing b ON b.project_id = a.project_id
+            WHERE a.billed_amount IS DISTINCT FROM b.billed_amount
+               OR a.billed_tax IS DISTINCT FROM b.billed_tax
+               OR a.bill_count IS DISTINCT FROM b.bill_count
+               OR a.last_bill_date IS DISTINCT FROM b.last_bill_date
+            ORDER BY 1
+            LIMIT :limit
+        """), {"limit": limit}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the project_billing rollup table")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--rebuild", action="store_true", help="Recompute rows from payment_plans")
+    group.add_argument("--check", action="store_true", help="List projects whose rollup differs from payment_plans")
+    parser.add_argument("--project", nargs="+", help="Only these project ids (with --rebuild)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        n = rebuild(args.project)
+        print(f"✅ project_billing rebuilt: {n} project(s)")
+        return
+
+    drift = check()
+    if not drift:
+        print("✅ project_billing matches payment_plans")
+        return
+    for r in drift:
+        print(r)
+    raise SystemExit(f"❌ {len(drift)} project(s) out of date (showing up to 20); run --rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Log câu SQL chậm + EXPLAIN (ANALYZE, BUFFERS) chạy nền, gom theo "dạng" câu lệnh.
+
+Các tool search sinh nhiều câu SQL khác nhau tuỳ bộ lọc; mỗi câu được chuẩn hoá
+(literal số / chuỗi -> ?, gộp khoảng trắng) thành 1 dạng, có id ngắn. Mọi câu
+lệnh của engine async đều được cộng vào thống kê của dạng đó (số lần, tổng / max
+thời gian); câu nào vượt ngưỡng thì:
+
+- ghi log (logger "slow_query", mức WARNING) kèm dạng, thời gian, tham số
+- (câu chỉ đọc) đặt lịch EXPLAIN (ANALYZE, BUFFERS) trên 1 connection riêng, trong
+  transaction READ ONLY có statement_timeout, sau khi request đã trả kết quả; mỗi
+  dạng tối đa 1 lần mỗi SLOW_QUERY_EXPLAIN_INTERVAL giây, chạy lần lượt từng cái
+
+Tham số trong log / resource bị che (chỉ giữ kiểu, độ dài danh sách, số nguyên)
+khi SLOW_QUERY_REDACT=on (mặc định) vì có thể chứa email, số điện thoại...
+
+    SLOW_QUERY_MS=200                  # ngưỡng (ms); off để tắt hẳn
+    SLOW_QUERY_EXPLAIN=on              # off: chỉ log, không EXPLAIN
+    SLOW_QUERY_EXPLAIN_INTERVAL=300    # giây giữa 2 lần EXPLAIN cùng 1 dạng
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS=10000
+    SLOW_QUERY_REDACT=on
+    SLOW_QUERY_MAX_SHAPES=500          # số dạng tối đa được theo dõi
+
+Tổng hợp xếp theo tổng thời gian: summary() (resource stats://slow_queries).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("slow_query")
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "on", "true", "yes")
+
+
+def _threshold() -> Optional[float]:
+    value = os.getenv("SLOW_QUERY_MS", "200").strip().lower()
+    return None if value in ("off", "none", "") else float(value)
+
+
+THRESHOLD_MS = _threshold()
+EXPLAIN = _flag("SLOW_QUERY_EXPLAIN", "on")
+EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+REDACT = _flag("SLOW_QUERY_REDACT", "on")
+MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "500"))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w%$])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+# câu có thể ghi dữ liệu thì không EXPLAIN ANALYZE (ANALYZE chạy thật câu lệnh)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|COPY|LOCK|CREATE|ALTER|DROP|CALL|DO)\b", re.I)
+
+
+@lru_cache(maxsize=2048)
+def normalize(statement: str) -> Tuple[str, str]:
+    """(id dạng, câu SQL đã chuẩn hoá); cache theo chuỗi SQL vì các tool lặp lại cùng câu."""
+    shape = _SPACE.sub(" ", _NUMBER.sub("?", _STRING.sub("?", statement))).strip()
+    return hashlib.blake2b(shape.encode(), digest_size=6).hexdigest(), shape
+
+
+def _explainable(statement: str) -> bool:
+    head = statement.lstrip(" \n\t(")[:6].upper()
+    return head == "SELECT" or (head.startswith("WITH") and not _WRITES.search(statement))
+
+
+def redact(parameters: Any) -> Any:
+    """Chỉ giữ số nguyên / bool / None; chuỗi -> '<str>', danh sách -> '<list[n]>'."""
+    if not REDACT:
+        return parameters
+    if isinstance(parameters, dict):
+        return {k: redact(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return f"<list[{len(parameters)}]>"
+    if parameters is None or isinstance(parameters, (bool, int)):
+        return parameters
+    return f"<{type(parameters).__name__}>"
+
+
+class Shape:
+    __slots__ = ("id", "sql", "calls", "total_ms", "max_ms", "slow", "last_slow_at", "last_params",
+                 "plan", "plan_ms", "plan_at", "explain_error", "_explain_after")
+
+    def __init__(self, shape_id: str, sql: str):
+        self.id = shape_id
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.last_slow_at: Optional[float] = None
+        self.last_params: Any = None
+        self.plan: Optional[List[str]] = None
+        self.plan_ms: Optional[float] = None   # thời gian lúc câu lệnh chậm được EXPLAIN
+        self.plan_at: Optional[float] = None
+        self.explain_error: Optional[str] = None
+        self._explain_after = 0.0
+
+    def snapshot(self, with_plan: bool) -> dict:
+        d = {
+            "id": self.id,
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else None,
+            "max_ms": round(self.max_ms, 1),
+            "slow_calls": self.slow,
+            "last_slow_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.last_slow_at)) if self.last_slow_at else None,
+            "last_slow_params": self.last_params,
+        }
+        if with_plan:
+            d.update(plan=self.plan, plan_for_ms=self.plan_ms, explain_error=self.explain_error)
+        return d
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self.shapes: Dict[str, Shape] = {}
+        self.dropped_shapes = 0
+        self.explains = 0
+        self.explain_failures = 0
+        self.explain_skipped = 0   # đang có EXPLAIN khác chạy
+        self._explaining = False
+        self._tasks: set = set()
+
+    def install(self, async_engine) -> None:
+        """Gắn event vào engine async (primary hoặc replica; EXPLAIN chạy trên chính engine đó)."""
+        if THRESHOLD_MS is None:
+            return
+        from sqlalchemy import event
+
+        sync_engine = async_engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info["slow_query_started"] = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop("slow_query_started", None)
+            # bỏ qua câu lệnh của chính _explain()
+            if started is not None and not statement.startswith(("EXPLAIN", "SET ")):
+                self.record(statement, parameters, (time.perf_counter() - started) * 1000, executemany, async_engine)
+
+    def record(self, statement: str, parameters: Any, ms: float, executemany: bool = False,
+               async_engine=None) -> None:
+        shape_id, sql = normalize(statement)
+        shape = self.shapes.get(shape_id)
+        if shape is None:
+            if len(self.shapes) >= MAX_SHAPES:
+                self.dropped_shapes += 1
+                return
+            shape = self.shapes[shape_id] = Shape(shape_id, sql)
+        shape.calls += 1
+        shape.total_ms += ms
+        if ms > shape.max_ms:
+            shape.max_ms = ms
+        if ms < THRESHOLD_MS:
+            return
+
+        shape.slow += 1
+        shape.last_slow_at = time.time()
+        shape.last_params = redact(parameters)
+        logger.warning("slow query %s %.1f ms: %s params=%s", shape_id, ms, sql, shape.last_params)
+        if (EXPLAIN and async_engine is not None and not executemany and _explainable(statement)
+                and time.monotonic() >= shape._explain_after):
+            self._schedule(async_engine, shape, statement, parameters, ms)
+
+    def _schedule(self, async_engine, shape: Shape, statement: str, parameters: Any, ms: float) -> None:
+        if self._explaining:
+            self.explain_skipped += 1
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # câu lệnh chạy ngoài event loop
+            return
+        self._explaining = True
+        shape._explain_after = time.monotonic() + EXPLAIN_INTERVAL
+        task = loop.create_task(self._explain(async_engine, shape, statement, parameters, ms))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, async_engine, shape: Shape, statement: str, parameters: Any, ms: float) -> None:
+        try:
+            async with async_engine.connect() as conn:
+                # READ ONLY: kể cả khi nhận diện sai, EXPLAIN ANALYZE không ghi được gì; luôn rollback
+                await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                shape.plan = [row[0] for row in result]
+                await conn.rollback()
+            shape.plan_ms = round(ms, 1)
+            shape.plan_at = time.time()
+            shape.explain_error = None
+            self.explains += 1
+            logger.warning("slow query %s plan:\n%s", shape.id, "\n".join(shape.plan))
+        except Exception as e:
+            self.explain_failures += 1
+            shape.explain_error = f"{type(e).__name__}: {e}"
+        finally:
+            self._explaining = False
+
+    def summary(self, limit: int = 20) -> dict:
+        ranked = sorted(self.shapes.values(), key=lambda s: s.total_ms, reverse=True)
+        return {
+            "threshold_ms": THRESHOLD_MS,
+            "explain": EXPLAIN,
+            "redact": REDACT,
+            "shapes": len(self.shapes),
+            "dropped_shapes": self.dropped_shapes,
+            "explains": self.explains,
+            "explain_failures": self.explain_failures,
+            "explain_skipped": self.explain_skipped,
+            # dạng đã từng chậm kèm plan; còn lại chỉ số liệu
+            "top_by_total_time": [s.snapshot(with_plan=s.slow > 0) for s in ranked[:limit]],
+        }
+
+    def reset(self) -> None:
+        self.shapes.clear()
+        self.dropped_shapes = self.explains = self.explain_failures = self.explain_skipped = 0
+
+
+slow_queries = SlowQueryLog()
+
+install = slow_queries.install
+summary = slow_queries.summary
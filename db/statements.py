@@ -0,0 +1,49 @@
+"""
+Cache câu lệnh SQL đã compile cho các truy vấn đọc động.
+
+Các tool dựng SQL từ những bộ lọc có mặt, cột sort và chiều sort, nên cùng một
+"shape" luôn cho ra cùng một chuỗi SQL. compiled() đổi chuỗi đó (tham số dạng
+:name) sang cú pháp của driver đúng 1 lần cho mỗi shape; execute() chạy thẳng
+bằng exec_driver_sql, bỏ qua bước parse text() + compile của SQLAlchemy.
+
+Vì chuỗi SQL ổn định (danh sách id truyền bằng mảng `= ANY(:ids)` thay vì
+IN mở rộng theo số phần tử), psycopg tự PREPARE phía server các shape chạy
+>= DB_PREPARE_THRESHOLD lần trên cùng connection.
+
+    STATEMENT_CACHE_SIZE=512   # số shape giữ trong cache
+"""
+import os
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+STATEMENT_CACHE_SIZE = int(os.getenv("STATEMENT_CACHE_SIZE", "512"))
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def compiled(sql: str, dialect) -> str:
+    """SQL dạng :name -> chuỗi theo paramstyle của driver (psycopg: %(name)s)."""
+    return str(text(sql).compile(dialect=dialect))
+
+
+async def execute(conn, sql: str, params: dict):
+    """
+    Chạy `sql` trên AsyncConnection (hoặc connection đang dùng của AsyncSession)
+    với câu lệnh đã compile sẵn. Tham số không dùng trong câu lệnh được bỏ qua.
+    """
+    if isinstance(conn, AsyncSession):
+        conn = await conn.connection()
+    return await conn.exec_driver_sql(compiled(sql, conn.dialect), params)
+
+
+def cache_info() -> dict:
+    info = compiled.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else None,
+    }
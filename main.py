@@ -1,18 +1,154 @@
+# Khởi động nhanh: module tool, SQLAlchemy / psycopg và engine chỉ được import / tạo
+# khi cần (xem mcp_servers/tool_manifest.py, db/connection.py); resource / route bên
+# dưới import trong thân hàm.
 from fastmcp import FastMCP
-from mcp_servers.mcp_projects import mcp_projects
-from mcp_servers.mcp_bills import mcp_bills
-from mcp_servers.mcp_payment import mcp_payment
-from mcp_servers.mcp_customer import mcp_customers
+from mcp_servers import metrics, response_cache, tool_manifest
+from db import connection, slow_query
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import TYPE_CHECKING, Optional
 import asyncio
+import os
+
+if TYPE_CHECKING:
+    from mcp_servers import export
 
 main_mcp = FastMCP(name="MainApp")
+# số liệu theo tool: latency, thời gian DB / serialize (TOOL_METRICS=off để tắt)
+metrics.instrument(main_mcp)
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "on", "true", "yes")
+
+
+def http_options(stateless: Optional[bool] = None) -> dict:
+    """stateless_http / json_response cho transport HTTP (/mcp).
+
+    MCP_STATELESS_HTTP=on: mỗi POST /mcp tự đủ, server không giữ session trong bộ
+    nhớ -> chạy nhiều replica sau load balancer không cần sticky routing (mọi tool
+    của main_mcp là request/response, không dùng Context / notification).
+    MCP_JSON_RESPONSE (mặc định theo chế độ stateless): trả application/json thay
+    vì mở stream SSE cho mỗi request. Không đặt gì: session + SSE như trước.
+    """
+    if stateless is None:
+        stateless = _flag(os.getenv("MCP_STATELESS_HTTP", "off"))
+    json_response = os.getenv("MCP_JSON_RESPONSE")
+    return {
+        "stateless_http": stateless,
+        "json_response": stateless if json_response is None else _flag(json_response),
+    }
+
+
+@main_mcp.resource("stats://ref_cache", description="Hit/miss/eviction counters of the customer/project reference cache")
+def ref_cache_stats() -> dict:
+    from mcp_servers import ref_cache
+
+    return ref_cache.stats()
+
+
+@main_mcp.resource("stats://response_cache", description="Read-tool response cache: entries, bytes, hit rate, evictions, tag invalidations (RESPONSE_CACHE=on to enable)")
+def response_cache_stats() -> dict:
+    return response_cache.stats()
+
+
+@main_mcp.resource("stats://db_pool", description="Connection pool usage: checked-out/idle/overflow connections, wait and checkout latency histograms")
+def db_pool_stats() -> dict:
+    from db.pool import pool_stats
+
+    return {name: pool_stats(e) for name, e in connection.sync_engines().items()}
+
+
+@main_mcp.resource("stats://replica", description="Read routing: reads served by the replica (DATABASE_REPLICA_URL) vs. the primary after a write in the same session or while the replica is down")
+def replica_stats() -> dict:
+    from mcp_servers import replica
+
+    return replica.stats()
+
+
+@main_mcp.resource("stats://statement_cache", description="Hits/misses of the compiled statement cache shared by the search tools")
+def statement_cache_stats() -> dict:
+    from db import statements
+
+    return statements.cache_info()
+
+
+@main_mcp.resource("stats://exports", description="Streaming export counters per entity: exports, rows, seconds, rows/s")
+def export_stats() -> dict:
+    from mcp_servers import export
+
+    return export.stats()
+
+
+@main_mcp.resource("stats://slow_queries", description="SQL shapes ranked by total time, with slow-call counts, redacted parameters and the captured EXPLAIN (ANALYZE, BUFFERS) plan (SLOW_QUERY_MS threshold)")
+def slow_query_stats() -> dict:
+    return slow_query.summary()
+
+
+@main_mcp.resource("stats://tools", description="Per-tool calls, errors and latency histograms split into DB time, rows fetched and serialization time")
+def tool_stats() -> dict:
+    return metrics.stats()
+
+
+@main_mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_route(request: Request):
+    """Số liệu tool / pool / cache dạng text của Prometheus."""
+    body = metrics.prometheus(connection.sync_engines(), response_cache.stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+def _query_filters(request: Request, spec: "export.Export") -> dict:
+    # Tham số danh sách: lặp lại (?customer_ids=a&customer_ids=b) hoặc cách nhau bởi dấu phẩy
+    unknown = sorted(set(request.query_params) - set(spec.filters) - {"format", "limit"})
+    if unknown:
+        raise ValueError(f"tham số không hợp lệ: {', '.join(unknown)}; bộ lọc phải là một trong {sorted(spec.filters)}")
+    filters = {}
+    for key in request.query_params:
+        if key in ("format", "limit"):
+            continue
+        if key in spec.list_params:
+            filters[key] = [v for raw in request.query_params.getlist(key) for v in raw.split(",") if v]
+        else:
+            filters[key] = request.query_params[key]
+    return filters
+
+
+@main_mcp.custom_route("/export/{entity}", methods=["GET"])
+async def export_route(request: Request):
+    """Xuất NDJSON/CSV bằng server-side cursor; bộ lọc giống các tool search."""
+    from mcp_servers import export
+
+    entity = request.path_params["entity"]
+    spec = export.EXPORTS.get(entity)
+    if spec is None:
+        return JSONResponse({"error": f"entity phải là một trong {sorted(export.EXPORTS)}"}, status_code=404)
+    fmt = request.query_params.get("format", "ndjson")
+    if fmt not in export.FORMATS:
+        return JSONResponse({"error": f"format phải là một trong {sorted(export.FORMATS)}"}, status_code=400)
+    try:
+        limit = int(request.query_params["limit"]) if "limit" in request.query_params else None
+        if limit is not None and limit < 0:
+            raise ValueError
+    except ValueError:
+        return JSONResponse({"error": "limit phải là số nguyên >= 0"}, status_code=400)
+    try:
+        filters = _query_filters(request, spec)
+        # kiểm tra bộ lọc (ngày ISO 8601, ...) trước khi bắt đầu stream
+        spec.where(**filters)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return StreamingResponse(
+        export.stream_export(entity, fmt, filters, limit),
+        media_type=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{fmt}"'},
+    )
+
 
 async def setup():
-    await main_mcp.import_server(mcp_projects, prefix="projects")
-    await main_mcp.import_server(mcp_bills, prefix="bills")
-    await main_mcp.import_server(mcp_payment, prefix="payment")
-    await main_mcp.import_server(mcp_customers, prefix="customers")
+    # "lazy": tool đăng ký từ manifest build sẵn; "eager": import_server như trước
+    return await tool_manifest.register(main_mcp)
 
 if __name__ == "__main__":
     asyncio.run(setup())
-    main_mcp.run(transport="http", host="0.0.0.0", port=8000)
\ No newline at end of file
+    main_mcp.run(transport="http", host="0.0.0.0", port=int(os.getenv("PORT", "8000")), **http_options())
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Xuất hàng loạt (NDJSON / CSV) cho bills, projects, customers.
+
+Kết quả của tool MCP là một message trọn vẹn nên không stream được; export chạy
+qua route HTTP `/export/{entity}` (đăng ký trong main.py) và trả dữ liệu dần dần.
+Dữ liệu đọc bằng server-side cursor (`conn.stream`), mỗi lần lấy
+EXPORT_CHUNK_ROWS dòng, ghi ra rồi bỏ, nên bộ nhớ không tăng theo số dòng.
+
+Bộ lọc giống hệt các tool search (bills_where / projects_where /
+customers_where); thứ tự ổn định theo id.
+
+    EXPORT_CHUNK_ROWS=5000   # số dòng mỗi lần fetch từ cursor
+
+    curl 'http://localhost:8000/export/bills?format=csv&customer_ids=CS00000001,CS00000002'
+"""
+import csv
+import inspect
+import io
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.sql import text
+
+from db import statements
+from mcp_servers.mcp_bills import bills_where
+from mcp_servers.mcp_customer import customers_where
+from mcp_servers.mcp_projects import projects_where
+from mcp_servers import replica
+from mcp_servers.serialize import serializer_for
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+@dataclass(frozen=True)
+class Export:
+    select_sql: str
+    from_sql: str
+    where: Callable[..., tuple]
+    order_sql: str
+    list_params: tuple = ()
+
+    @property
+    def filters(self) -> Tuple[str, ...]:
+        """Tên các bộ lọc nhận được (tham số của hàm where)."""
+        return tuple(inspect.signature(self.where).parameters)
+
+
+EXPORTS: Dict[str, Export] = {
+    "bills": Export(
+        select_sql="""
+            SELECT
+                pl.id as bill_number,
+                pl.created_at,
+                pl.tax,
+                pl.amount,
+                pl.customer_id,
+                c.name as customer_name,
+                pl.project_id,
+                p.name as project_name,
+                pl.execution_date as expected_date_of_payment
+        """,
+        from_sql="FROM payment_plans pl "
+                 "LEFT JOIN projects p ON p.id = pl.project_id "
+                 "LEFT JOIN customers c ON c.id = pl.customer_id",
+        where=bills_where,
+        order_sql="ORDER BY pl.id",
+        list_params=("project_ids", "customer_ids"),
+    ),
+    "projects": Export(
+        select_sql="""
+            SELECT
+                p.id,
+                p.name,
+                p.project_number,
+                p.created_at,
+                p.completed_date,
+                p.end_date,
+                p.is_deleted
+        """,
+        from_sql="FROM projects p",
+        where=projects_where,
+        order_sql="ORDER BY p.id",
+    ),
+    "customers": Export(
+        select_sql="""
+            SELECT
+                c.id,
+                c.name,
+                c.email,
+                c.phone_number,
+                c.created_at,
+                c.is_deleted
+        """,
+        from_sql="FROM customers c",
+        where=customers_where,
+        order_sql="ORDER BY c.id",
+    ),
+}
+
+
+class ExportStats:
+    __slots__ = ("exports", "failed", "rows", "seconds", "last_rows_per_sec")
+
+    def __init__(self):
+        self.exports = self.failed = self.rows = 0
+        self.seconds = 0.0
+        self.last_rows_per_sec: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "exports": self.exports,
+            "failed": self.failed,
+            "rows": self.rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows / self.seconds) if self.seconds else None,
+            "last_rows_per_sec": self.last_rows_per_sec,
+        }
+
+
+_stats: Dict[str, ExportStats] = {name: ExportStats() for name in EXPORTS}
+
+
+# entity -> {tên cột: OID kiểu} của select_sql; kết quả stream không cho xem
+# cursor.description nên lấy 1 lần mỗi process bằng câu cùng SELECT với WHERE false
+_column_types: Dict[str, Dict[str, int]] = {}
+
+
+async def _types_of(conn, entity: str) -> Dict[str, int]:
+    types = _column_types.get(entity)
+    if types is None:
+        spec = EXPORTS[entity]
+        result = await statements.execute(conn, f"{spec.select_sql} {spec.from_sql} WHERE false", {})
+        types = _column_types[entity] = {col[0]: col[1] for col in result.cursor.description}
+    return types
+
+
+def _csv_chunk(rows) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+async def stream_export(
+    entity: str,
+    fmt: str = "ndjson",
+    filters: Optional[dict] = None,
+    limit: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Sinh các khối bytes của file export. `filters` là tham số của hàm *_where
+    tương ứng (ví dụ bills: project_ids, customer_ids, created_at_from, created_at_to).
+    """
+    spec = EXPORTS[entity]
+    if fmt not in FORMATS:
+        raise ValueError(f"format phải là một trong {sorted(FORMATS)}")
+    where_sql, params = spec.where(**(filters or {}))
+    sql = f"{spec.select_sql} {spec.from_sql} WHERE {where_sql} {spec.order_sql}"
+    if limit is not None:
+        sql += " LIMIT :_limit"
+        params["_limit"] = limit
+
+    stats = _stats[entity]
+    rows_out = 0
+    started = time.perf_counter()
+    try:
+        async with replica.connect() as conn:
+            types = await _types_of(conn, entity)
+            result = await conn.stream(text(sql), params)
+            ser = serializer_for([(name, types[name]) for name in result.keys()])
+            if fmt == "csv":
+                yield _csv_chunk([ser.keys]).encode()
+            async for rows in result.partitions(EXPORT_CHUNK_ROWS):
+                if fmt == "ndjson":
+                    yield b"".join(ser.ndjson(rows))
+                else:
+                    yield _csv_chunk(ser.tuples(rows)).encode()
+                rows_out += len(rows)
+    except BaseException:
+        stats.failed += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.exports += 1
+        stats.rows += rows_out
+        stats.seconds += elapsed
+        stats.last_rows_per_sec = round(rows_out / elapsed) if elapsed else None
+
+
+def stats() -> dict:
+    return {entity: s.as_dict() for entity, s in _stats.items()}
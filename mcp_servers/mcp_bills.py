@@ -1,37 +1,24 @@
-from typing import Annotated, Optional, List, Union, TypedDict, Literal, cast
-from sqlalchemy.sql import text
-from db.connection import SessionLocal
+from typing import Annotated, Dict, Optional, List, Sequence, Tuple, Union, TypedDict, Literal, cast
+from sqlalchemy import insert
+from db import connection
 import json
-from datetime import date, datetime, time
-from decimal import Decimal
-from uuid import UUID
-from enum import Enum
-from pydantic import BaseModel, Field, field_validator, ValidationInfo
-from db.models.bills import PaymentPlan
+from datetime import date, datetime
+from pydantic import BaseModel, Field, field_validator, ValidationError, ValidationInfo
+from db.models.bills import PaymentPlan, NEXT_PAYMENT_PLAN_ID, allocate_payment_plan_ids
 from db.models.bills_details import PaymentPlanDetail
 from fastmcp import FastMCP
+from db import rollup, statements
+from mcp_servers import ref_cache, replica, response_cache
+from mcp_servers.pagination import (
+    CountMode, COUNT_MODE_DESCRIPTION, DEFAULT_COUNT_MODE,
+    CURSOR_DESCRIPTION, DEFAULT_PAGE_SIZE, PAGE_SIZE_DESCRIPTION,
+    check_iso_date, fetch_page, keyset, norm_page_size,
+)
+from mcp_servers.serialize import serializer_for
 
 mcp_bills = FastMCP("bills")
 
 
-def _to_jsonable(v):
-    if isinstance(v, (datetime, date, time)):
-        return v.isoformat()
-    if isinstance(v, Decimal):
-        return float(v)
-    if isinstance(v, UUID):
-        return str(v)
-    if isinstance(v, Enum):
-        return v.value
-    return v
-
-def _rows_to_dicts(rows):
-    out = []
-    for r in rows:
-        m = r if isinstance(r, dict) else dict(r)
-        out.append({k: _to_jsonable(v) for k, v in m.items()})
-    return out
-
 def _norm_str_list(val: Optional[Union[List[str], str]]) -> Optional[List[str]]:
     if val is None:
         return None
@@ -54,30 +41,62 @@ def _norm_str_list(val: Optional[Union[List[str], str]]) -> Optional[List[str]]:
 
 class BillRow(TypedDict, total=False):
     bill_number:str
-    created_at:str
-    tax:float
-    amount:float
-    project_number:str
-    project_name:str
-    customer_id:str
-    project_id:str
-    customer_name:str
-    expected_date_of_payment:str
+    created_at:Optional[str]
+    tax:Optional[float]
+    amount:Optional[float]
+    project_number:Optional[str]
+    project_name:Optional[str]
+    customer_id:Optional[str]
+    project_id:Optional[str]
+    customer_name:Optional[str]
+    expected_date_of_payment:Optional[str]
 
 class BillsResult(TypedDict):
-    total: int
+    total: Optional[int]
+    total_is_estimate: bool  # True: total là ước lượng của planner (count_mode="estimate")
     returned: int
+    has_more: bool
+    next_cursor: Optional[str]
     order_by: str
     order_dir: Literal["asc", "desc"]
     items: List[BillRow]
 
 ALLOWED_ORDER_BY_BILLS = {"created_at", "amount", "project_id", "customer_id"}
 
+def bills_where(
+    project_ids: Optional[List[str]] = None,
+    customer_ids: Optional[List[str]] = None,
+    created_at_from: Optional[str] = None,
+    created_at_to: Optional[str] = None,
+) -> Tuple[str, dict]:
+    """Điều kiện WHERE (alias pl) + params cho các bộ lọc hóa đơn; dùng chung cho search và export."""
+    where_parts = ["pl.is_deleted = false"]
+    params: dict = {}
+
+    if project_ids:
+        where_parts.append("pl.project_id = ANY(:project_ids)")
+        params["project_ids"] = project_ids
+
+    if customer_ids:
+        where_parts.append("pl.customer_id = ANY(:customer_ids)")
+        params["customer_ids"] = customer_ids
+
+    if created_at_from:
+        where_parts.append("pl.created_at >= :created_at_from")
+        params["created_at_from"] = check_iso_date("created_at_from", created_at_from)
+
+    if created_at_to:
+        where_parts.append("pl.created_at <= :created_at_to")
+        params["created_at_to"] = check_iso_date("created_at_to", created_at_to)
+
+    return " AND ".join(where_parts), params
+
+
 @mcp_bills.tool(
     name="search_bills",
-    description="Query invoice lists by project and customer. Accepts array strings. Returns up to 5 rows."
+    description="Query invoice lists by project and customer. Accepts array strings. Returns one page (default 5 rows); pass next_cursor as cursor for the next page."
 )
-def bills_get(
+async def bills_get(
     # Cho phép Claude gửi list thật hoặc chuỗi JSON/CSV
     project_ids: Annotated[Optional[Union[List[str], str]], "List of project IDs"] = None,
     customer_ids: Annotated[Optional[Union[List[str], str]], "List of customer IDs"] = None,
@@ -85,10 +104,14 @@ def bills_get(
     created_at_to: Annotated[Optional[str], "Created date to (ISO 8601)"] = None,
     order_by: Annotated[str, f"Sort by one of: {', '.join(sorted(ALLOWED_ORDER_BY_BILLS))}"] = "created_at",
     order_dir: Annotated[Literal["asc", "desc"], "Sort direction"] = "desc",
+    count_mode: Annotated[CountMode, COUNT_MODE_DESCRIPTION] = DEFAULT_COUNT_MODE,
+    page_size: Annotated[int, PAGE_SIZE_DESCRIPTION] = DEFAULT_PAGE_SIZE,
+    cursor: Annotated[Optional[str], CURSOR_DESCRIPTION] = None,
 ) -> BillsResult:
     """
     Tìm hóa đơn theo danh sách project_id / customer_id và khoảng thời gian tạo.
-    Trả tối đa 5 bản ghi, mặc định sắp xếp theo created_at desc.
+    Trả một trang (mặc định 5 bản ghi), mặc định sắp xếp theo created_at desc;
+    trang sau lấy bằng cursor (keyset theo cột sort + id, không OFFSET).
     """
 
     # Chuẩn hoá input từ Claude
@@ -104,71 +127,193 @@ def bills_get(
     if order_dir not in ("asc", "desc"):
         order_dir = "desc"
 
-    where_parts = ["pl.is_deleted = false"]
-    params: dict = {}
-
-    if project_ids:
-        where_parts.append("pl.project_id IN :project_ids")
-        params["project_ids"] = tuple(project_ids)
-
-    if customer_ids:
-        where_parts.append("pl.customer_id IN :customer_ids")
-        params["customer_ids"] = tuple(customer_ids)
-
-    if created_at_from:
-        where_parts.append("pl.created_at >= :created_at_from")
-        params["created_at_from"] = created_at_from
-
-    if created_at_to:
-        where_parts.append("pl.created_at <= :created_at_to")
-        params["created_at_to"] = created_at_to
-
-    where_sql = " AND ".join(where_parts)
+    entry = response_cache.lookup(
+        "search_bills", (response_cache.PAYMENT_PLANS, response_cache.PROJECTS, response_cache.CUSTOMERS),
+        project_ids=project_ids, customer_ids=customer_ids,
+        created_at_from=created_at_from, created_at_to=created_at_to,
+        order_by=order_by, order_dir=order_dir, count_mode=count_mode,
+        page_size=norm_page_size(page_size), cursor=cursor,
+    )
+    if entry.hit:
+        return entry.value
 
-    # Đếm tổng
-    count_sql = f"""
-        SELECT COUNT(*) AS total
-        FROM payment_plans
-        WHERE {where_sql}
-    """
+    where_sql, params = bills_where(project_ids, customer_ids, created_at_from, created_at_to)
 
-    # Lấy dữ liệu (giới hạn 5)
-    data_sql = f"""
+    # tên dự án / khách hàng lấy từ ref_cache thay vì JOIN projects, customers
+    select_sql = """
         SELECT
             pl.id as bill_number,
             pl.created_at,
             pl.tax,
             pl.amount,
-            p.project_number,
-            p.name as project_name,
-            c.id as customer_id,
-            p.id as project_id,
-            c.name as customer_name,
+            pl.customer_id,
+            pl.project_id,
             pl.execution_date as expected_date_of_payment
-        FROM payment_plans pl 
-        LEFT JOIN projects p on p.id = pl.project_id
-        LEFT JOIN customers c on c.id = pl.customer_id
-        WHERE {where_sql}
-        ORDER BY {order_by} {order_dir}
-        LIMIT 5
     """
 
-    with SessionLocal() as db:
-        total = db.execute(text(count_sql), params).scalar_one()
-        rows = db.execute(text(data_sql), params).mappings().all()
+    # Lấy một trang (keyset theo cột sort + pl.id) kèm tổng theo count_mode
+    # trên Core connection (không cần ORM Session cho truy vấn đọc)
+    async with replica.connect() as conn:
+        page = await fetch_page(
+            conn, select_sql, "FROM payment_plans pl", where_sql, params,
+            limit=norm_page_size(page_size), count_mode=count_mode,
+            keyset=keyset(f"pl.{order_by}", "pl.id", order_by, order_dir, cursor),
+        )
+        refs = await ref_cache.lookup(
+            conn,
+            projects=[r["project_id"] for r in page.rows],
+            customers=[r["customer_id"] for r in page.rows],
+        )
 
-    items = _rows_to_dicts(rows)
+    for r in page.rows:
+        project_name, project_number = refs["projects"].get(r["project_id"], (None, None))
+        (customer_name,) = refs["customers"].get(r["customer_id"], (None,))
+        r.update(project_number=project_number, project_name=project_name, customer_name=customer_name)
+    items = page.rows
 
     # Ensure order_dir has the Literal type for the return value
     order_dir_out = cast(Literal["asc", "desc"], order_dir)
 
-    return {
-        "total": int(total),
+    return entry.store({
+        "total": page.total,
+        "total_is_estimate": page.total_is_estimate,
         "returned": len(items),
+        "has_more": page.has_more,
+        "next_cursor": page.next_cursor,
         "order_by": order_by,
         "order_dir": order_dir_out,
         "items": items,
-    }
+    })
+
+# chiều gộp -> cột payment_plans ("month" = năm + tháng thanh toán)
+AGGREGATE_DIMENSIONS = {
+    "month": ("pl.pay_for_year", "pl.pay_for_month"),
+    "project_id": ("pl.project_id",),
+    "customer_id": ("pl.customer_id",),
+    "execution_team": ("pl.execution_team",),
+}
+AGGREGATE_ORDER_BY = {"total_amount", "total_tax", "bill_count", "group"}
+MAX_AGGREGATE_GROUPS = 500
+
+
+class BillAggregateRow(TypedDict, total=False):
+    pay_for_year: Optional[int]
+    pay_for_month: Optional[int]
+    project_id: Optional[str]
+    project_name: Optional[str]
+    customer_id: Optional[str]
+    customer_name: Optional[str]
+    execution_team: Optional[str]
+    bill_count: int
+    total_amount: float
+    total_tax: float
+
+
+class BillsAggregateResult(TypedDict):
+    group_by: List[str]
+    total_groups: int
+    returned: int
+    bill_count: int
+    total_amount: float
+    total_tax: float
+    groups: List[BillAggregateRow]
+
+
+@mcp_bills.tool(
+    name="aggregate_bills",
+    description=(
+        "Totals of bills computed in the database: bill count, sum of amount and sum of tax, "
+        "grouped by any of month (pay_for_year/pay_for_month), project_id, customer_id, execution_team. "
+        "Same filters as search_bills. Use this instead of paging through search_bills to add up amounts."
+    ),
+)
+async def bills_aggregate(
+    group_by: Annotated[Union[List[str], str], f"Group by one or more of: {', '.join(AGGREGATE_DIMENSIONS)}"] = "customer_id",
+    project_ids: Annotated[Optional[Union[List[str], str]], "List of project IDs"] = None,
+    customer_ids: Annotated[Optional[Union[List[str], str]], "List of customer IDs"] = None,
+    created_at_from: Annotated[Optional[str], "Created date from (ISO 8601)"] = None,
+    created_at_to: Annotated[Optional[str], "Created date to (ISO 8601)"] = None,
+    order_by: Annotated[str, f"Sort groups by one of: {', '.join(sorted(AGGREGATE_ORDER_BY))}"] = "total_amount",
+    order_dir: Annotated[Literal["asc", "desc"], "Sort direction"] = "desc",
+    limit: Annotated[int, f"Max groups returned (1-{MAX_AGGREGATE_GROUPS})"] = 50,
+) -> BillsAggregateResult:
+    """
+    Gộp hóa đơn bằng 1 câu GROUP BY. Tổng toàn bộ (mọi nhóm) và số nhóm tính
+    bằng window function trên kết quả đã gộp, nên vẫn đúng khi chỉ trả `limit` nhóm.
+    """
+    dims = list(dict.fromkeys(_norm_str_list(group_by) or []))
+    unknown = [d for d in dims if d not in AGGREGATE_DIMENSIONS]
+    if not dims or unknown:
+        raise ValueError(f"group_by must be one or more of: {', '.join(AGGREGATE_DIMENSIONS)}")
+    if order_by not in AGGREGATE_ORDER_BY:
+        order_by = "total_amount"
+    if order_dir not in ("asc", "desc"):
+        order_dir = "desc"
+    limit = max(1, min(int(limit), MAX_AGGREGATE_GROUPS))
+
+    project_ids = _norm_str_list(project_ids)
+    customer_ids = _norm_str_list(customer_ids)
+
+    entry = response_cache.lookup(
+        "aggregate_bills", (response_cache.PAYMENT_PLANS, response_cache.PROJECTS, response_cache.CUSTOMERS),
+        group_by=",".join(dims), project_ids=project_ids, customer_ids=customer_ids,
+        created_at_from=created_at_from, created_at_to=created_at_to,
+        order_by=order_by, order_dir=order_dir, limit=limit,
+    )
+    if entry.hit:
+        return entry.value
+
+    where_sql, params = bills_where(project_ids, customer_ids, created_at_from, created_at_to)
+
+    group_cols = [col for d in dims for col in AGGREGATE_DIMENSIONS[d]]
+    select_cols = ", ".join(f"{col} AS {col.split('.', 1)[1]}" for col in group_cols)
+    group_order = ", ".join(f"{col} {order_dir} NULLS LAST" for col in group_cols)
+    order_sql = group_order if order_by == "group" else f"{order_by} {order_dir}, {group_order}"
+    sql = f"""
+        SELECT {select_cols},
+               count(*) AS bill_count,
+               coalesce(sum(pl.amount), 0) AS total_amount,
+               coalesce(sum(pl.tax), 0) AS total_tax,
+               count(*) OVER () AS _groups,
+               sum(count(*)) OVER () AS _bills,
+               sum(sum(pl.amount)) OVER () AS _amount,
+               sum(sum(pl.tax)) OVER () AS _tax
+        FROM payment_plans pl
+        WHERE {where_sql}
+        GROUP BY {", ".join(group_cols)}
+        ORDER BY {order_sql}
+        LIMIT :_limit
+    """
+    params["_limit"] = limit
+
+    async with replica.connect() as conn:
+        result = await statements.execute(conn, sql, params)
+        description = result.cursor.description
+        raw = result.all()
+        groups = serializer_for(description, drop=("_groups", "_bills", "_amount", "_tax")).dicts(raw)
+        refs = await ref_cache.lookup(
+            conn,
+            projects=[g["project_id"] for g in groups] if "project_id" in dims else [],
+            customers=[g["customer_id"] for g in groups] if "customer_id" in dims else [],
+        )
+
+    for g in groups:
+        if "project_id" in dims:
+            g["project_name"] = refs["projects"].get(g["project_id"], (None, None))[0]
+        if "customer_id" in dims:
+            g["customer_name"] = refs["customers"].get(g["customer_id"], (None,))[0]
+
+    total_groups, bill_count, total_amount, total_tax = raw[0][-4:] if raw else (0, 0, 0, 0)
+    return entry.store({
+        "group_by": dims,
+        "total_groups": total_groups,
+        "returned": len(groups),
+        "bill_count": int(bill_count),
+        "total_amount": float(total_amount or 0),
+        "total_tax": float(total_tax or 0),
+        "groups": groups,
+    })
+
 
 class BillDetailsInfo(BaseModel):
     attribute: str|None = Field(None, description="Name of the specific item or task in the invoice")
@@ -224,43 +369,80 @@ class BillCreateInfo(BaseModel):
 
     @field_validator("project_id", "customer_id", "payer_code")
     @classmethod
-    def _non_empty_and_exits_in_db(cls, v: str, info: ValidationInfo) -> str:
-        # 1) không rỗng
+    def _non_empty(cls, v: str, info: ValidationInfo) -> str:
+        # chỉ kiểm tra không rỗng; tồn tại trong DB do check_references() kiểm tra
+        # (1 truy vấn cho cả batch, trên cùng connection với câu INSERT)
         if not isinstance(v, str) or not v.strip():
             raise ValueError(f"{info.field_name} must not be empty")
-        v = v.strip()
-
-        # 2) ánh xạ field -> (table, column, nhãn)
-        #   - Điều chỉnh tên bảng/cột theo schema thực tế của bạn.
-        mapping = {
-            "project_id": ("projects", "id", "project_id"),
-            "customer_id": ("customers", "id", "customer_id"),
-            "payer_code": ("customers", "id", "payer_code"),
-        }
+        return v.strip()
 
-        table, col, label = mapping.get(info.field_name, (None, None, None))
-        if table is None:
-            # không ràng buộc DB cho field lạ
-            return v
 
-        # 3) kiểm tra tồn tại trong DB (truy vấn nhẹ, LIMIT 1)
-        with SessionLocal() as db:
-            row = db.execute(
-                text(f"SELECT 1 FROM {table} WHERE {col} = :val LIMIT 1"),
-                {"val": v}
-            ).first()
+# field -> bảng tham chiếu (kiểm tra id tồn tại)
+REFERENCE_FIELDS = {
+    "project_id": "projects",
+    "customer_id": "customers",
+    "payer_code": "customers",
+}
 
-        if row is None:
-            raise ValueError(f"{label} '{v}' does not exist in {table}.{col}")
 
-        return v
+async def check_references(db, bills: Sequence[BillCreateInfo]) -> Dict[int, List[str]]:
+    """
+    Kiểm tra project_id / customer_id / payer_code của nhiều hóa đơn.
+
+    Luôn đọc bằng 1 truy vấn trên session `db` của request (primary, cùng
+    connection/transaction với INSERT sau đó), không tin ref_cache: cache có thể
+    được nạp từ replica còn trễ. Kết quả được ghi lại vào ref_cache.
+    Trả {vị trí hóa đơn: [lỗi]}; dict rỗng nghĩa là mọi tham chiếu đều tồn tại.
+    """
+    wanted: Dict[str, list] = {t: [] for t in REFERENCE_FIELDS.values()}
+    for b in bills:
+        for field, table in REFERENCE_FIELDS.items():
+            wanted[table].append(getattr(b, field))
+    found = await ref_cache.lookup(db, refresh=True, **wanted)
+
+    errors: Dict[int, List[str]] = {}
+    for i, b in enumerate(bills):
+        for field, table in REFERENCE_FIELDS.items():
+            v = getattr(b, field)
+            if v not in found[table]:
+                errors.setdefault(i, []).append(f"{field} '{v}' does not exist in {table}.id")
+    return errors
+
+
+def _plan_row(plan_id: Optional[str], info: BillCreateInfo, now: datetime) -> dict:
+    row = {
+        "project_id": info.project_id,
+        "customer_id": info.customer_id,
+        "payer_code": info.payer_code,
+        "execution_team": info.execution_team,
+        "execution_date": date.fromisoformat(info.expected_date_of_payment) if info.expected_date_of_payment else None,
+        "amount": sum(int(d.amount) for d in info.details),
+        "tax": sum(int(d.tax_amount) for d in info.details),
+        "created_at": now,
+        "is_deleted": False,
+    }
+    if plan_id is not None:
+        row["id"] = plan_id
+    return row
+
+
+def _detail_row(plan_id: str, d: BillDetailsInfo, now: datetime) -> dict:
+    return {
+        "payment_plan_id": plan_id,
+        "attribute": d.attribute,
+        "product": d.product,
+        "quantity": d.quantity,
+        "amount": d.amount,
+        "tax_amount": d.tax_amount,
+        "created_at": now,
+    }
 
 
 @mcp_bills.tool(
     name="create_bill",
     description="Create bill",
 )
-def bills_create(
+async def bills_create(
     information_create_invoice: Annotated[BillCreateInfo, Field(description="Information Create Invoice")]
 ):
     """Create a PaymentPlan and its details from the provided BillCreateInfo.
@@ -270,75 +452,164 @@ def bills_create(
     - Persist a PaymentPlan record and PaymentPlanDetail rows inside a DB transaction.
     - Compute totals from details: amount (sum of detail.amount) and tax (sum of detail.tax_amount).
     - Return a summary dict with created payment plan id and created rows.
+
+    Số câu lệnh cố định, không phụ thuộc số dòng chi tiết: kiểm tra tham chiếu
+    (trên primary), INSERT plan ... RETURNING id (id sinh từ
+    sequence ngay trong câu lệnh), 1 INSERT nhiều dòng cho details ... RETURNING id,
+    1 upsert project_billing.
+    Không refresh sau commit: kết quả dựng từ input + RETURNING.
     """
 
     # Pydantic ensures the shape/validation; convert to native objects
     info: BillCreateInfo = information_create_invoice
+    now = datetime.now()
+    plan_row = _plan_row(None, info, now)
+
+    async with connection.AsyncSessionLocal() as db:
+        # kiểm tra tham chiếu trên cùng connection sẽ INSERT
+        errors = await check_references(db, [info])
+        if errors:
+            raise ValueError("; ".join(errors[0]))
+
+        plan_id = (await db.execute(
+            insert(PaymentPlan.__table__)
+            .values(id=NEXT_PAYMENT_PLAN_ID, **plan_row)
+            .returning(PaymentPlan.__table__.c.id)
+        )).scalar_one()
+
+        detail_ids = (await db.execute(
+            insert(PaymentPlanDetail.__table__)
+            .returning(PaymentPlanDetail.__table__.c.id, sort_by_parameter_order=True),
+            [_detail_row(plan_id, d, now) for d in info.details],
+        )).scalars().all()
+
+        # cộng vào project_billing trong cùng transaction
+        await rollup.apply_bills(db, [plan_row])
+        await db.commit()
+    replica.wrote(response_cache.PAYMENT_PLANS, response_cache.PROJECT_BILLING)
+
+    items = [
+        {
+            "id": detail_id,
+            "attribute": d.attribute,
+            "product": d.product,
+            "quantity": d.quantity,
+            "tax": None,  # cột tax của chi tiết không được ghi (chỉ tax_amount)
+            "amount": float(d.amount),
+        }
+        for detail_id, d in zip(detail_ids, info.details)
+    ]
 
-    # Compute totals
-    total_amount = sum(int(d.amount) for d in info.details)
-    total_tax_amount = sum(int(d.tax_amount) for d in info.details)
-
-    # Build PaymentPlan instance
-    plan = PaymentPlan(
-        # id is generated by the before_insert listener, so don't set it here
-        project_id=info.project_id,
-        customer_id=info.customer_id,
-        payer_code=info.payer_code,
-        execution_team=info.execution_team,
-        execution_date=date.fromisoformat(info.expected_date_of_payment),
-        amount=total_amount,
-        tax=total_tax_amount,
-        created_at=datetime.now(),
-        is_deleted=False,
-    )
+    return {
+        "bill_id": plan_id,
+        "customer_id": plan_row["customer_id"],
+        "project_id": plan_row["project_id"],
+        "amount": float(plan_row["amount"]),
+        "tax": float(plan_row["tax"]),
+        "details_created": len(items),
+        "details": items,
+    }
 
-    # Attach details
-    for d in info.details:
-        detail = PaymentPlanDetail(
-            attribute=d.attribute,
-            product=d.product,
-            quantity=d.quantity,
-            amount=d.amount,
-            tax_amount=d.tax_amount,
-            created_at=datetime.now(),
-        )
-        plan.details.append(detail)
-
-    # Persist in DB
-    db = SessionLocal()
-    try:
-        db.add(plan)
-        db.commit()
-        # Refresh to populate generated fields (like id)
-        db.refresh(plan)
-
-        # Prepare return payload
-        items = []
-        for d in plan.details:
-            items.append({
-                "id": getattr(d, "id", None),
-                "attribute": d.attribute,
-                "product": d.product,
-                "quantity": d.quantity,
-                "tax": float(d.tax) if d.tax is not None else None,
-                "amount": float(getattr(d, "amount")) if getattr(d, "amount") is not None else None
-            })
-
-        return {
-            "bill_id": plan.id,
-            "customer_id": plan.customer_id,
-            "project_id": plan.project_id,
-            "amount": float(getattr(plan, "amount")) if getattr(plan, "amount") is not None else None,
-            "tax": float(getattr(plan, "tax")) if getattr(plan, "tax") is not None else None,
-            "details_created": len(items),
-            "details": items,
+
+MAX_BATCH_BILLS = 5000
+
+
+class BatchBillCreated(TypedDict):
+    index: int
+    bill_id: str
+    customer_id: str
+    project_id: str
+    amount: float
+    tax: float
+    details_created: int
+
+
+class BatchBillError(TypedDict):
+    index: int
+    errors: List[str]
+
+
+class BatchCreateResult(TypedDict):
+    created: int
+    failed: int
+    bills: List[BatchBillCreated]
+    errors: List[BatchBillError]
+
+
+@mcp_bills.tool(
+    name="create_bills_batch",
+    description=f"Create many bills in one call (up to {MAX_BATCH_BILLS}). Valid bills are written in one transaction; invalid ones are reported per item by index.",
+)
+async def bills_create_batch(
+    bills: Annotated[List[dict], Field(description="Bills to create, each with the fields of create_bill's information_create_invoice")],
+    all_or_nothing: Annotated[bool, Field(description="If true, create nothing when any bill is invalid")] = False,
+) -> BatchCreateResult:
+    """
+    Tạo nhiều hóa đơn trong 1 transaction với số round trip cố định:
+    1 truy vấn kiểm tra tham chiếu (trên primary), 1 câu lấy n giá trị sequence cho id,
+    INSERT nhiều dòng cho payment_plans và payment_plan_details, 1 upsert project_billing.
+
+    Mỗi phần tử được validate riêng (BillCreateInfo): phần tử sai định dạng (details
+    rỗng, ngày sai, số tiền âm, ...) được báo lỗi theo index như lỗi tham chiếu,
+    không làm hỏng cả lần gọi.
+    """
+    if not bills:
+        raise ValueError("bills must not be empty")
+    if len(bills) > MAX_BATCH_BILLS:
+        raise ValueError(f"At most {MAX_BATCH_BILLS} bills per call; split the batch.")
+
+    parsed: Dict[int, BillCreateInfo] = {}
+    errors: Dict[int, List[str]] = {}
+    for i, raw in enumerate(bills):
+        try:
+            parsed[i] = BillCreateInfo.model_validate(raw)
+        except ValidationError as e:
+            errors[i] = [f"{'.'.join(map(str, err['loc'])) or 'bill'}: {err['msg']}" for err in e.errors()]
+
+    if not parsed or (errors and all_or_nothing):
+        error_items: List[BatchBillError] = [{"index": i, "errors": e} for i, e in sorted(errors.items())]
+        return {"created": 0, "failed": len(error_items), "bills": [], "errors": error_items}
+
+    async with connection.AsyncSessionLocal() as db:
+        positions = list(parsed)
+        for k, e in (await check_references(db, [parsed[i] for i in positions])).items():
+            errors[positions[k]] = e
+        valid = [i for i in positions if i not in errors]
+        error_items = [{"index": i, "errors": e} for i, e in sorted(errors.items())]
+
+        if not valid or (errors and all_or_nothing):
+            return {"created": 0, "failed": len(error_items), "bills": [], "errors": error_items}
+
+        now = datetime.now()
+        ids = await allocate_payment_plan_ids(db, len(valid))
+        plan_rows = [_plan_row(plan_id, parsed[i], now) for plan_id, i in zip(ids, valid)]
+        detail_rows = [
+            _detail_row(plan_id, d, now)
+            for plan_id, i in zip(ids, valid)
+            for d in parsed[i].details
+        ]
+
+        # executemany -> SQLAlchemy gộp thành INSERT ... VALUES (...), (...) nhiều dòng
+        await db.execute(insert(PaymentPlan.__table__), plan_rows)
+        await db.execute(insert(PaymentPlanDetail.__table__), detail_rows)
+        await rollup.apply_bills(db, plan_rows)
+        await db.commit()
+    replica.wrote(response_cache.PAYMENT_PLANS, response_cache.PROJECT_BILLING)
+
+    created: List[BatchBillCreated] = [
+        {
+            "index": i,
+            "bill_id": row["id"],
+            "customer_id": row["customer_id"],
+            "project_id": row["project_id"],
+            "amount": float(row["amount"]),
+            "tax": float(row["tax"]),
+            "details_created": len(parsed[i].details),
         }
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+        for i, row in zip(valid, plan_rows)
+    ]
+    return {"created": len(created), "failed": len(error_items), "bills": created, "errors": error_items}
+
 
 @mcp_bills.prompt(
     name="bills_create_prompt",
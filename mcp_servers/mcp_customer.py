@@ -1,33 +1,19 @@
 from __future__ import annotations
 from fastmcp import FastMCP
-from typing import Optional, Literal, TypedDict, List, Annotated, Union
-from datetime import datetime, date, time
-from decimal import Decimal
-from uuid import UUID
-from enum import Enum
-from sqlalchemy.sql import text
-from db.connection import SessionLocal
+from typing import Optional, Literal, TypedDict, List, Annotated, Tuple, Union
+from db import statements
+from db import connection
+from mcp_servers import replica, response_cache
+from mcp_servers.serialize import fetch_dicts
+from mcp_servers.name_search import NAME_SEARCH_DESCRIPTION, RELEVANCE, name_filter, name_rank
+from mcp_servers.pagination import (
+    CountMode, COUNT_MODE_DESCRIPTION, DEFAULT_COUNT_MODE,
+    CURSOR_DESCRIPTION, DEFAULT_PAGE_SIZE, PAGE_SIZE_DESCRIPTION,
+    check_iso_date, fetch_page, keyset, norm_page_size,
+)
 
 mcp_customers = FastMCP("customers")
 
-def _to_jsonable(v):
-    if isinstance(v, (datetime, date, time)):
-        return v.isoformat()
-    if isinstance(v, Decimal):
-        return float(v)
-    if isinstance(v, UUID):
-        return str(v)
-    if isinstance(v, Enum):
-        return v.value
-    return v
-
-def _rows_to_dicts(rows):
-    out = []
-    for r in rows:
-        m = r if isinstance(r, dict) else dict(r)
-        out.append({k: _to_jsonable(v) for k, v in m.items()})
-    return out
-
 class CustomerRow(TypedDict, total=False):
     id: Union[int, str]
     name: Optional[str]
@@ -37,8 +23,11 @@ class CustomerRow(TypedDict, total=False):
     is_deleted: Optional[bool]
 
 class CustomerSearchResult(TypedDict):
-    total: int           # tổng số bản ghi thỏa điều kiện
-    returned: int        # số bản ghi đã trả về (<=5)
+    total: Optional[int]  # tổng số bản ghi thỏa điều kiện (None nếu count_mode="none")
+    total_is_estimate: bool  # True: total là ước lượng của planner (count_mode="estimate")
+    returned: int        # số bản ghi đã trả về (<= page_size)
+    has_more: bool       # còn bản ghi sau trang này
+    next_cursor: Optional[str]  # truyền vào 'cursor' để lấy trang sau
     order_by: str
     order_dir: Literal["asc", "desc"]
     items: List[CustomerRow]
@@ -47,33 +36,16 @@ class CustomerSearchResult(TypedDict):
 ALLOWED_ORDER_BY = {"id", "name", "email", "phone_number", "created_at"}
 
 
-@mcp_customers.tool(
-    name="search_customers",
-    description="Query customers with dynamic filters; safe sort by id, name, email, phone_number. Returns up to 5 rows."
-)
-def customers_search(
-    id: Annotated[Optional[str], "Customer ID (String)"] = None,
-    name: Annotated[Optional[str], "Customer name (fuzzy match, ILIKE)"] = None,
-    email: Annotated[Optional[str], "Exact email or suffix with % for LIKE"] = None,
-    phone_number: Annotated[Optional[str], "Exact phone or suffix with % for LIKE"] = None,
-    created_at_from: Annotated[Optional[str], "Created-at from (ISO 8601)"] = None,
-    created_at_to: Annotated[Optional[str], "Created-at to (ISO 8601)"] = None,
-    order_by: Annotated[str, "Sort column: id, name, email, phone_number, created_at"] = "created_at",
-    order_dir: Annotated[Literal["asc", "desc"], "Sort direction"] = "desc",
-) -> CustomerSearchResult:
-    """
-    Truy vấn bảng customers với lọc động & sắp xếp an toàn, trả tối đa 5 bản ghi.
-    Ghi chú: ILIKE dùng cho Postgres. Nếu dùng DB khác, thay bằng LOWER(...) LIKE LOWER(...).
-    """
-
-
-    # --- chuẩn hóa sort ---
-    if order_by not in ALLOWED_ORDER_BY:
-        order_by = "created_at"
-    if order_dir not in ("asc", "desc"):
-        order_dir = "desc"
-
-    where_parts = ["c.is_deleted = false"]
+def customers_where(
+    id: Optional[str] = None,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    phone_number: Optional[str] = None,
+    created_at_from: Optional[str] = None,
+    created_at_to: Optional[str] = None,
+) -> Tuple[str, dict]:
+    """Điều kiện WHERE (alias c) + params cho các bộ lọc khách hàng; dùng chung cho search và export."""
+    where_parts = ["c.is_contractor = false", "c.is_deleted = false"]
     params: dict = {}
 
     # --- filters ---
@@ -82,8 +54,8 @@ def customers_search(
         params["id"] = id
 
     if name:
-        where_parts.append("c.name ILIKE :name")
-        params["name"] = f"%{name}%"
+        where_parts.append(name_filter("c.name"))
+        params["name"] = name
 
     if email:
         # Cho phép LIKE nếu người dùng truyền ký tự wildcard
@@ -104,20 +76,59 @@ def customers_search(
 
     if created_at_from:
         where_parts.append("c.created_at >= :created_at_from")
-        params["created_at_from"] = created_at_from
+        params["created_at_from"] = check_iso_date("created_at_from", created_at_from)
     if created_at_to:
         where_parts.append("c.created_at <= :created_at_to")
-        params["created_at_to"] = created_at_to
+        params["created_at_to"] = check_iso_date("created_at_to", created_at_to)
+
+    return " AND ".join(where_parts), params
 
-    where_sql = " AND ".join(where_parts)
 
-    count_sql = f"""
-        SELECT COUNT(*) AS total
-        FROM customers c
-        WHERE {where_sql}
+@mcp_customers.tool(
+    name="search_customers",
+    description="Query customers with dynamic filters; accent-insensitive fuzzy name search ranked by relevance; safe sort by id, name, email, phone_number. Returns one page (default 5 rows); pass next_cursor as cursor for the next page."
+)
+async def customers_search(
+    id: Annotated[Optional[str], "Customer ID (String)"] = None,
+    name: Annotated[Optional[str], NAME_SEARCH_DESCRIPTION] = None,
+    email: Annotated[Optional[str], "Exact email or suffix with % for LIKE"] = None,
+    phone_number: Annotated[Optional[str], "Exact phone or suffix with % for LIKE"] = None,
+    created_at_from: Annotated[Optional[str], "Created-at from (ISO 8601)"] = None,
+    created_at_to: Annotated[Optional[str], "Created-at to (ISO 8601)"] = None,
+    order_by: Annotated[Optional[str], "Sort column: id, name, email, phone_number, created_at, relevance (default: relevance when name is given, else created_at)"] = None,
+    order_dir: Annotated[Literal["asc", "desc"], "Sort direction"] = "desc",
+    count_mode: Annotated[CountMode, COUNT_MODE_DESCRIPTION] = DEFAULT_COUNT_MODE,
+    page_size: Annotated[int, PAGE_SIZE_DESCRIPTION] = DEFAULT_PAGE_SIZE,
+    cursor: Annotated[Optional[str], CURSOR_DESCRIPTION] = None,
+) -> CustomerSearchResult:
+    """
+    Truy vấn bảng customers với lọc động & sắp xếp an toàn, phân trang bằng cursor (keyset).
+    Ghi chú: lọc theo tên dùng pg_trgm + unaccent (Postgres, xem mcp_servers/name_search.py).
     """
 
-    data_sql = f"""
+
+    # --- chuẩn hóa sort ---
+    if order_by is None and name:
+        order_by = RELEVANCE
+    if not (order_by in ALLOWED_ORDER_BY or (order_by == RELEVANCE and name)):
+        order_by = "created_at"
+    if order_dir not in ("asc", "desc"):
+        order_dir = "desc"
+
+    entry = response_cache.lookup(
+        "search_customers", (response_cache.CUSTOMERS,),
+        id=id, name=name, email=email, phone_number=phone_number,
+        created_at_from=created_at_from, created_at_to=created_at_to,
+        order_by=order_by, order_dir=order_dir, count_mode=count_mode,
+        page_size=norm_page_size(page_size), cursor=cursor,
+    )
+    if entry.hit:
+        return entry.value
+
+    where_sql, params = customers_where(id, name, email, phone_number, created_at_from, created_at_to)
+    sort_col = name_rank("c.name") if order_by == RELEVANCE else f"c.{order_by}"
+
+    select_sql = """
         SELECT
             c.id,
             c.name,
@@ -125,25 +136,27 @@ def customers_search(
             c.phone_number,
             c.created_at,
             c.is_deleted
-        FROM customers c
-        WHERE c.is_contractor = false AND {where_sql}
-        ORDER BY {order_by} {order_dir}
-        LIMIT 5
     """
 
-    with SessionLocal() as db:
-        total = db.execute(text(count_sql), params).scalar_one()
-        rows = db.execute(text(data_sql), params).mappings().all()
+    async with replica.connect() as conn:
+        page = await fetch_page(
+            conn, select_sql, "FROM customers c", where_sql, params,
+            limit=norm_page_size(page_size), count_mode=count_mode,
+            keyset=keyset(sort_col, "c.id", order_by, order_dir, cursor),
+        )
 
-    items = _rows_to_dicts(rows)
+    items = page.rows
 
-    return {
-        "total": int(total),
+    return entry.store({
+        "total": page.total,
+        "total_is_estimate": page.total_is_estimate,
         "returned": len(items),
+        "has_more": page.has_more,
+        "next_cursor": page.next_cursor,
         "order_by": order_by,
         "order_dir": order_dir,
         "items": items,
-    }
+    })
 
 # @mcp_customers.tool()
 # def customers_create():
@@ -153,7 +166,7 @@ def customers_search(
     name="update_customer",
     description="Update customer details",
 )
-def customers_update(
+async def customers_update(
         id: Annotated[str, "Customer ID"],
         name: Annotated[Optional[str], "Customer name"] = None,
         email: Annotated[Optional[str], "Customer email"] = None,
@@ -183,19 +196,18 @@ def customers_update(
         RETURNING id, name, email, phone_number, created_at, is_deleted
     """
 
-    with SessionLocal() as db:
-        result = db.execute(text(update_sql), params)
-        try:
-            updated = result.mappings().first()
-        except Exception:
-            updated = None
+    async with connection.AsyncSessionLocal() as db:
+        result = await statements.execute(db, update_sql, params)
+        updated = fetch_dicts(result)
         # commit so change is persisted
-        db.commit()
+        await db.commit()
+    # tên khách hàng đã đổi -> bỏ khỏi cache tham chiếu và cache kết quả tool đọc
+    replica.wrote(response_cache.CUSTOMERS, customers=[id])
 
     if not updated:
         return {"error": "customer not found or already deleted"}
 
-    return {k: _to_jsonable(v) for k, v in dict(updated).items()}
+    return updated[0]
 
 # @mcp_customers.tool()
 # def customers_list():
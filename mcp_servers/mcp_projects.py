@@ -1,35 +1,18 @@
 from __future__ import annotations
-from typing import Optional, Literal, TypedDict, List, Annotated, Union
+from typing import Optional, Literal, TypedDict, List, Annotated, Tuple, Union, NotRequired
 from fastmcp import FastMCP
-from db.connection import SessionLocal
-from sqlalchemy.sql import text
-from datetime import date, datetime, time
-from decimal import Decimal
-from uuid import UUID
-from enum import Enum
+from mcp_servers import ref_cache, replica, response_cache
+from mcp_servers.name_search import NAME_SEARCH_DESCRIPTION, RELEVANCE, name_filter, name_rank
+from mcp_servers.pagination import (
+    CountMode, COUNT_MODE_DESCRIPTION, DEFAULT_COUNT_MODE,
+    CURSOR_DESCRIPTION, DEFAULT_PAGE_SIZE, PAGE_SIZE_DESCRIPTION,
+    check_iso_date, fetch_page, keyset, norm_page_size,
+)
 import json
 
 mcp_projects = FastMCP("projects")
 
-# ---- JSON-safe helpers -------------------------------------------------------
-def _to_jsonable(v):
-    if isinstance(v, (datetime, date, time)):
-        return v.isoformat()
-    if isinstance(v, Decimal):
-        return float(v)  # hoặc str(v) nếu muốn giữ chính xác tuyệt đối
-    if isinstance(v, UUID):
-        return str(v)
-    if isinstance(v, Enum):
-        return v.value
-    return v
-
-def _rows_to_dicts(rows):
-    out = []
-    for r in rows:
-        m = r if isinstance(r, dict) else dict(r)
-        out.append({k: _to_jsonable(v) for k, v in m.items()})
-    return out
-
+# ---- Input helpers -----------------------------------------------------------
 def _norm_str_list(val: Optional[Union[List[str], str]]) -> Optional[List[str]]:
     if val is None:
         return None
@@ -54,6 +37,8 @@ def _norm_str_list(val: Optional[Union[List[str], str]]) -> Optional[List[str]]:
 class ProjectRow(TypedDict, total=False):
     id: str  # id có thể là int hoặc str, và có thể NULL
     name: Optional[str]  # cho phép NULL
+    customer_id: Optional[str]
+    customer_name: Optional[str]  # chỉ có trong project_list_by_customer_ids
     project_number: Optional[str]  # cho phép NULL
     created_at: Optional[str]  # cho phép NULL (nếu DB có bản ghi thiếu)
     completed_date: Optional[str]
@@ -61,8 +46,11 @@ class ProjectRow(TypedDict, total=False):
     is_deleted: Optional[bool]
 
 class ProjectGetResult(TypedDict):
-    total: int           # tổng số bản ghi thỏa điều kiện
-    returned: int        # số bản ghi đã trả về (tối đa 5)
+    total: Optional[int]  # tổng số bản ghi thỏa điều kiện (None nếu count_mode="none")
+    total_is_estimate: bool  # True: total là ước lượng của planner (count_mode="estimate")
+    returned: int        # số bản ghi đã trả về (tối đa page_size)
+    has_more: bool       # còn bản ghi sau trang này
+    next_cursor: NotRequired[Optional[str]]  # truyền vào 'cursor' để lấy trang sau
     order_by: str
     order_dir: Literal["asc", "desc"]
     items: List[ProjectRow]
@@ -71,34 +59,18 @@ ALLOWED_ORDER_BY = {
     "id", "name", "project_number", "created_at", "completed_date", "end_date"
 }
 
-@mcp_projects.tool(
-    name="project_search",
-    description="Query projects with dynamic filters; safe sort by id, name, project_number, created_at, completed_date, end_date. Returns up to 5 rows."
-)
-def project_search(
-    id: Annotated[Optional[str], "Project ID (str). If string digits, will be cast to int"] = None,
-    name: Annotated[Optional[str], "Project name (ILIKE fuzzy)"] = None,
-    project_number: Annotated[Optional[str], "Exact project number/code"] = None,
-    created_at_from: Annotated[Optional[str], "Created at from (ISO 8601)"] = None,
-    created_at_to: Annotated[Optional[str], "Created at to (ISO 8601)"] = None,
-    completed_date_from: Annotated[Optional[str], "Completed date from (ISO 8601)"] = None,
-    completed_date_to: Annotated[Optional[str], "Completed date to (ISO 8601)"] = None,
-    end_date_from: Annotated[Optional[str], "End date from (ISO 8601)"] = None,
-    end_date_to: Annotated[Optional[str], "End date to (ISO 8601)"] = None,
-    order_by: Annotated[str, "Sort column (id, name, project_number, created_at, completed_date, end_date)"] = "created_at",
-    order_dir: Annotated[Literal["asc", "desc"], "Sort direction"] = "desc",
-) -> ProjectGetResult:
-    """
-    Truy vấn bảng projects với lọc động, sắp xếp an toàn.
-    Trả về tối đa 5 bản ghi đầu tiên theo thứ tự đã chọn.
-    """
-
-    # --- normalize sort ---
-    if order_by not in ALLOWED_ORDER_BY:
-        order_by = "created_at"
-    if order_dir not in ("asc", "desc"):
-        order_dir = "desc"
-
+def projects_where(
+    id: Optional[str] = None,
+    name: Optional[str] = None,
+    project_number: Optional[str] = None,
+    created_at_from: Optional[str] = None,
+    created_at_to: Optional[str] = None,
+    completed_date_from: Optional[str] = None,
+    completed_date_to: Optional[str] = None,
+    end_date_from: Optional[str] = None,
+    end_date_to: Optional[str] = None,
+) -> Tuple[str, dict]:
+    """Điều kiện WHERE (alias p) + params cho các bộ lọc dự án; dùng chung cho search và export."""
     # --- base where ---
     where_parts = ["p.is_deleted = false"]
     params: dict = {}
@@ -112,9 +84,9 @@ def project_search(
         params["id"] = id
 
     if name:
-        # Postgres: ILIKE; nếu không dùng Postgres, thay bằng LOWER(...) LIKE LOWER(:name)
-        where_parts.append("p.name ILIKE :name")
-        params["name"] = f"%{name}%"
+        # Postgres: pg_trgm + unaccent, dùng GIN index (xem mcp_servers/name_search.py)
+        where_parts.append(name_filter("p.name"))
+        params["name"] = name
 
     if project_number:
         where_parts.append("p.project_number = :project_number")
@@ -122,34 +94,80 @@ def project_search(
 
     if created_at_from:
         where_parts.append("p.created_at >= :created_at_from")
-        params["created_at_from"] = created_at_from
+        params["created_at_from"] = check_iso_date("created_at_from", created_at_from)
     if created_at_to:
         where_parts.append("p.created_at <= :created_at_to")
-        params["created_at_to"] = created_at_to
+        params["created_at_to"] = check_iso_date("created_at_to", created_at_to)
 
     if completed_date_from:
         where_parts.append("p.completed_date >= :completed_date_from")
-        params["completed_date_from"] = completed_date_from
+        params["completed_date_from"] = check_iso_date("completed_date_from", completed_date_from)
     if completed_date_to:
         where_parts.append("p.completed_date <= :completed_date_to")
-        params["completed_date_to"] = completed_date_to
+        params["completed_date_to"] = check_iso_date("completed_date_to", completed_date_to)
 
     if end_date_from:
         where_parts.append("p.end_date >= :end_date_from")
-        params["end_date_from"] = end_date_from
+        params["end_date_from"] = check_iso_date("end_date_from", end_date_from)
     if end_date_to:
         where_parts.append("p.end_date <= :end_date_to")
-        params["end_date_to"] = end_date_to
+        params["end_date_to"] = check_iso_date("end_date_to", end_date_to)
 
-    where_sql = " AND ".join(where_parts)
+    return " AND ".join(where_parts), params
 
-    count_sql = f"""
-        SELECT COUNT(*) AS total
-        FROM projects p
-        WHERE {where_sql}
+
+@mcp_projects.tool(
+    name="project_search",
+    description="Query projects with dynamic filters; accent-insensitive fuzzy name search ranked by relevance; safe sort by id, name, project_number, created_at, completed_date, end_date. Returns one page (default 5 rows); pass next_cursor as cursor for the next page."
+)
+async def project_search(
+    id: Annotated[Optional[str], "Project ID (str). If string digits, will be cast to int"] = None,
+    name: Annotated[Optional[str], NAME_SEARCH_DESCRIPTION] = None,
+    project_number: Annotated[Optional[str], "Exact project number/code"] = None,
+    created_at_from: Annotated[Optional[str], "Created at from (ISO 8601)"] = None,
+    created_at_to: Annotated[Optional[str], "Created at to (ISO 8601)"] = None,
+    completed_date_from: Annotated[Optional[str], "Completed date from (ISO 8601)"] = None,
+    completed_date_to: Annotated[Optional[str], "Completed date to (ISO 8601)"] = None,
+    end_date_from: Annotated[Optional[str], "End date from (ISO 8601)"] = None,
+    end_date_to: Annotated[Optional[str], "End date to (ISO 8601)"] = None,
+    order_by: Annotated[Optional[str], "Sort column (id, name, project_number, created_at, completed_date, end_date, relevance). Default: relevance when name is given, else created_at"] = None,
+    order_dir: Annotated[Literal["asc", "desc"], "Sort direction"] = "desc",
+    count_mode: Annotated[CountMode, COUNT_MODE_DESCRIPTION] = DEFAULT_COUNT_MODE,
+    page_size: Annotated[int, PAGE_SIZE_DESCRIPTION] = DEFAULT_PAGE_SIZE,
+    cursor: Annotated[Optional[str], CURSOR_DESCRIPTION] = None,
+) -> ProjectGetResult:
+    """
+    Truy vấn bảng projects với lọc động, sắp xếp an toàn.
+    Trả về một trang theo thứ tự đã chọn; trang sau lấy bằng cursor (keyset, không OFFSET).
     """
 
-    data_sql = f"""
+    # --- normalize sort ---
+    if order_by is None and name:
+        order_by = RELEVANCE
+    if not (order_by in ALLOWED_ORDER_BY or (order_by == RELEVANCE and name)):
+        order_by = "created_at"
+    if order_dir not in ("asc", "desc"):
+        order_dir = "desc"
+
+    entry = response_cache.lookup(
+        "project_search", (response_cache.PROJECTS,),
+        id=id, name=name, project_number=project_number,
+        created_at_from=created_at_from, created_at_to=created_at_to,
+        completed_date_from=completed_date_from, completed_date_to=completed_date_to,
+        end_date_from=end_date_from, end_date_to=end_date_to,
+        order_by=order_by, order_dir=order_dir, count_mode=count_mode,
+        page_size=norm_page_size(page_size), cursor=cursor,
+    )
+    if entry.hit:
+        return entry.value
+
+    where_sql, params = projects_where(
+        id, name, project_number, created_at_from, created_at_to,
+        completed_date_from, completed_date_to, end_date_from, end_date_to,
+    )
+    sort_col = name_rank("p.name") if order_by == RELEVANCE else f"p.{order_by}"
+
+    select_sql = """
         SELECT
             p.id,
             p.name,
@@ -158,25 +176,27 @@ def project_search(
             p.completed_date,
             p.end_date,
             p.is_deleted
-        FROM projects p
-        WHERE {where_sql}
-        ORDER BY {order_by} {order_dir}
-        LIMIT 5
     """
 
-    with SessionLocal() as db:
-        total = db.execute(text(count_sql), params).scalar_one()
-        rows = db.execute(text(data_sql), params).mappings().all()
+    async with replica.connect() as conn:
+        page = await fetch_page(
+            conn, select_sql, "FROM projects p", where_sql, params,
+            limit=norm_page_size(page_size), count_mode=count_mode,
+            keyset=keyset(sort_col, "p.id", order_by, order_dir, cursor),
+        )
 
-    items = _rows_to_dicts(rows)
+    items = page.rows
 
-    return {
-        "total": int(total),
+    return entry.store({
+        "total": page.total,
+        "total_is_estimate": page.total_is_estimate,
         "returned": len(items),
+        "has_more": page.has_more,
+        "next_cursor": page.next_cursor,
         "order_by": order_by,
         "order_dir": order_dir,
         "items": items,
-    }
+    })
 
 class QuotationRow(TypedDict, total=False):
     project_id: Optional[str]
@@ -185,19 +205,27 @@ class QuotationRow(TypedDict, total=False):
     tax: Optional[float]
     amount: Optional[float]
     total_amount: Optional[float]
+    billed_amount: float
+    billed_tax: float
+    bill_count: int
+    last_bill_date: Optional[str]
+    unbilled_amount: Optional[float]
 
 
 class QuotationResult(TypedDict):
-    total: int
+    total: Optional[int]
+    total_is_estimate: bool  # True: total là ước lượng của planner (count_mode="estimate")
     returned: int
+    has_more: bool
     items: List[QuotationRow]
 
 @mcp_projects.tool(
     name="cost_quotation_for_project",
-    description="Query quotation information for projects by project id or code",
+    description="Query quotation information for projects by project id or code, with billed totals (billed_amount, billed_tax, bill_count, last_bill_date) and the quoted amount not yet billed",
 )
-def cost_quotation_for_project(ids: Annotated[Optional[Union[List[str], str]], "List of project ids. Example: [\"PJ00001\",\"PJ00002\"]"] = None,
-                               project_codes: Annotated[Optional[Union[List[str], str]], "List of project codes. Example: [\"25-1-ADMADM-0565\",\"5-1-ADMADM-05\"]"] = None) -> QuotationResult:
+async def cost_quotation_for_project(ids: Annotated[Optional[Union[List[str], str]], "List of project ids. Example: [\"PJ00001\",\"PJ00002\"]"] = None,
+                               project_codes: Annotated[Optional[Union[List[str], str]], "List of project codes. Example: [\"25-1-ADMADM-0565\",\"5-1-ADMADM-05\"]"] = None,
+                               count_mode: Annotated[CountMode, COUNT_MODE_DESCRIPTION] = DEFAULT_COUNT_MODE) -> QuotationResult:
     ids = _norm_str_list(ids)
     project_codes = _norm_str_list(project_codes)
     # print(f"{ids} type : {type(ids)}")
@@ -209,56 +237,63 @@ def cost_quotation_for_project(ids: Annotated[Optional[Union[List[str], str]], "
     if ids is not None and len(ids) == 0 and (project_codes is None or len(project_codes) == 0):
         raise ValueError("Either 'ids' or 'project_codes' must be a non-empty list.")
 
-    sql = """
+    entry = response_cache.lookup(
+        "cost_quotation_for_project", (response_cache.PROJECTS, response_cache.PROJECT_BILLING),
+        ids=ids, project_codes=project_codes, count_mode=count_mode,
+    )
+    if entry.hit:
+        return entry.value
+
+    select_sql = """
             SELECT
                 p.id as project_id,
                 p.name as project_name,
                 p.project_number as project_code,
                 p.tax,
                 p.amount,
-                p.entry_cost as total_amount
-            FROM projects p
-            WHERE p.is_deleted = false
+                p.entry_cost as total_amount,
+                coalesce(b.billed_amount, 0) as billed_amount,
+                coalesce(b.billed_tax, 0) as billed_tax,
+                coalesce(b.bill_count, 0) as bill_count,
+                b.last_bill_date,
+                p.amount - coalesce(b.billed_amount, 0) as unbilled_amount
         """
+    where_sql = "p.is_deleted = false"
     params = {}
     if ids and len(ids) > 0:
-        sql += " AND p.id IN :ids"
-        params["ids"] = tuple(ids)
+        where_sql += " AND p.id = ANY(:ids)"
+        params["ids"] = ids
 
     if project_codes and len(project_codes) > 0:
-        sql += " AND p.project_number IN :project_code"
-        params["project_code"] = tuple(project_codes)
-
-    sql += " LIMIT 5"
-
-    count_sql = f"""
-            SELECT COUNT(*) FROM projects p
-            WHERE p.is_deleted = false
-        """
-
-    if ids:
-        count_sql += " AND p.id IN :ids"
-    if project_codes:
-        count_sql += " AND p.project_number IN :project_code"
-
-    with SessionLocal() as db:
-        total = db.execute(text(count_sql), params).scalar_one()
-        rows = db.execute(text(sql), params).mappings().all()
-
-    items = _rows_to_dicts(rows)
-
-    return {
-        "total": int(total),
+        where_sql += " AND p.project_number = ANY(:project_code)"
+        params["project_code"] = project_codes
+
+    async with replica.connect() as conn:
+        page = await fetch_page(
+            conn, select_sql,
+            # tổng đã xuất hóa đơn lấy từ bảng tổng hợp (1 dòng / dự án, xem db/rollup.py)
+            "FROM projects p LEFT JOIN project_billing b ON b.project_id = p.id",
+            where_sql, params,
+            limit=5, count_mode=count_mode, count_from_sql="FROM projects p",
+        )
+
+    items = page.rows
+
+    return entry.store({
+        "total": page.total,
+        "total_is_estimate": page.total_is_estimate,
         "returned": len(items),
+        "has_more": page.has_more,
         "items": items,
-    }
+    })
 
 @mcp_projects.tool(
     name="project_list_by_customer_ids",
     description="Query project list by customer ids",
 )
-def project_list_by_customer_ids(
-    ids: Annotated[Optional[Union[List[str], str]], "List of customer ids"] = None
+async def project_list_by_customer_ids(
+    ids: Annotated[Optional[Union[List[str], str]], "List of customer ids"] = None,
+    count_mode: Annotated[CountMode, COUNT_MODE_DESCRIPTION] = DEFAULT_COUNT_MODE,
 ) -> ProjectGetResult:
     """
     Truy vấn danh sách dự án theo danh sách customer_id.
@@ -270,14 +305,16 @@ def project_list_by_customer_ids(
     if not ids:
         raise ValueError("At least one customer_id must be provided.")
 
-    where_sql = "p.is_deleted = false AND p.customer_id IN :ids"
+    entry = response_cache.lookup(
+        "project_list_by_customer_ids", (response_cache.PROJECTS, response_cache.CUSTOMERS),
+        ids=ids, count_mode=count_mode,
+    )
+    if entry.hit:
+        return entry.value
 
-    count_sql = f"""
-        SELECT COUNT(*) FROM projects p
-        WHERE {where_sql}
-    """
+    where_sql = "p.is_deleted = false AND p.customer_id = ANY(:ids)"
 
-    data_sql = f"""
+    select_sql = """
         SELECT
             p.id,
             p.name,
@@ -287,25 +324,28 @@ def project_list_by_customer_ids(
             p.completed_date,
             p.end_date,
             p.is_deleted
-        FROM projects p
-        WHERE {where_sql}
-        ORDER BY p.created_at DESC
-        LIMIT 5
     """
 
-    with SessionLocal() as db:
-        total = db.execute(text(count_sql), {"ids": tuple(ids)}).scalar_one()
-        rows = db.execute(text(data_sql), {"ids": tuple(ids)}).mappings().all()
+    async with replica.connect() as conn:
+        page = await fetch_page(
+            conn, select_sql, "FROM projects p", where_sql, {"ids": ids},
+            limit=5, count_mode=count_mode, order_sql="ORDER BY p.created_at DESC",
+        )
+        customers = (await ref_cache.lookup(conn, customers=ids))["customers"]
 
-    items = _rows_to_dicts(rows)
+    for r in page.rows:
+        (r["customer_name"],) = customers.get(r["customer_id"], (None,))
+    items = page.rows
 
-    return {
-        "total": int(total),
+    return entry.store({
+        "total": page.total,
+        "total_is_estimate": page.total_is_estimate,
         "returned": len(items),
+        "has_more": page.has_more,
         "order_by": "created_at",
         "order_dir": "asc",
         "items": items,
-    }
+    })
 
 # @mcp_projects.tool()
 # def project_create():
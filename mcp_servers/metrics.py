@@ -0,0 +1,251 @@
+"""
+Số liệu theo tool cho main_mcp: số lần gọi, lỗi, histogram latency, và mỗi lần gọi
+tách ra thời gian DB / số dòng / thời gian serialize.
+
+- ToolMetricsMiddleware (middleware FastMCP) đo toàn bộ 1 lần tools/call: kiểm tra
+  tham số, thân tool, chuyển kết quả sang content JSON
+- event before/after_cursor_execute của engine: thời gian từng câu SQL và số dòng
+  trả về (cursor.rowcount của câu có kết quả), cộng vào lần gọi tool hiện tại qua
+  contextvar (greenlet của SQLAlchemy async dùng chung context với task gọi)
+- RowSerializer.dicts/json gọi observe_serialize(): thời gian chuyển dòng SQL sang
+  dict/JSON
+
+"other" = tổng - DB - serialize: validate của FastMCP/pydantic, logic Python, chờ pool.
+
+Xem qua resource stats://tools (JSON) hoặc GET /metrics (định dạng text của
+Prometheus). TOOL_METRICS=off để tắt (không gắn middleware / event).
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from db import connection
+from db.histogram import BUCKETS_MS, Histogram
+
+
+def _enabled() -> bool:
+    return os.getenv("TOOL_METRICS", "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+class _Call:
+    """Số liệu của 1 lần gọi tool đang chạy."""
+    __slots__ = ("db_ms", "statements", "rows", "serialize_ms")
+
+    def __init__(self):
+        self.db_ms = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.serialize_ms = 0.0
+
+
+_current: ContextVar[Optional[_Call]] = ContextVar("tool_call_metrics", default=None)
+
+
+class ToolMetrics:
+    __slots__ = ("ok", "errors", "error_types", "total", "db", "serialize", "statements", "rows", "response_bytes")
+
+    def __init__(self):
+        self.ok = 0
+        self.errors = 0
+        self.error_types: Dict[str, int] = {}
+        self.total = Histogram()
+        self.db = Histogram()
+        self.serialize = Histogram()
+        self.statements = 0
+        self.rows = 0
+        self.response_bytes = 0
+
+    def snapshot(self) -> dict:
+        calls = self.ok + self.errors
+        return {
+            "calls": calls,
+            "errors": self.errors,
+            "error_types": dict(self.error_types),
+            "latency": self.total.snapshot(),
+            "db": self.db.snapshot(),
+            "serialize": self.serialize.snapshot(),
+            "other_avg_ms": round((self.total.sum_ms - self.db.sum_ms - self.serialize.sum_ms) / calls, 3) if calls else None,
+            "db_statements_per_call": round(self.statements / calls, 2) if calls else None,
+            "rows_per_call": round(self.rows / calls, 1) if calls else None,
+            "response_bytes_per_call": round(self.response_bytes / calls) if calls else None,
+        }
+
+
+TOOLS: Dict[str, ToolMetrics] = {}
+# mọi câu SQL, kể cả ngoài tool (export, resource, ...)
+STATEMENTS = Histogram()
+
+
+def observe_serialize(started: float) -> None:
+    """Cộng thời gian serialize (từ perf_counter() `started`) vào lần gọi tool hiện tại."""
+    call = _current.get()
+    if call is not None:
+        call.serialize_ms += (time.perf_counter() - started) * 1000
+
+
+def _response_bytes(result) -> int:
+    return sum(len(getattr(block, "text", "") or "") for block in getattr(result, "content", ()) or ())
+
+
+class ToolMetricsMiddleware(Middleware):
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        metrics = TOOLS.get(context.message.name)
+        if metrics is None:
+            metrics = TOOLS[context.message.name] = ToolMetrics()
+        call = _Call()
+        token = _current.set(call)
+        started = time.perf_counter()
+        try:
+            result = await call_next(context)
+        except Exception as e:
+            metrics.errors += 1
+            name = type(e).__name__
+            metrics.error_types[name] = metrics.error_types.get(name, 0) + 1
+            raise
+        else:
+            metrics.ok += 1
+            metrics.response_bytes += _response_bytes(result)
+            return result
+        finally:
+            _current.reset(token)
+            metrics.total.observe((time.perf_counter() - started) * 1000)
+            metrics.db.observe(call.db_ms)
+            metrics.serialize.observe(call.serialize_ms)
+            metrics.statements += call.statements
+            metrics.rows += call.rows
+
+
+def _listen(engine) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        ms = (time.perf_counter() - conn.info.pop("metrics_started", time.perf_counter())) * 1000
+        STATEMENTS.observe(ms)
+        call = _current.get()
+        if call is not None:
+            call.db_ms += ms
+            call.statements += 1
+            # rowcount của SELECT/RETURNING = số dòng đã nhận (cursor phía client); -1 với server-side cursor
+            if cursor.description is not None and cursor.rowcount > 0:
+                call.rows += cursor.rowcount
+
+
+def instrument(mcp) -> bool:
+    """Gắn middleware vào `mcp`; event gắn vào mọi engine (sync, async, replica) khi db.connection tạo engine."""
+    if not _enabled():
+        return False
+    mcp.add_middleware(ToolMetricsMiddleware())
+    connection.on_engines_created(lambda engines: [_listen(e) for e in engines.values()])
+    return True
+
+
+def stats() -> dict:
+    return {
+        "enabled": _enabled(),
+        "tools": {name: m.snapshot() for name, m in sorted(TOOLS.items())},
+        "db_statements": STATEMENTS.snapshot(),
+    }
+
+
+# ---- định dạng text của Prometheus (0.0.4) ----
+
+_LE_SECONDS = [f"{ms / 1000:g}" for ms in BUCKETS_MS] + ["+Inf"]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram(lines: List[str], name: str, hist: Histogram, labels: dict) -> None:
+    running = 0
+    for le, n in zip(_LE_SECONDS, hist.counts):
+        running += n
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {running}")
+    lines.append(f"{name}_sum{_labels(labels)} {hist.sum_ms / 1000:.6f}")
+    lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+
+
+def _family(lines: List[str], name: str, kind: str, help_: str) -> None:
+    lines.append(f"# HELP {name} {help_}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def prometheus(engines: Dict[str, object], response_cache: dict) -> str:
+    """Toàn bộ số liệu dạng text cho GET /metrics; `engines`: tên -> engine sync (async dùng .sync_engine)."""
+    from db.pool import pool_stats
+
+    lines: List[str] = []
+    pools = {name: pool_stats(e) for name, e in engines.items()}
+    tools = sorted(TOOLS.items())
+
+    _family(lines, "mcp_tool_calls_total", "counter", "Tool calls by outcome")
+    for name, m in tools:
+        lines.append(f"mcp_tool_calls_total{_labels({'tool': name, 'status': 'ok'})} {m.ok}")
+        lines.append(f"mcp_tool_calls_total{_labels({'tool': name, 'status': 'error'})} {m.errors}")
+    _family(lines, "mcp_tool_errors_total", "counter", "Tool call errors by exception type")
+    for name, m in tools:
+        for error, n in sorted(m.error_types.items()):
+            lines.append(f"mcp_tool_errors_total{_labels({'tool': name, 'error': error})} {n}")
+    for metric, attr, help_ in (
+        ("mcp_tool_duration_seconds", "total", "Whole tools/call latency inside the server"),
+        ("mcp_tool_db_seconds", "db", "Time spent executing SQL per tool call"),
+        ("mcp_tool_serialize_seconds", "serialize", "Time spent converting SQL rows to JSON per tool call"),
+    ):
+        _family(lines, metric, "histogram", help_)
+        for name, m in tools:
+            _histogram(lines, metric, getattr(m, attr), {"tool": name})
+    for metric, attr, help_ in (
+        ("mcp_tool_db_statements_total", "statements", "SQL statements executed by tool calls"),
+        ("mcp_tool_db_rows_total", "rows", "Rows returned by SQL statements of tool calls"),
+        ("mcp_tool_response_bytes_total", "response_bytes", "Bytes of tool result content"),
+    ):
+        _family(lines, metric, "counter", help_)
+        for name, m in tools:
+            lines.append(f"{metric}{_labels({'tool': name})} {getattr(m, attr)}")
+
+    _family(lines, "db_statement_duration_seconds", "histogram", "Duration of every SQL statement")
+    _histogram(lines, "db_statement_duration_seconds", STATEMENTS, {})
+
+    for metric, key, help_ in (
+        ("db_pool_checked_out", "checked_out", "Connections in use"),
+        ("db_pool_idle", "idle", "Idle connections in the pool"),
+        ("db_pool_overflow", "overflow", "Connections opened beyond pool_size"),
+    ):
+        _family(lines, metric, "gauge", help_)
+        for name, s in pools.items():
+            if s is not None:
+                lines.append(f"{metric}{_labels({'engine': name})} {s[key]}")
+    for metric, key, help_ in (
+        ("db_pool_timeouts_total", "timeouts", "Checkouts that timed out waiting for a connection"),
+        ("db_pool_connects_total", "connects", "New DBAPI connections opened"),
+    ):
+        _family(lines, metric, "counter", help_)
+        for name, s in pools.items():
+            if s is not None:
+                lines.append(f"{metric}{_labels({'engine': name})} {s[key]}")
+    _family(lines, "db_pool_wait_seconds", "histogram", "Time waiting for a pooled connection")
+    for name, e in engines.items():
+        m = getattr(e.pool, "metrics", None)
+        if m is not None:
+            _histogram(lines, "db_pool_wait_seconds", m.wait, {"engine": name})
+
+    _family(lines, "response_cache_lookups_total", "counter", "Read-tool response cache lookups")
+    lines.append(f"response_cache_lookups_total{_labels({'result': 'hit'})} {response_cache['hits']}")
+    lines.append(f"response_cache_lookups_total{_labels({'result': 'miss'})} {response_cache['misses']}")
+    _family(lines, "response_cache_bytes", "gauge", "Bytes held by the response cache")
+    lines.append(f"response_cache_bytes {response_cache['bytes']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,34 @@
+"""
+Tìm theo tên không dấu + gần đúng (pg_trgm + unaccent).
+
+Cần migration db/migrations/0001_fuzzy_name_search.sql: hàm f_unaccent() và
+GIN index trên lower(f_unaccent(name)) WHERE is_deleted = false. Biểu thức
+dưới đây phải giữ đúng dạng đó để planner dùng được index.
+"""
+
+NAME_SEARCH_DESCRIPTION = (
+    "Name (accent-insensitive, typo-tolerant; 'Dat' matches 'Đạt'). "
+    "Results can be ranked with order_by='relevance'"
+)
+
+# giá trị order_by đặc biệt: xếp theo độ giống tên
+RELEVANCE = "relevance"
+
+
+def _norm(expr: str) -> str:
+    return f"lower(f_unaccent({expr}))"
+
+
+def name_filter(col: str, param: str = "name") -> str:
+    """
+    Điều kiện WHERE: chứa chuỗi tìm (LIKE, bỏ dấu) hoặc gần giống một từ trong tên
+    (word similarity `<%`, ngưỡng pg_trgm.word_similarity_threshold). Cả hai đều
+    dùng GIN index gin_trgm_ops.
+    """
+    q = _norm(f":{param}")
+    return f"({_norm(col)} LIKE '%' || {q} || '%' OR {q} <% {_norm(col)})"
+
+
+def name_rank(col: str, param: str = "name") -> str:
+    """Điểm giống (0..1) để sắp xếp; ép float8 để cursor so sánh chính xác."""
+    return f"word_similarity({_norm(f':{param}')}, {_norm(col)})::float8"
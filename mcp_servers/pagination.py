@@ -0,0 +1,263 @@
+from typing import Any, Literal, NamedTuple, Optional, List
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+import base64
+import json
+from db import statements
+from mcp_servers.serialize import serializer_for
+
+# ---- Count strategy ----------------------------------------------------------
+# exact    : tổng chính xác, lấy cùng câu lệnh với dữ liệu (scalar sub-query COUNT(*))
+# estimate : ước lượng của planner Postgres (EXPLAIN), chỉ khi không biết chắc tổng
+# none     : không đếm, chỉ trả has_more
+CountMode = Literal["exact", "estimate", "none"]
+COUNT_MODES = ("exact", "estimate", "none")
+DEFAULT_COUNT_MODE: CountMode = "estimate"
+
+COUNT_MODE_DESCRIPTION = (
+    "How to compute 'total': exact (exact count, same query), "
+    "estimate (Postgres planner estimate when more rows exist, flagged by total_is_estimate; exact otherwise), "
+    "none (skip counting, see has_more)"
+)
+
+# ---- Page size -----------------------------------------------------------------
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 50
+
+PAGE_SIZE_DESCRIPTION = f"Rows per page (1-{MAX_PAGE_SIZE})"
+CURSOR_DESCRIPTION = "Opaque cursor from 'next_cursor' of the previous page; omit for the first page"
+
+
+class Keyset(NamedTuple):
+    """Khoá phân trang: (sort_col, id_col) và vị trí sau cursor (None = trang đầu)."""
+    sort_col: str
+    id_col: str
+    order_by: str
+    order_dir: str
+    after: Optional[tuple]
+
+
+class Page(NamedTuple):
+    rows: List[dict]  # đã chuyển sang dạng JSON được (mcp_servers/serialize.py)
+    total: Optional[int]
+    has_more: bool
+    next_cursor: Optional[str]
+    total_is_estimate: bool = False  # total là ước lượng của planner (count_mode=estimate)
+
+
+def _norm_count_mode(count_mode: Optional[str]) -> CountMode:
+    if count_mode not in COUNT_MODES:
+        return DEFAULT_COUNT_MODE
+    return count_mode  # type: ignore[return-value]
+
+
+def norm_page_size(page_size: Optional[int]) -> int:
+    if not page_size:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+
+# ---- Filter --------------------------------------------------------------------
+def check_iso_date(name: str, value: str) -> str:
+    """Bộ lọc ngày / giờ (created_at_from, ...) phải là ISO 8601; trả lại nguyên chuỗi."""
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS), got {value!r}") from None
+    return value
+
+
+# ---- Cursor --------------------------------------------------------------------
+def _cursor_value(v: Any) -> Any:
+    # giữ nguyên độ chính xác: Decimal -> str, thời gian -> ISO 8601 (Postgres tự ép kiểu)
+    if isinstance(v, (datetime, date, time)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+
+def encode_cursor(order_by: str, order_dir: str, sort_value: Any, id_value: Any) -> str:
+    raw = json.dumps([order_by, order_dir, _cursor_value(sort_value), _cursor_value(id_value)],
+                     separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str, order_dir: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_order_by, c_order_dir, sort_value, id_value = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if (c_order_by, c_order_dir) != (order_by, order_dir):
+        raise ValueError(
+            f"Cursor was issued for order_by={c_order_by} {c_order_dir}; "
+            f"repeat the same order_by/order_dir or omit the cursor."
+        )
+    return sort_value, id_value
+
+
+def keyset(sort_col: str, id_col: str, order_by: str, order_dir: str, cursor: Optional[str]) -> Keyset:
+    after = decode_cursor(cursor, order_by, order_dir) if cursor else None
+    return Keyset(sort_col, id_col, order_by, order_dir, after)
+
+
+def _keyset_parts(ks: Keyset) -> List[Optional[str]]:
+    """
+    Điều kiện WHERE cho các đoạn liên tiếp sau cursor (theo đúng thứ tự sắp xếp).
+
+    Thứ tự NULL giữ mặc định của Postgres (ASC -> NULLS LAST, DESC -> NULLS FIRST)
+    để index B-tree (sort_col, id) dùng được theo cả hai chiều. So sánh dạng
+    row-value (sort_col, id) > (:v, :id) là index range scan, không dùng OFFSET.
+    Đoạn thứ hai chỉ xuất hiện khi trang có thể vượt qua ranh giới NULL/không NULL.
+    """
+    if ks.after is None:
+        return [None]
+    op = "<" if ks.order_dir == "desc" else ">"
+    sort_value, _ = ks.after
+    if ks.sort_col == ks.id_col:
+        return [f"{ks.id_col} {op} :_cursor_id"]
+    if sort_value is None:
+        nulls = f"{ks.sort_col} IS NULL AND {ks.id_col} {op} :_cursor_id"
+        # DESC: NULL đứng đầu -> sau đoạn NULL là toàn bộ giá trị không NULL
+        return [nulls, f"{ks.sort_col} IS NOT NULL"] if ks.order_dir == "desc" else [nulls]
+    seek = f"({ks.sort_col}, {ks.id_col}) {op} (:_cursor_sort, :_cursor_id)"
+    # ASC: NULL đứng cuối -> sau các giá trị không NULL là đoạn NULL
+    return [seek, f"{ks.sort_col} IS NULL"] if ks.order_dir == "asc" else [seek]
+
+
+# ---- Query ---------------------------------------------------------------------
+# cột phụ do fetch_page thêm vào, không trả ra ngoài
+_INTERNAL_COLUMNS = frozenset({"_total", "_sort_key", "_sort_id", "_part"})
+
+
+async def _planner_estimate(db, rows_sql: str, params: dict) -> int:
+    """Số dòng planner ước lượng cho câu SELECT (không thực thi truy vấn).
+
+    `rows_sql` phải là câu trả về từng dòng (SELECT 1 FROM .. WHERE ..): EXPLAIN câu
+    COUNT(*) chỉ cho node Aggregate với Plan Rows = 1.
+    """
+    plan = (await statements.execute(db, f"EXPLAIN (FORMAT JSON) {rows_sql}", params)).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+@lru_cache(maxsize=statements.STATEMENT_CACHE_SIZE)
+def _page_sql(
+    select_sql: str,
+    from_sql: str,
+    where_sql: str,
+    order_sql: str,
+    total_col: str,
+    sort_col: Optional[str],
+    id_col: Optional[str],
+    order_dir: Optional[str],
+    parts: tuple,
+) -> str:
+    """Dựng câu lệnh lấy trang; cache theo shape (bộ lọc, cột/chiều sort, count, đoạn keyset)."""
+    if sort_col is None:
+        return f"{select_sql}{total_col} {from_sql} WHERE {where_sql} {order_sql} LIMIT :_limit"
+
+    d = order_dir
+    keys = f", {sort_col} AS _sort_key, {id_col} AS _sort_id"
+    if sort_col == id_col:
+        inner_order = f"ORDER BY {id_col} {d}"
+    else:
+        inner_order = f"ORDER BY {sort_col} {d}, {id_col} {d}"
+
+    if len(parts) == 1:
+        cond = f" AND {parts[0]}" if parts[0] else ""
+        return (f"{select_sql}{keys}{total_col} {from_sql} WHERE {where_sql}{cond} "
+                f"{inner_order} LIMIT :_limit")
+    # mỗi nhánh tự LIMIT theo index; Append giữ chi phí bằng trang đầu
+    branches = " UNION ALL ".join(
+        f"({select_sql}{keys}, {i} AS _part {from_sql} WHERE {where_sql} AND {cond} "
+        f"{inner_order} LIMIT :_limit)"
+        for i, cond in enumerate(parts)
+    )
+    return f"SELECT u.*{total_col} FROM ({branches}) u ORDER BY _part, _sort_key {d}, _sort_id {d} LIMIT :_limit"
+
+
+async def fetch_page(
+    db,
+    select_sql: str,
+    from_sql: str,
+    where_sql: str,
+    params: dict,
+    *,
+    limit: int,
+    count_mode: Optional[str] = None,
+    order_sql: str = "",
+    keyset: Optional[Keyset] = None,
+    count_from_sql: Optional[str] = None,
+) -> Page:
+    """
+    Chạy `select_sql` `from_sql` WHERE `where_sql` và trả về một trang.
+
+    - db            : AsyncConnection (khuyến nghị) hoặc AsyncSession
+    - select_sql    : "SELECT col, col ..." (chưa có FROM)
+    - order_sql     : ORDER BY cố định khi không dùng keyset
+    - keyset        : phân trang theo cursor (sort_col, id); bỏ qua order_sql
+    - count_from_sql: FROM dùng để đếm (bỏ JOIN không ảnh hưởng số dòng)
+
+    Danh sách giá trị truyền dạng mảng (`col = ANY(:ids)`) để chuỗi SQL không đổi
+    theo số phần tử; câu lệnh được compile 1 lần cho mỗi shape (db/statements.py).
+
+    count_mode:
+    - exact   : 1 round trip, total = scalar sub-query COUNT(*) trên toàn bộ tập lọc.
+    - estimate: 1 round trip nếu trang đầu đã hết dữ liệu (total = số dòng),
+                ngoài ra thêm 1 EXPLAIN (total >= returned, total_is_estimate=True;
+                có thể lệch nhiều với bộ lọc chọn lọc).
+    - none    : 1 round trip, total = None.
+    """
+    count_mode = _norm_count_mode(count_mode)
+    params = {**params, "_limit": limit + 1}
+    count_sql = f"SELECT COUNT(*) {count_from_sql or from_sql} WHERE {where_sql}"
+    total_col = f", ({count_sql}) AS _total" if count_mode == "exact" else ""
+
+    if keyset is None:
+        sql = _page_sql(select_sql, from_sql, where_sql, order_sql, total_col, None, None, None, (None,))
+    else:
+        if keyset.after is not None:
+            params["_cursor_sort"], params["_cursor_id"] = keyset.after
+        sql = _page_sql(select_sql, from_sql, where_sql, "", total_col,
+                        keyset.sort_col, keyset.id_col, keyset.order_dir, tuple(_keyset_parts(keyset)))
+
+    result = await statements.execute(db, sql, params)
+    description = result.cursor.description
+    raw = result.all()
+    columns = [col[0] for col in description]
+
+    has_more = len(raw) > limit
+    raw = raw[:limit]
+
+    next_cursor: Optional[str] = None
+    if keyset is not None and has_more and raw:
+        # cursor lấy từ giá trị gốc (Decimal/datetime giữ nguyên độ chính xác)
+        last = raw[-1]
+        next_cursor = encode_cursor(keyset.order_by, keyset.order_dir,
+                                    last[columns.index("_sort_key")], last[columns.index("_sort_id")])
+
+    total: Optional[int] = None
+    total_is_estimate = False
+    first_page = keyset is None or keyset.after is None
+    if count_mode == "exact":
+        if raw:
+            total = int(raw[0][columns.index("_total")])
+        elif first_page:
+            total = 0
+        else:
+            # trang rỗng sau cursor: không có dòng để mang _total
+            total = int((await statements.execute(db, count_sql, params)).scalar_one())
+    elif count_mode == "estimate":
+        if first_page and not has_more:
+            total = len(raw)
+        else:
+            estimate = await _planner_estimate(db, f"SELECT 1 {count_from_sql or from_sql} WHERE {where_sql}", params)
+            total = max(estimate, len(raw) + (1 if has_more else 0))
+            total_is_estimate = True
+
+    rows = serializer_for(description, drop=_INTERNAL_COLUMNS).dicts(raw)
+    return Page(rows, total, has_more, next_cursor, total_is_estimate)
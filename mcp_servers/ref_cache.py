@@ -0,0 +1,127 @@
+"""
+Cache trong process cho dữ liệu tham chiếu ít thay đổi (customers, projects).
+
+Mỗi bảng một RefCache: LRU (OrderedDict) giới hạn số phần tử + TTL, khoá theo id,
+giá trị là tuple (hết_hạn, (cột...)). Các id chưa có trong cache của nhiều bảng
+được nạp bằng 1 truy vấn UNION ALL trên session của request.
+
+Ghi qua tool (customers_update) gọi invalidate() ngay sau commit; thay đổi từ
+nơi khác tự hết hạn sau REF_CACHE_TTL giây.
+
+Cache có thể được nạp từ replica (tool đọc), nên có thể trễ hơn primary. Kiểm tra
+tham chiếu trước khi ghi dùng lookup(..., refresh=True): không tin cache, đọc từ
+session primary của request và ghi đè cache bằng giá trị đó.
+
+    REF_CACHE_SIZE=10000   # số id tối đa mỗi bảng
+    REF_CACHE_TTL=300      # giây
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from db import statements
+
+REF_CACHE_SIZE = int(os.getenv("REF_CACHE_SIZE", "10000"))
+REF_CACHE_TTL = float(os.getenv("REF_CACHE_TTL", "300"))
+
+
+class RefCache:
+    __slots__ = ("table", "columns", "max_size", "ttl", "_data",
+                 "hits", "misses", "evictions", "expirations", "invalidations")
+
+    def __init__(self, table: str, columns: Tuple[str, ...],
+                 max_size: int = REF_CACHE_SIZE, ttl: float = REF_CACHE_TTL):
+        self.table = table
+        self.columns = columns
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, id_: str) -> Optional[tuple]:
+        entry = self._data.get(id_)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(id_)
+                self.hits += 1
+                return entry[1]
+            del self._data[id_]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, id_: str, values: tuple) -> None:
+        self._data[id_] = (time.monotonic() + self.ttl, values)
+        self._data.move_to_end(id_)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *ids: str) -> None:
+        for id_ in ids:
+            if self._data.pop(id_, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+customers_cache = RefCache("customers", ("name",))
+projects_cache = RefCache("projects", ("name", "project_number"))
+
+CACHES: Dict[str, RefCache] = {c.table: c for c in (customers_cache, projects_cache)}
+
+
+async def lookup(db, refresh: bool = False, **wanted: Iterable[str]) -> Dict[str, Dict[str, tuple]]:
+    """
+    Tra cứu id theo bảng, ví dụ `await lookup(db, customers=[...], projects=[...])`.
+
+    Trả {bảng: {id: (cột...)}}; id không tồn tại thì không có trong kết quả.
+    Tất cả id chưa cache được nạp bằng tối đa 1 round trip. refresh=True: bỏ qua
+    cache, nạp mọi id từ `db` (đường ghi, trên primary).
+    """
+    found: Dict[str, Dict[str, tuple]] = {}
+    missing: Dict[str, list] = {}
+    for table, ids in wanted.items():
+        cache = CACHES[table]
+        found[table] = {}
+        for id_ in dict.fromkeys(i for i in ids if i is not None):
+            values = None if refresh else cache.get(id_)
+            if values is None:
+                missing.setdefault(table, []).append(id_)
+            else:
+                found[table][id_] = values
+
+    if missing:
+        width = max(len(CACHES[t].columns) for t in missing)
+        branches = []
+        for t in missing:
+            cols = list(CACHES[t].columns) + ["NULL::varchar"] * (width - len(CACHES[t].columns))
+            branches.append(f"SELECT '{t}' AS tbl, id, {', '.join(cols)} FROM {t} WHERE id = ANY(:{t})")
+        result = await statements.execute(db, " UNION ALL ".join(branches), missing)
+        for tbl, id_, *cols in result.all():
+            cache = CACHES[tbl]
+            values = tuple(cols[:len(cache.columns)])
+            cache.put(id_, values)
+            found[tbl][id_] = values
+
+    return found
+
+
+def stats() -> dict:
+    return {table: cache.stats() for table, cache in CACHES.items()}
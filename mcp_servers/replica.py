@@ -0,0 +1,147 @@
+"""
+Định tuyến các tool đọc sang bản sao chỉ đọc (DATABASE_REPLICA_URL).
+
+Tool đọc (search_customers, project_search, project_list_by_customer_ids,
+cost_quotation_for_project, search_bills, aggregate_bills) và export mở connection
+qua `async with replica.connect() as conn`; tool ghi (update_customer, create_bill,
+create_bills_batch) và phần kiểm tra tham chiếu của chúng vẫn dùng
+AsyncSessionLocal (primary), rồi gọi wrote(...) sau commit.
+
+Đọc-sau-ghi: sau 1 lần ghi, mọi lần đọc của cùng session MCP (header
+mcp-session-id) đi primary trong DB_REPLICA_STICKY_SECONDS giây - giả định độ trễ
+của replica nhỏ hơn khoảng đó. Request không có session (MCP_STATELESS_HTTP=on,
+export) dùng chung 1 khoá: 1 lần ghi bất kỳ trong process đưa các lần đọc không
+session về primary trong khoảng đó. Khi hết khoảng, cache kết quả / cache tham
+chiếu của các bảng vừa ghi bị bỏ thêm 1 lần, để kết quả đọc từ replica còn trễ
+trong lúc đó (của session khác) không nằm lại trong cache tới hết TTL.
+
+Replica không kết nối được thì đọc từ primary và thử lại replica sau
+DB_REPLICA_RETRY_SECONDS giây.
+
+    DATABASE_REPLICA_URL=postgresql://...:5434/db   # không đặt: mọi thứ dùng primary
+    DB_REPLICA_STICKY_SECONDS=5                      # 0: không ép đọc primary sau khi ghi
+    DB_REPLICA_RETRY_SECONDS=30
+
+Thử với 2 instance Postgres trên máy (primary 5432 có wal_level=replica, cho phép
+replication trong pg_hba.conf):
+
+    pg_basebackup -h 127.0.0.1 -p 5432 -U postgres -D /tmp/replica -R -X stream
+    pg_ctl -D /tmp/replica -o "-p 5434" start
+    # (tuỳ chọn) giả lập replica trễ: ALTER SYSTEM SET recovery_min_apply_delay = '3s' trên replica
+    DATABASE_REPLICA_URL=postgresql://postgres@127.0.0.1:5434/db python main.py
+
+Số liệu: stats() (resource stats://replica).
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional
+
+from fastmcp.server.dependencies import get_http_request
+from sqlalchemy.exc import DBAPIError
+
+from db import connection
+from mcp_servers import ref_cache, response_cache
+
+STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+MAX_SESSIONS = 10000
+
+# khoá session -> hạn (monotonic) còn phải đọc primary; "" = request không có session
+_windows: "OrderedDict[str, float]" = OrderedDict()
+_replica_down_until = 0.0
+_counts: Dict[str, int] = {"replica": 0, "primary_after_write": 0, "primary_replica_down": 0, "replica_failures": 0}
+
+
+def _session_key() -> str:
+    try:
+        return get_http_request().headers.get("mcp-session-id") or ""
+    except RuntimeError:  # ngoài request HTTP (stdio, in-process)
+        return ""
+
+
+def _in_window(key: str, now: float) -> bool:
+    deadline = _windows.get(key)
+    if deadline is None:
+        return False
+    if deadline > now:
+        return True
+    del _windows[key]
+    return False
+
+
+def _invalidate(tags: Iterable[str], customers: Iterable[str]) -> None:
+    if customers:
+        ref_cache.customers_cache.invalidate(*customers)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+def wrote(*tags: str, customers: Iterable[str] = ()) -> None:
+    """Gọi ngay sau commit của tool ghi: bỏ cache kết quả gắn `tags` và id khách hàng
+    `customers` khỏi cache tham chiếu; có replica thì mở khoảng đọc primary cho session."""
+    customers = tuple(customers)
+    _invalidate(tags, customers)
+    if connection.replica_engine is None or STICKY_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    key = _session_key()
+    _windows[key] = now + STICKY_SECONDS
+    _windows.move_to_end(key)
+    # hạn tăng dần theo thứ tự thêm -> bỏ các mục hết hạn / quá nhiều ở đầu
+    while _windows and (len(_windows) > MAX_SESSIONS or next(iter(_windows.values())) <= now):
+        _windows.popitem(last=False)
+    try:
+        asyncio.get_running_loop().call_later(STICKY_SECONDS, _invalidate, tags, customers)
+    except RuntimeError:
+        pass
+
+
+def read_engine():
+    """Engine cho 1 lần đọc: replica, hoặc primary (không có replica / vừa ghi / replica lỗi)."""
+    replica = connection.replica_engine
+    if replica is None:
+        return connection.async_engine
+    now = time.monotonic()
+    if _windows and _in_window(_session_key(), now):
+        _counts["primary_after_write"] += 1
+        return connection.async_engine
+    if now < _replica_down_until:
+        _counts["primary_replica_down"] += 1
+        return connection.async_engine
+    _counts["replica"] += 1
+    return replica
+
+
+@asynccontextmanager
+async def connect():
+    """`async with replica.connect() as conn` thay cho `async_engine.connect()` ở tool đọc."""
+    global _replica_down_until
+    engine = read_engine()
+    conn = engine.connect()
+    try:
+        await conn.start()
+    except (DBAPIError, OSError):
+        if engine is connection.async_engine:
+            raise
+        _counts["replica_failures"] += 1
+        _replica_down_until = time.monotonic() + RETRY_SECONDS
+        conn = connection.async_engine.connect()
+        await conn.start()
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+def stats() -> dict:
+    replica: Optional[str] = os.getenv("DATABASE_REPLICA_URL")  # không tạo engine chỉ để xem số liệu
+    return {
+        "replica": replica.rsplit("@", 1)[-1] if replica else None,
+        "sticky_seconds": STICKY_SECONDS,
+        "sessions_in_window": len(_windows),
+        "replica_down": time.monotonic() < _replica_down_until,
+        "reads": dict(_counts),
+    }
@@ -0,0 +1,176 @@
+"""
+Cache kết quả của các tool đọc (search_customers, project_search, search_bills, ...).
+
+Bật bằng RESPONSE_CACHE=on (mặc định tắt). Khoá = tên tool + tham số đã chuẩn
+hoá (sau _norm_str_list và chuẩn hoá sort; danh sách id được sắp xếp, bỏ trùng),
+nên cùng một câu hỏi diễn đạt khác nhau vẫn trúng cache.
+
+Mỗi tool có TTL riêng; tổng dung lượng (bytes JSON) giới hạn bởi
+RESPONSE_CACHE_MAX_BYTES, vượt thì bỏ mục ít dùng nhất (LRU). Mỗi mục gắn tag là
+các bảng đã đọc; tool ghi gọi invalidate(tag) sau commit (customers_update ->
+"customers", create_bill -> "payment_plans", "project_billing"). Kết quả tính
+xong sau khi tag bị invalidate (đọc song song với lần ghi) không được lưu.
+
+Cache nằm trong process: ghi từ process khác chỉ hết hạn theo TTL.
+
+    RESPONSE_CACHE=on
+    RESPONSE_CACHE_MAX_BYTES=33554432
+    RESPONSE_CACHE_TTL=search_bills:10,search_customers:120   # ghi đè TTL mặc định (giây)
+
+    entry = response_cache.lookup("search_bills", ("payment_plans",), project_ids=ids, ...)
+    if entry.hit:
+        return entry.value
+    ...
+    return entry.store(result)
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+# tag = tên bảng
+CUSTOMERS = "customers"
+PROJECTS = "projects"
+PAYMENT_PLANS = "payment_plans"
+PROJECT_BILLING = "project_billing"
+
+# TTL mặc định (giây) theo tool; dữ liệu hóa đơn thay đổi thường xuyên hơn
+DEFAULT_TTLS: Dict[str, float] = {
+    "search_customers": 120,
+    "project_search": 120,
+    "project_list_by_customer_ids": 120,
+    "cost_quotation_for_project": 30,
+    "search_bills": 30,
+    "aggregate_bills": 30,
+}
+
+
+def _enabled() -> bool:
+    return os.getenv("RESPONSE_CACHE", "off").strip().lower() in ("1", "on", "true", "yes")
+
+
+def _ttls() -> Dict[str, float]:
+    ttls = dict(DEFAULT_TTLS)
+    for item in os.getenv("RESPONSE_CACHE_TTL", "").split(","):
+        if ":" in item:
+            tool, ttl = item.split(":", 1)
+            ttls[tool.strip()] = float(ttl)
+    return ttls
+
+
+def _norm(v: Any) -> Any:
+    if isinstance(v, (list, tuple, set, frozenset)):
+        return tuple(sorted({str(x) for x in v}))
+    return v
+
+
+class _Entry:
+    __slots__ = ("cache", "key", "tags", "generation", "hit", "value")
+
+    def __init__(self, cache: Optional["ResponseCache"], key, tags, generation, value=None):
+        self.cache = cache
+        self.key = key
+        self.tags = tags
+        self.generation = generation
+        self.hit = value is not None
+        self.value = value
+
+    def store(self, value: Any) -> Any:
+        """Lưu kết quả (nếu cache bật và tag chưa bị invalidate từ lúc lookup), trả lại `value`."""
+        if self.cache is not None:
+            self.cache.put(self, value)
+        return value
+
+
+class ResponseCache:
+    def __init__(self, enabled: bool, max_bytes: int, ttls: Dict[str, float]):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        # key -> (hết_hạn, tags, bytes JSON)
+        self._data: "OrderedDict[tuple, Tuple[float, tuple, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._generation: Dict[str, int] = {}
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.invalidations = self.stale_skipped = 0
+
+    def lookup(self, tool: str, tags: Iterable[str], **args: Any) -> _Entry:
+        tags = tuple(tags)
+        if not self.enabled or tool not in self.ttls:
+            return _Entry(None, None, tags, None)
+        key = (tool, tuple(sorted((k, _norm(v)) for k, v in args.items())))
+        generation = tuple(self._generation.get(t, 0) for t in tags)
+
+        item = self._data.get(key)
+        if item is not None:
+            if item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return _Entry(self, key, tags, generation, orjson.loads(item[2]))
+            self._drop(key)
+            self.expirations += 1
+        self.misses += 1
+        return _Entry(self, key, tags, generation)
+
+    def put(self, entry: _Entry, value: Any) -> None:
+        if entry.generation != tuple(self._generation.get(t, 0) for t in entry.tags):
+            self.stale_skipped += 1
+            return
+        body = orjson.dumps(value)
+        if len(body) > self.max_bytes:
+            return
+        if entry.key in self._data:
+            self._drop(entry.key)
+        self._data[entry.key] = (time.monotonic() + self.ttls[entry.key[0]], entry.tags, body)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def _drop(self, key) -> None:
+        self._bytes -= len(self._data.pop(key)[2])
+
+    def invalidate(self, *tags: str) -> None:
+        """Bỏ mọi mục gắn một trong các tag; gọi sau khi commit thay đổi trên bảng đó."""
+        for t in tags:
+            self._generation[t] = self._generation.get(t, 0) + 1
+        if not self._data:
+            return
+        wanted = set(tags)
+        for key in [k for k, (_, item_tags, _) in self._data.items() if wanted.intersection(item_tags)]:
+            self._drop(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_skipped": self.stale_skipped,
+        }
+
+
+cache = ResponseCache(
+    enabled=_enabled(),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttls=_ttls(),
+)
+
+lookup = cache.lookup
+invalidate = cache.invalidate
+stats = cache.stats
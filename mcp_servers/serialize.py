@@ -0,0 +1,130 @@
+"""
+Chuyển dòng kết quả SQL sang dữ liệu JSON được (dùng chung cho mọi tool).
+
+Kiểu của từng cột lấy 1 lần từ cursor.description (OID Postgres), từ đó dựng
+sẵn bộ chuyển đổi cho đúng những cột cần đổi (ngày giờ -> ISO 8601,
+numeric -> float, uuid -> str); các cột còn lại giữ nguyên, không kiểm tra
+isinstance từng ô. Làm việc trực tiếp trên dòng dạng tuple, mỗi dòng chỉ tạo
+1 dict.
+
+    result = await statements.execute(conn, sql, params)
+    items = fetch_dicts(result)                 # list[dict]
+    body = serializer_for(desc).json(rows)      # bytes (orjson)
+"""
+from datetime import date, datetime, time
+from time import perf_counter
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+from mcp_servers.metrics import observe_serialize
+
+# OID Postgres -> hàm chuyển đổi (giống _to_jsonable cũ)
+_CONVERTERS: dict = {
+    1082: date.isoformat,        # date
+    1083: time.isoformat,        # time
+    1266: time.isoformat,        # timetz
+    1114: datetime.isoformat,    # timestamp
+    1184: datetime.isoformat,    # timestamptz
+    1700: float,                 # numeric (Decimal)
+    2950: str,                   # uuid
+}
+
+
+def _json_default(v: Any) -> Any:
+    # orjson tự xử lý datetime/date/time/uuid; còn lại chủ yếu là Decimal
+    if hasattr(v, "as_integer_ratio"):
+        return float(v)
+    return str(v)
+
+
+class RowSerializer:
+    __slots__ = ("keys", "_pick", "_convert")
+
+    def __init__(self, columns: Sequence[Tuple[str, Any]], drop: frozenset = frozenset()):
+        keep = [i for i, (name, _) in enumerate(columns) if name not in drop]
+        self.keys: Tuple[str, ...] = tuple(columns[i][0] for i in keep)
+        if len(keep) == len(columns):
+            self._pick: Optional[Callable] = None
+        elif len(keep) == 1:
+            only = keep[0]
+            self._pick = lambda row: (row[only],)
+        else:
+            self._pick = itemgetter(*keep)
+        self._convert: Tuple[Tuple[str, Callable], ...] = tuple(
+            (columns[i][0], _CONVERTERS[columns[i][1]]) for i in keep if columns[i][1] in _CONVERTERS
+        )
+
+    def dict(self, row: Sequence) -> dict:
+        d = dict(zip(self.keys, self._pick(row) if self._pick else row))
+        for k, fn in self._convert:
+            v = d[k]
+            if v is not None:
+                d[k] = fn(v)
+        return d
+
+    def dicts(self, rows: Iterable[Sequence]) -> List[dict]:
+        started = perf_counter()
+        keys, pick, convert = self.keys, self._pick, self._convert
+        out = []
+        append = out.append
+        for row in rows:
+            d = dict(zip(keys, pick(row) if pick else row))
+            for k, fn in convert:
+                v = d[k]
+                if v is not None:
+                    d[k] = fn(v)
+            append(d)
+        observe_serialize(started)
+        return out
+
+    def tuples(self, rows: Iterable[Sequence]) -> Iterator[list]:
+        """Giá trị đã chuyển đổi theo thứ tự self.keys, không tạo dict (dùng cho CSV)."""
+        pick = self._pick
+        convert = tuple((self.keys.index(k), fn) for k, fn in self._convert)
+        for row in rows:
+            values = list(pick(row) if pick else row)
+            for i, fn in convert:
+                v = values[i]
+                if v is not None:
+                    values[i] = fn(v)
+            yield values
+
+    def json(self, rows: Iterable[Sequence]) -> bytes:
+        """Mảng JSON (bytes); orjson tự mã hoá ngày giờ nên không qua bộ chuyển đổi."""
+        started = perf_counter()
+        keys, pick = self.keys, self._pick
+        body = orjson.dumps(
+            [dict(zip(keys, pick(row) if pick else row)) for row in rows],
+            default=_json_default,
+        )
+        observe_serialize(started)
+        return body
+
+    def ndjson(self, rows: Iterable[Sequence]) -> Iterator[bytes]:
+        """Mỗi dòng một object JSON kết thúc bằng '\\n' (NDJSON)."""
+        keys, pick = self.keys, self._pick
+        opts = orjson.OPT_APPEND_NEWLINE
+        for row in rows:
+            yield orjson.dumps(dict(zip(keys, pick(row) if pick else row)), default=_json_default, option=opts)
+
+
+@lru_cache(maxsize=256)
+def _serializer(columns: Tuple[Tuple[str, Any], ...], drop: frozenset) -> RowSerializer:
+    return RowSerializer(columns, drop)
+
+
+def serializer_for(description, drop: Iterable[str] = ()) -> RowSerializer:
+    """Serializer cho cursor.description (cache theo tên + kiểu cột); `drop`: cột bỏ khỏi kết quả."""
+    columns = tuple((col[0], col[1]) for col in description)
+    return _serializer(columns, frozenset(drop))
+
+
+def fetch_dicts(result, drop: Iterable[str] = ()) -> List[dict]:
+    """Đọc hết CursorResult thành list[dict] JSON được (lấy description trước khi fetch)."""
+    if result.cursor is None or result.cursor.description is None:
+        return []
+    ser = serializer_for(result.cursor.description, drop)
+    return ser.dicts(result.all())
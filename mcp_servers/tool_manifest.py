@@ -0,0 +1,131 @@
+"""
+Đăng ký tool của main_mcp mà không import các module tool lúc khởi động.
+
+Schema JSON (tham số / kết quả) của mọi tool được tính sẵn lúc build và ghi vào
+mcp_servers/tool_manifest.json:
+
+    python -m mcp_servers.tool_manifest          # Dockerfile chạy bước này
+
+setup() khi đó chỉ thêm các LazyTool đọc từ manifest nên list_tools trả lời được
+ngay, chưa import mcp_projects / mcp_bills / ..., SQLAlchemy, psycopg hay tạo
+engine. Lần gọi đầu tiên 1 tool mới import module của nó (trong thread, không chặn
+event loop) rồi chuyển cho tool thật (validate tham số, chạy, dựng kết quả như cũ).
+
+Manifest ghi kèm hash mã nguồn mcp_servers/*.py + phiên bản fastmcp; không có file,
+hash lệch (sửa code mà chưa build lại) hoặc LAZY_TOOLS=off thì quay về import_server
+như trước.
+"""
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import fastmcp
+from fastmcp.tools.tool import Tool, ToolResult
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = Path(__file__).with_name("tool_manifest.json")
+
+# (prefix, module, biến FastMCP trong module) theo thứ tự đăng ký
+SERVERS = (
+    ("projects", "mcp_servers.mcp_projects", "mcp_projects"),
+    ("bills", "mcp_servers.mcp_bills", "mcp_bills"),
+    ("payment", "mcp_servers.mcp_payment", "mcp_payment"),
+    ("customers", "mcp_servers.mcp_customer", "mcp_customers"),
+)
+_FIELDS = {"name", "title", "description", "parameters", "output_schema", "annotations", "tags", "meta"}
+
+
+def _enabled() -> bool:
+    return os.getenv("LAZY_TOOLS", "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+def source_hash() -> str:
+    h = hashlib.blake2b(fastmcp.__version__.encode(), digest_size=16)
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _server(module: str, attr: str):
+    return getattr(importlib.import_module(module), attr)
+
+
+_real_tools: Dict[str, Tool] = {}
+
+
+class LazyTool(Tool):
+    """Tool đăng ký từ manifest; import module thật ở lần gọi đầu."""
+
+    module: str
+    server: str
+    tool_key: str
+
+    async def run(self, arguments: Dict[str, Any]) -> ToolResult:
+        tool = _real_tools.get(self.key)
+        if tool is None:
+            server = await asyncio.to_thread(_server, self.module, self.server)
+            tool = _real_tools[self.key] = await server.get_tool(self.tool_key)
+        return await tool.run(arguments)
+
+
+async def build() -> dict:
+    tools = []
+    for prefix, module, attr in SERVERS:
+        for key, tool in (await _server(module, attr).get_tools()).items():
+            tools.append({
+                "key": f"{prefix}_{key}",
+                "module": module,
+                "server": attr,
+                "tool_key": key,
+                **tool.model_dump(mode="json", include=_FIELDS),
+            })
+    return {"source_hash": source_hash(), "tools": tools}
+
+
+def load() -> Optional[dict]:
+    """Manifest còn khớp mã nguồn, None nếu không dùng được."""
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_bytes())
+    except FileNotFoundError:
+        logger.info("%s not found, importing tool modules", MANIFEST_PATH.name)
+        return None
+    if manifest.get("source_hash") != source_hash():
+        logger.warning("%s is stale (run python -m mcp_servers.tool_manifest), importing tool modules",
+                       MANIFEST_PATH.name)
+        return None
+    return manifest
+
+
+async def register(mcp) -> str:
+    """Thêm tool của mọi server vào `mcp`; trả về "lazy" hoặc "eager"."""
+    manifest = load() if _enabled() else None
+    if manifest is None:
+        for prefix, module, attr in SERVERS:
+            await mcp.import_server(_server(module, attr), prefix=prefix)
+        return "eager"
+    for entry in manifest["tools"]:
+        mcp.add_tool(LazyTool(**entry))
+    return "lazy"
+
+
+def warm() -> None:
+    """Import trước mọi module tool (serve.py --preload: dùng chung qua copy-on-write)."""
+    for _prefix, module, attr in SERVERS:
+        _server(module, attr)
+
+
+def main():
+    manifest = asyncio.run(build())
+    MANIFEST_PATH.write_text(json.dumps(manifest, ensure_ascii=False, indent=1) + "\n")
+    print(f"{MANIFEST_PATH}: {len(manifest['tools'])} tools")
+
+
+if __name__ == "__main__":
+    main()
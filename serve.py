@@ -0,0 +1,234 @@
+"""
+Chạy main_mcp (streamable HTTP, /mcp) với N worker process dùng chung 1 socket.
+
+Master mở socket rồi fork các worker; mỗi worker chạy uvicorn trên socket đó
+(kernel chia kết nối cho các worker). Engine / pool DB luôn được tạo trong
+worker sau fork (db.connection bỏ pool kế thừa từ process cha).
+
+Session MCP của streamable HTTP nằm trong bộ nhớ 1 process, mà request kế tiếp
+của cùng session có thể rơi vào worker khác (404), nên worker chạy stateless:
+mỗi request tự đủ, không cần giữ session, và trả JSON thay vì SSE
+(MCP_JSON_RESPONSE=off để giữ SSE; xem main.http_options). --stateful chỉ dùng
+với --workers 1.
+
+    python serve.py                          # số worker = số CPU của container (cgroup)
+    python serve.py --workers 4 --port 8000
+    WEB_CONCURRENCY=4 PORT=8000 python serve.py --preload
+
+Signal gửi cho master:
+    TERM / INT : drain - worker ngừng nhận kết nối mới, chờ request đang chạy tối
+                 đa --graceful-timeout giây rồi thoát
+    HUP        : rolling restart - lần lượt mở worker mới (nạp lại code), chờ worker
+                 mới sẵn sàng rồi mới drain worker cũ, không lúc nào thiếu worker
+    TTIN / TTOU: thêm / bớt 1 worker
+Worker chết bất thường được mở lại.
+
+--preload: master import main + setup() + mọi module tool 1 lần trước khi fork
+(worker khởi động nhanh, dùng chung bộ nhớ copy-on-write); HUP khi đó không nạp
+code mới.
+"""
+import argparse
+import asyncio
+import math
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+WORKER_SIGNALS = (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGTERM, signal.SIGINT)
+
+
+def available_cpus() -> int:
+    """Số CPU thực dùng được: min(affinity, quota cgroup v2 cpu.max)."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _log(msg: str) -> None:
+    print(f"[serve {os.getpid()}] {msg}", file=sys.stderr, flush=True)
+
+
+def _run_worker(sock: socket.socket, args, ready_fd: int, preloaded: bool) -> None:
+    for sig in WORKER_SIGNALS:
+        signal.signal(sig, signal.SIG_DFL)
+    import uvicorn
+
+    import main  # không preload: import sau fork nên engine tạo trong worker
+
+    async def run():
+        if not preloaded:
+            await main.setup()
+        config = uvicorn.Config(
+            main.main_mcp.http_app(transport="http", **main.http_options(stateless=not args.stateful)),
+            log_level=args.log_level,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            timeout_keep_alive=args.keep_alive,
+        )
+        server = uvicorn.Server(config)
+
+        async def notify_ready():
+            while not server.started:
+                await asyncio.sleep(0.05)
+            os.write(ready_fd, b"1")
+            os.close(ready_fd)
+
+        ready = asyncio.create_task(notify_ready())
+        await server.serve(sockets=[sock])
+        ready.cancel()
+
+    asyncio.run(run())
+
+
+class Master:
+    def __init__(self, sock: socket.socket, args, preloaded: bool):
+        self.sock = sock
+        self.args = args
+        self.preloaded = preloaded
+        self.target = args.workers
+        self.workers: Dict[int, float] = {}   # pid -> lúc khởi động
+        self.retiring: Dict[int, float] = {}  # pid -> hạn chót drain
+        self.signals: List[int] = []
+        self.stopping = False
+
+    def spawn(self, wait_ready: bool = False) -> Optional[int]:
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            code = 0
+            try:
+                _run_worker(self.sock, self.args, w, self.preloaded)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(w)
+        self.workers[pid] = time.monotonic()
+        try:
+            if wait_ready:
+                ready, _, _ = select.select([r], [], [], self.args.ready_timeout)
+                if not ready or not os.read(r, 1):
+                    _log(f"worker {pid} not ready after {self.args.ready_timeout}s")
+                    self.retire(pid, signal.SIGKILL)
+                    return None
+        finally:
+            os.close(r)
+        _log(f"worker {pid} started")
+        return pid
+
+    def retire(self, pid: int, sig: int = signal.SIGTERM) -> None:
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic() + self.args.graceful_timeout + 5
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.retiring.pop(pid, None) is not None:
+                _log(f"worker {pid} drained")
+                continue
+            started = self.workers.pop(pid, None)
+            if started is not None and not self.stopping:
+                _log(f"worker {pid} died (status {status}), respawning")
+                if time.monotonic() - started < 2:
+                    time.sleep(2)  # tránh vòng lặp crash liên tục
+
+    def kill_stragglers(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                _log(f"worker {pid} still draining after {self.args.graceful_timeout}s, killing")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring[pid] = now + 60
+
+    def rolling_restart(self) -> None:
+        for old in list(self.workers):
+            if self.spawn(wait_ready=True) is None:
+                _log("rolling restart aborted, keeping the remaining old workers")
+                return
+            self.retire(old)
+
+    def handle(self, sig: int) -> None:
+        if sig in (signal.SIGTERM, signal.SIGINT):
+            _log(f"{signal.Signals(sig).name}: draining {len(self.workers)} worker(s)")
+            self.stopping = True
+            for pid in list(self.workers):
+                self.retire(pid)
+        elif sig == signal.SIGHUP:
+            _log("SIGHUP: rolling restart")
+            self.rolling_restart()
+        elif sig == signal.SIGTTIN and not self.args.stateful:
+            self.target += 1
+        elif sig == signal.SIGTTOU and self.target > 1:
+            self.target -= 1
+            self.retire(max(self.workers, key=self.workers.get))
+
+    def run(self) -> None:
+        for sig in WORKER_SIGNALS:
+            signal.signal(sig, lambda s, _frame: self.signals.append(s))
+        _log(f"listening on {self.args.host}:{self.args.port} with {self.target} worker(s)")
+        while True:
+            self.reap()
+            while self.signals:
+                self.handle(self.signals.pop(0))
+            if self.stopping:
+                if not self.workers and not self.retiring:
+                    return
+            else:
+                while len(self.workers) < self.target:
+                    self.spawn()
+            self.kill_stragglers()
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or available_cpus())
+    parser.add_argument("--preload", action="store_true", help="Import main and run setup() once in the master")
+    parser.add_argument("--stateful", action="store_true", help="Keep MCP sessions in memory (single worker only)")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="Seconds a draining worker may finish requests")
+    parser.add_argument("--ready-timeout", type=float, default=60, help="Seconds a new worker has to start listening")
+    parser.add_argument("--keep-alive", type=int, default=5, help="HTTP keep-alive timeout (s)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+    if args.stateful and args.workers > 1:
+        parser.error("--stateful needs --workers 1: a session's requests may reach any worker")
+
+    sock = socket.create_server((args.host, args.port), backlog=args.backlog)
+    if args.preload:
+        import main as app
+        from mcp_servers import tool_manifest
+
+        asyncio.run(app.setup())
+        tool_manifest.warm()
+    Master(sock, args, preloaded=args.preload).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db import connection
+from mcp_servers import ref_cache
+from mcp_servers.mcp_bills import BillCreateInfo, bills_create, check_references
+
+CUSTOMER_ID = "CS_TEST_STMT"
+PROJECT_ID = "PJ_TEST_STMT"
+
+
+def _bill(n_details: int) -> BillCreateInfo:
+    return BillCreateInfo(
+        customer_id=CUSTOMER_ID,
+        payer_code=CUSTOMER_ID,
+        project_id=PROJECT_ID,
+        expected_date_of_payment="2025-11-30",
+        details=[
+            {"attribute": f"Item {i}", "product": f"Product {i}", "quantity": 1, "tax_amount": 10, "amount": 100}
+            for i in range(n_details)
+        ],
+    )
+
+
+def _count(executed):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # SAVEPOINT / RELEASE do session của test tạo (join_transaction_mode), không phải của tool
+        if "SAVEPOINT" not in statement:
+            executed.append(statement)
+    return before_cursor_execute
+
+
+async def _count_statements(monkeypatch, n_details_list):
+    """{(số dòng chi tiết, cache tham chiếu cold/warm): số câu SQL của 1 lần create_bill}.
+
+    Khách hàng / dự án của test và mọi thứ create_bill ghi nằm trong 1 transaction
+    bị rollback ở cuối: session của tool dùng savepoint trên connection đó.
+    """
+    executed = []
+    counts = {}
+    async with connection.async_engine.connect() as conn:
+        await conn.begin()
+        await conn.execute(text(
+            "INSERT INTO customers (id, name, is_deleted, is_contractor, created_at) VALUES (:id, 'Test', false, false, now())"
+        ), {"id": CUSTOMER_ID})
+        await conn.execute(text(
+            "INSERT INTO projects (id, name, customer_id, is_deleted, created_at) VALUES (:id, 'Test', :customer_id, false, now())"
+        ), {"id": PROJECT_ID, "customer_id": CUSTOMER_ID})
+        monkeypatch.setattr(connection, "AsyncSessionLocal", async_sessionmaker(
+            bind=conn, join_transaction_mode="create_savepoint", autoflush=False, expire_on_commit=False,
+        ))
+
+        listener = _count(executed)
+        sync_engine = connection.async_engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", listener)
+        try:
+            for n in n_details_list:
+                for cache in ("cold", "warm"):
+                    if cache == "cold":
+                        ref_cache.customers_cache.invalidate(CUSTOMER_ID)
+                        ref_cache.projects_cache.invalidate(PROJECT_ID)
+                    executed.clear()
+                    result = await bills_create.fn(_bill(n))
+                    counts[n, cache] = len(executed)
+                    assert result["details_created"] == n
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", listener)
+            await conn.rollback()
+            ref_cache.customers_cache.invalidate(CUSTOMER_ID)
+            ref_cache.projects_cache.invalidate(PROJECT_ID)
+    return counts
+
+
+def test_create_bill_statement_count(run, monkeypatch):
+    counts = run(_count_statements(monkeypatch, [1, 50]))
+    for n in (1, 50):
+        # 1 SELECT tham chiếu (customers + projects), INSERT plan, INSERT details, upsert project_billing;
+        # kiểm tra tham chiếu không dùng ref_cache nên cache có sẵn cũng không bớt câu nào
+        assert counts[n, "cold"] == counts[n, "warm"] == 4, counts
+
+
+async def _check_stale_reference():
+    # như 1 giá trị replica còn trễ để lại trong cache: dự án không còn trên primary
+    ref_cache.projects_cache.put("PJ_TEST_GONE", ("Gone", None))
+    try:
+        async with connection.async_engine.connect() as conn:
+            return await check_references(conn, [_bill(1).model_copy(update={"project_id": "PJ_TEST_GONE"})])
+    finally:
+        ref_cache.projects_cache.invalidate("PJ_TEST_GONE")
+
+
+def test_write_validation_ignores_cached_references(run):
+    errors = run(_check_stale_reference())
+    assert "project_id 'PJ_TEST_GONE' does not exist in projects.id" in errors[0]
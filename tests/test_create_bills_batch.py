@@ -0,0 +1,37 @@
+import asyncio
+
+from mcp_servers.mcp_bills import bills_create_batch
+
+
+def _bill(**overrides) -> dict:
+    bill = {
+        "customer_id": "CS00000001",
+        "payer_code": "CS00000001",
+        "project_id": "PJ00000001",
+        "expected_date_of_payment": "2025-11-30",
+        "details": [{"attribute": "Item", "product": "Product", "quantity": 1, "tax_amount": 10, "amount": 100}],
+    }
+    bill.update(overrides)
+    return bill
+
+
+def test_malformed_items_reported_per_index():
+    # mọi phần tử đều sai định dạng -> trả lỗi theo index, không chạm DB
+    result = asyncio.run(bills_create_batch.fn([
+        _bill(details=[]),
+        _bill(expected_date_of_payment="30/11/2025"),
+        _bill(details=[{"tax_amount": 10, "amount": -1}]),
+        "not a bill",
+    ]))
+    assert result["created"] == 0 and result["failed"] == 4
+    errors = {e["index"]: " ".join(e["errors"]) for e in result["errors"]}
+    assert "details must not be empty" in errors[0]
+    assert errors[1].startswith("expected_date_of_payment:")
+    assert "money fields must be >= 0" in errors[2]
+    assert 3 in errors
+
+
+def test_all_or_nothing_stops_before_writing():
+    result = asyncio.run(bills_create_batch.fn([_bill(), _bill(details=[])], all_or_nothing=True))
+    assert result["created"] == 0 and result["bills"] == []
+    assert [e["index"] for e in result["errors"]] == [1]
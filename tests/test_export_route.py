@@ -0,0 +1,29 @@
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def client():
+    import main
+
+    with TestClient(main.main_mcp.http_app()) as client:
+        yield client
+
+
+@pytest.mark.parametrize("query, error", [
+    ("limit=-1", "limit phải là số nguyên >= 0"),
+    ("limit=abc", "limit phải là số nguyên >= 0"),
+    ("created_at_from=notadate", "created_at_from must be an ISO 8601 date"),
+    ("bogus=1", "tham số không hợp lệ: bogus"),
+])
+def test_invalid_query_rejected_before_streaming(client, query, error):
+    response = client.get(f"/export/bills?{query}")
+    assert response.status_code == 400
+    assert response.headers["content-type"] == "application/json"
+    assert error in response.json()["error"]
+
+
+def test_valid_query_streams(database, client):
+    response = client.get("/export/customers?format=csv&limit=1&created_at_to=2100-01-01")
+    assert response.status_code == 200
+    assert response.text.splitlines()[0] == "id,name,email,phone_number,created_at,is_deleted"
@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql.psycopg import PGDialect_psycopg
+
+from db import connection
+from mcp_servers.pagination import (
+    Keyset, _keyset_parts, _page_sql, decode_cursor, encode_cursor, fetch_page, keyset,
+)
+
+ROWS = 20000
+
+
+async def _totals(group_size: int):
+    """total của count_mode exact / estimate cho bảng tạm ROWS dòng, lọc lấy ~ROWS / group_size dòng."""
+    async with connection.async_engine.connect() as conn:
+        await conn.execute(text(
+            "CREATE TEMP TABLE page_rows AS "
+            "SELECT g AS id, g % :groups AS grp FROM generate_series(1, :rows) g"
+        ), {"groups": group_size, "rows": ROWS})
+        await conn.execute(text("ANALYZE page_rows"))
+        totals = {}
+        for mode in ("exact", "estimate"):
+            page = await fetch_page(
+                conn, "SELECT t.id", "FROM page_rows t", "t.grp = :grp", {"grp": 1},
+                limit=10, count_mode=mode, order_sql="ORDER BY t.id",
+            )
+            assert len(page.rows) == 10 and page.has_more
+            assert page.total_is_estimate == (mode == "estimate")
+            totals[mode] = page.total
+        await conn.rollback()
+    return totals
+
+
+def test_estimate_close_to_exact_count(run):
+    for groups in (4, 50):
+        totals = run(_totals(groups))
+        assert totals["exact"] == ROWS // groups
+        assert totals["exact"] / 5 <= totals["estimate"] <= totals["exact"] * 5, totals
+
+
+# ---- Không cần DB ----------------------------------------------------------------
+def test_cursor_round_trip():
+    cursor = encode_cursor("created_at", "desc", datetime(2025, 1, 2, 3, 4, 5, 6), "PP00000001")
+    assert decode_cursor(cursor, "created_at", "desc") == ("2025-01-02T03:04:05.000006", "PP00000001")
+    # Decimal giữ nguyên độ chính xác (chuỗi), NULL giữ None
+    assert decode_cursor(encode_cursor("amount", "asc", Decimal("0.10"), 7), "amount", "asc") == ("0.10", 7)
+    assert decode_cursor(encode_cursor("amount", "asc", None, 7), "amount", "asc") == (None, 7)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!",
+    _b64(b"not json"),
+    _b64(json.dumps({"order_by": "id"}).encode()),
+    _b64(json.dumps(["id", "asc", 1]).encode()),
+    _b64(b"\xff\xfe"),
+])
+def test_invalid_cursor_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, "id", "asc")
+
+
+def test_cursor_for_other_order_rejected():
+    cursor = encode_cursor("name", "asc", "A", 1)
+    with pytest.raises(ValueError, match="order_by=name asc"):
+        keyset("c.name", "c.id", "name", "desc", cursor)
+
+
+@pytest.mark.parametrize("order_dir, sort_value, expected", [
+    ("asc", "A", ["(c.name, c.id) > (:_cursor_sort, :_cursor_id)", "c.name IS NULL"]),
+    ("desc", "A", ["(c.name, c.id) < (:_cursor_sort, :_cursor_id)"]),
+    ("asc", None, ["c.name IS NULL AND c.id > :_cursor_id"]),
+    ("desc", None, ["c.name IS NULL AND c.id < :_cursor_id", "c.name IS NOT NULL"]),
+])
+def test_keyset_parts(order_dir, sort_value, expected):
+    ks = Keyset("c.name", "c.id", "name", order_dir, (sort_value, 5))
+    assert _keyset_parts(ks) == expected
+
+
+def test_keyset_parts_first_page_and_id_sort():
+    assert _keyset_parts(Keyset("c.name", "c.id", "name", "asc", None)) == [None]
+    assert _keyset_parts(Keyset("c.id", "c.id", "id", "desc", ("x", "x"))) == ["c.id < :_cursor_id"]
+
+
+def test_page_sql_union_all_per_segment():
+    parts = ("(c.name, c.id) > (:_cursor_sort, :_cursor_id)", "c.name IS NULL")
+    sql = _page_sql("SELECT c.id", "FROM customers c", "c.is_deleted = false", "", "",
+                    "c.name", "c.id", "asc", parts)
+    assert sql == (
+        "SELECT u.* FROM ("
+        "(SELECT c.id, c.name AS _sort_key, c.id AS _sort_id, 0 AS _part FROM customers c "
+        "WHERE c.is_deleted = false AND (c.name, c.id) > (:_cursor_sort, :_cursor_id) "
+        "ORDER BY c.name asc, c.id asc LIMIT :_limit)"
+        " UNION ALL "
+        "(SELECT c.id, c.name AS _sort_key, c.id AS _sort_id, 1 AS _part FROM customers c "
+        "WHERE c.is_deleted = false AND c.name IS NULL "
+        "ORDER BY c.name asc, c.id asc LIMIT :_limit)"
+        ") u ORDER BY _part, _sort_key asc, _sort_id asc LIMIT :_limit"
+    )
+
+
+def test_page_sql_single_segment():
+    sql = _page_sql("SELECT c.id", "FROM customers c", "true", "", "", "c.name", "c.id", "desc",
+                    ("(c.name, c.id) < (:_cursor_sort, :_cursor_id)",))
+    assert sql == ("SELECT c.id, c.name AS _sort_key, c.id AS _sort_id FROM customers c "
+                   "WHERE true AND (c.name, c.id) < (:_cursor_sort, :_cursor_id) "
+                   "ORDER BY c.name desc, c.id desc LIMIT :_limit")
+
+
+class _RecordingConnection:
+    """Thay AsyncConnection: ghi lại câu lệnh / tham số, trả trang rỗng."""
+    dialect = PGDialect_psycopg()
+
+    def __init__(self):
+        self.calls = []
+
+    async def exec_driver_sql(self, sql, params):
+        self.calls.append((sql, params))
+        return SimpleNamespace(cursor=SimpleNamespace(description=[("id", 25)]), all=lambda: [])
+
+
+def test_fetch_page_binds_cursor_params():
+    conn = _RecordingConnection()
+    ks = keyset("c.name", "c.id", "name", "desc", encode_cursor("name", "desc", None, "CS00000009"))
+    page = asyncio.run(fetch_page(conn, "SELECT c.id", "FROM customers c", "c.id = ANY(:ids)", {"ids": ["a"]},
+                                  limit=5, count_mode="none", keyset=ks))
+    assert page.rows == [] and page.total is None and page.next_cursor is None
+    [(sql, params)] = conn.calls
+    assert params == {"ids": ["a"], "_limit": 6, "_cursor_sort": None, "_cursor_id": "CS00000009"}
+    assert "c.name IS NULL AND c.id < %(_cursor_id)s" in sql and "c.name IS NOT NULL" in sql